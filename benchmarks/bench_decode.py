@@ -0,0 +1,205 @@
+"""
+Micro-benchmark of decoding the 'oc get' output: '-o yaml' decoded by
+yaml.safe_load (the former exec_oc_cmd behaviour) against '-o json' decoded
+by src.utility.codec.loads. The fixtures mimic the packagemanifest list of
+openshift-marketplace and the node list of a cluster.
+
+Usage:
+    python benchmarks/bench_decode.py [--packages 200] [--nodes 60] [--rounds 5]
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utility import codec  # noqa: E402
+
+DESCRIPTION = (
+    "The operator manages the lifecycle of the storage services of the cluster, "
+    "including the deployment, upgrades and the recovery of the components. "
+) * 20
+
+
+def package_manifest(index):
+    channels = []
+    for channel in ("stable-4.11", "stable-4.12", "stable-4.13"):
+        channels.append(
+            {
+                "name": channel,
+                "currentCSV": f"package-{index}.v{channel[-4:]}.0",
+                "currentCSVDesc": {
+                    "displayName": f"Package {index}",
+                    "description": DESCRIPTION,
+                    "version": f"{channel[-4:]}.0",
+                    "provider": {"name": "Red Hat"},
+                    "keywords": ["storage", "ceph", "noobaa", "rook"],
+                    "links": [
+                        {"name": "Documentation", "url": "https://example.com/docs"}
+                    ],
+                    "maintainers": [{"name": "Maintainer", "email": "m@example.com"}],
+                    "icon": [
+                        {
+                            "base64data": base64.b64encode(os.urandom(3000)).decode(),
+                            "mediatype": "image/png",
+                        }
+                    ],
+                    "installModes": [
+                        {"type": mode, "supported": mode == "OwnNamespace"}
+                        for mode in (
+                            "OwnNamespace",
+                            "SingleNamespace",
+                            "MultiNamespace",
+                            "AllNamespaces",
+                        )
+                    ],
+                    "annotations": {
+                        "alm-examples": json.dumps(
+                            [
+                                {"kind": "StorageCluster", "spec": {"a": i}}
+                                for i in range(20)
+                            ]
+                        ),
+                        "capabilities": "Deep Insights",
+                        "operators.openshift.io/infrastructure-features": '["disconnected"]',
+                    },
+                },
+            }
+        )
+    return {
+        "apiVersion": "packages.operators.coreos.com/v1",
+        "kind": "PackageManifest",
+        "metadata": {
+            "name": f"package-{index}",
+            "namespace": "openshift-marketplace",
+            "labels": {
+                "catalog": "redhat-operators",
+                "catalog-namespace": "openshift-marketplace",
+                "provider": "Red Hat",
+            },
+            "creationTimestamp": "2023-01-01T00:00:00Z",
+        },
+        "spec": {},
+        "status": {
+            "catalogSource": "redhat-operators",
+            "catalogSourceNamespace": "openshift-marketplace",
+            "packageName": f"package-{index}",
+            "defaultChannel": "stable-4.13",
+            "channels": channels,
+        },
+    }
+
+
+def node(index):
+    return {
+        "apiVersion": "v1",
+        "kind": "Node",
+        "metadata": {
+            "name": f"ip-10-0-{index}-1.ec2.internal",
+            "labels": {
+                "kubernetes.io/arch": "amd64",
+                "kubernetes.io/os": "linux",
+                "node-role.kubernetes.io/worker": "",
+                "topology.kubernetes.io/zone": f"us-east-1{'abc'[index % 3]}",
+                "node.kubernetes.io/instance-type": "m5.4xlarge",
+            },
+            "annotations": {
+                f"machineconfiguration.openshift.io/annotation-{i}": "x" * 64
+                for i in range(10)
+            },
+            "resourceVersion": str(1000 + index),
+        },
+        "spec": {"providerID": f"aws:///us-east-1a/i-{index:016x}"},
+        "status": {
+            "addresses": [
+                {"type": "InternalIP", "address": f"10.0.{index}.1"},
+                {"type": "Hostname", "address": f"ip-10-0-{index}-1.ec2.internal"},
+            ],
+            "capacity": {"cpu": "16", "memory": "64Gi", "pods": "250"},
+            "allocatable": {"cpu": "15500m", "memory": "62Gi", "pods": "250"},
+            "conditions": [
+                {
+                    "type": condition,
+                    "status": "False" if condition != "Ready" else "True",
+                    "lastHeartbeatTime": "2023-01-01T00:00:00Z",
+                    "reason": f"Kubelet{condition}",
+                    "message": f"kubelet reports {condition}",
+                }
+                for condition in (
+                    "MemoryPressure",
+                    "DiskPressure",
+                    "PIDPressure",
+                    "Ready",
+                )
+            ],
+            "images": [
+                {
+                    "names": [f"quay.io/openshift/image-{index}-{i}@sha256:{'a' * 64}"],
+                    "sizeBytes": 100000000 + i,
+                }
+                for i in range(50)
+            ],
+            "nodeInfo": {
+                "kubeletVersion": "v1.25.4",
+                "osImage": "Red Hat Enterprise Linux CoreOS",
+                "containerRuntimeVersion": "cri-o://1.25.1",
+            },
+        },
+    }
+
+
+def items_list(items):
+    return {
+        "apiVersion": "v1",
+        "kind": "List",
+        "items": items,
+        "metadata": {"resourceVersion": ""},
+    }
+
+
+def measure(func, data, rounds):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--packages", type=int, default=200)
+    parser.add_argument("--nodes", type=int, default=60)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    fixtures = {
+        "packagemanifest": items_list(
+            [package_manifest(i) for i in range(args.packages)]
+        ),
+        "node": items_list([node(i) for i in range(args.nodes)]),
+    }
+    print(f"json decoder: {'orjson' if codec.orjson else 'json'}")
+    print(
+        f"{'fixture':<16}{'yaml size':>12}{'json size':>12}"
+        f"{'yaml.safe_load':>16}{'codec.loads':>14}{'speedup':>10}"
+    )
+    for name, data in fixtures.items():
+        yaml_output = yaml.safe_dump(data)
+        json_output = json.dumps(data, indent=4)
+        assert codec.loads(json_output) == yaml.safe_load(yaml_output)
+        yaml_time = measure(yaml.safe_load, yaml_output, args.rounds)
+        json_time = measure(codec.loads, json_output, args.rounds)
+        print(
+            f"{name:<16}{len(yaml_output) / 2**20:>10.2f}MB{len(json_output) / 2**20:>10.2f}MB"
+            f"{yaml_time * 1000:>14.1f}ms{json_time * 1000:>12.1f}ms"
+            f"{yaml_time / json_time:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Micro-benchmarks of the Python side of the OCP client hot paths: a scripted
+fake 'oc' (fake_oc.py) is put first on PATH and serves fixtures of 3 to 500
+items, the time spent in the 'oc' processes (taken from the command metrics)
+is subtracted from the time of every helper call. The results are written as
+JSON and can be compared with the results of an earlier run.
+
+Usage:
+    python benchmarks/bench_ocp.py [--sizes 3 20 100 500] [--rounds 5]
+        [--output results.json] [--compare baseline.json] [--threshold 1.2]
+        [--min-delta 1.0]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_decode import items_list, node, package_manifest  # noqa: E402
+from src.framework import MultiClusterConfig, config, merge_dict  # noqa: E402
+from src.ocs.ocp import OCP  # noqa: E402
+from src.ocs.resources.package_manifest import PackageManifest  # noqa: E402
+from src.utility import codec, metrics, templating, tracing  # noqa: E402
+
+NAMESPACE = "bench"
+SELECTOR = "app=bench"
+CATALOG_SELECTOR = "catalog=redhat-operators"
+TEMPLATE = """\
+{% for cluster in clusters %}
+---
+apiVersion: cluster.open-cluster-management.io/v1
+kind: ManagedCluster
+metadata:
+  name: {{ cluster.name }}
+  labels:
+    cluster.open-cluster-management.io/clusterset: {{ clusterset }}
+{% for key, value in cluster.labels.items() %}
+    {{ key }}: "{{ value }}"
+{% endfor %}
+spec:
+  hubAcceptsClient: true
+{% endfor %}
+"""
+POD_TABLE_HEADER = "NAME  READY  STATUS  RESTARTS  AGE"
+
+
+def pod(index):
+    return {
+        "apiVersion": "v1",
+        "kind": "Pod",
+        "metadata": {
+            "name": f"bench-{index}",
+            "namespace": NAMESPACE,
+            "labels": {"app": "bench"},
+        },
+        "status": {
+            "phase": "Running",
+            "containerStatuses": [
+                {"name": "main", "ready": True, "state": {"running": {}}}
+            ],
+        },
+    }
+
+
+def write_fixtures(directory, size):
+    """
+    Write the 'oc get' outputs served by the fake oc for the size
+    """
+    pods = items_list([pod(i) for i in range(size)])
+    fixtures = {
+        "pod": pods,
+        "node": items_list([node(i) for i in range(size)]),
+        "packagemanifest": items_list([package_manifest(i) for i in range(size)]),
+    }
+    for kind, data in fixtures.items():
+        with open(os.path.join(directory, f"{kind}.json"), "w") as f:
+            json.dump(data, f)
+    rows = [
+        f"{item['metadata']['name']}  1/1  Running  0  {i % 60}m"
+        for i, item in enumerate(pods["items"])
+    ]
+    with open(os.path.join(directory, "pod.table"), "w") as f:
+        f.write("\n".join([POD_TABLE_HEADER] + rows) + "\n")
+
+
+def install_fake_oc(bin_dir):
+    """
+    Install fake_oc.py as 'oc' in the directory, run by this interpreter
+    """
+    source = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_oc.py")
+    path = os.path.join(bin_dir, "oc")
+    with open(source) as f, open(path, "w") as oc:
+        oc.write(f"#!{sys.executable} -S\n")
+        oc.write(f.read())
+    os.chmod(path, 0o755)
+
+
+def command_seconds():
+    """
+    Time spent in the executed commands so far
+    """
+    return sum(
+        histogram["sum"]
+        for histogram in metrics.registry.to_dict()["histograms"]
+        if histogram["name"] == "command_duration_seconds"
+    )
+
+
+def command_count():
+    return sum(
+        histogram["count"]
+        for histogram in metrics.registry.to_dict()["histograms"]
+        if histogram["name"] == "command_duration_seconds"
+    )
+
+
+def measure(func, rounds, setup=None):
+    """
+    Run the function rounds times
+    Returns:
+        dict: The best total time, the median Python side time (total minus
+            the time of the commands) in ms and the number of commands of one
+            call
+    """
+    totals, pythons, commands = [], [], 0
+    for _ in range(rounds):
+        arg = setup() if setup else None
+        metrics.registry.clear()
+        tracing.tracer.clear()
+        start = time.perf_counter()
+        func(arg) if setup else func()
+        total = time.perf_counter() - start
+        totals.append(total)
+        pythons.append(max(total - command_seconds(), 0))
+        commands = command_count()
+    return {
+        "total_ms": round(min(totals) * 1000, 3),
+        "python_ms": round(statistics.median(pythons) * 1000, 3),
+        "commands": commands,
+    }
+
+
+def nested_config(size, value):
+    return {
+        section: {
+            f"key_{i}": {
+                "value": f"{value}-{i}",
+                "list": [i, value],
+                "nested": {"a": i},
+            }
+            for i in range(size)
+        }
+        for section in ("ENV_DATA", "RUN", "DEPLOYMENT")
+    }
+
+
+def multicluster_config(size):
+    multicluster = MultiClusterConfig()
+    multicluster.multicluster = True
+    multicluster.nclusters = max(size, 2)
+    multicluster.init_cluster_configs()
+    return multicluster
+
+
+def benchmarks(size, template_dir):
+    """
+    Returns:
+        list: tuples of the benchmark name, function and optional setup
+            function whose result is passed to the function
+    """
+    pods = OCP(kind="Pod", namespace=NAMESPACE)
+    clusters = [
+        {
+            "name": f"cluster-{i}",
+            "labels": {f"label-{j}": f"value-{i}-{j}" for j in range(5)},
+        }
+        for i in range(size)
+    ]
+    multicluster = multicluster_config(size)
+    return [
+        ("OCP.get", lambda: pods.get(selector=SELECTOR), None),
+        (
+            "OCP.get_resource",
+            lambda: pods.get_resource("", "STATUS", selector=SELECTOR),
+            None,
+        ),
+        (
+            "OCP.wait_for_resource",
+            lambda: pods.wait_for_resource(
+                "Running", selector=SELECTOR, resource_count=size, timeout=60, sleep=0
+            ),
+            None,
+        ),
+        (
+            "PackageManifest.get",
+            lambda: PackageManifest(
+                resource_name=f"package-{size - 1}", selector=CATALOG_SELECTOR
+            ).get(),
+            None,
+        ),
+        (
+            "Templating.render_template",
+            lambda: templating.Templating(template_dir).render_template(
+                "bench.yaml.j2", {"clusters": clusters, "clusterset": "bench"}
+            ),
+            None,
+        ),
+        (
+            "MultiClusterConfig.switch_ctx",
+            lambda: [multicluster.switch_ctx(i) for i in range(multicluster.nclusters)],
+            None,
+        ),
+        (
+            "merge_dict",
+            lambda args: merge_dict(*args),
+            lambda: (nested_config(size, "orig"), nested_config(size, "new")),
+        ),
+    ]
+
+
+def compare(results, baseline, threshold, min_delta):
+    """
+    Print the Python side time of the results against the baseline
+    Returns:
+        int: Number of the benchmarks slower than threshold times the baseline
+            and by more than min_delta ms
+    """
+    previous = {(r["name"], r["size"]): r for r in baseline["results"]}
+    regressions = 0
+    print(f"\n{'benchmark':<32}{'size':>6}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for result in results:
+        old = previous.get((result["name"], result["size"]))
+        if not old:
+            continue
+        ratio = result["python_ms"] / max(old["python_ms"], 0.001)
+        regressed = (
+            ratio > threshold and result["python_ms"] - old["python_ms"] > min_delta
+        )
+        regressions += regressed
+        print(
+            f"{result['name']:<32}{result['size']:>6}{old['python_ms']:>10.2f}ms"
+            f"{result['python_ms']:>10.2f}ms{ratio:>7.2f}x"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 20, 100, 500])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Ratio to the baseline reported as a regression",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=float,
+        default=1.0,
+        help="Slowdown in ms below which a benchmark is not reported as a "
+        "regression, the timing noise of the sub-millisecond benchmarks",
+    )
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_ocp_")
+    bin_dir = os.path.join(work_dir, "bin")
+    fixtures_dir = os.path.join(work_dir, "fixtures")
+    os.makedirs(bin_dir)
+    os.makedirs(fixtures_dir)
+    install_fake_oc(bin_dir)
+    with open(os.path.join(work_dir, "bench.yaml.j2"), "w") as f:
+        f.write(TEMPLATE)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+    os.environ["FAKE_OC_FIXTURES"] = fixtures_dir
+    os.environ.pop("KUBECONFIG", None)
+    # measure the oc code paths, without any cache in between
+    config.update(
+        {
+            "RUN": {
+                "ocp_transport": "oc",
+                "wait_mode": "poll",
+                "informer_cache": False,
+                "memo_ttl": 0,
+            }
+        }
+    )
+
+    results = []
+    try:
+        print(
+            f"{'benchmark':<32}{'size':>6}{'total':>12}{'python':>12}{'oc calls':>10}"
+        )
+        for size in args.sizes:
+            write_fixtures(fixtures_dir, size)
+            for name, func, setup in benchmarks(size, work_dir):
+                result = dict(name=name, size=size, **measure(func, args.rounds, setup))
+                results.append(result)
+                print(
+                    f"{name:<32}{size:>6}{result['total_ms']:>10.2f}ms"
+                    f"{result['python_ms']:>10.2f}ms{result['commands']:>10}"
+                )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    summary = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "json_decoder": "orjson" if codec.orjson else "json",
+        "rounds": args.rounds,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold, args.min_delta)
+        if regressions:
+            print(f"\n{regressions} benchmarks regressed")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
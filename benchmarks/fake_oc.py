@@ -0,0 +1,86 @@
+"""
+Scripted stand-in for the 'oc' client used by the benchmarks: 'get' prints
+the fixtures of FAKE_OC_FIXTURES/<kind>.json ('-o json' or '-o yaml') or
+FAKE_OC_FIXTURES/<kind>.table (no '-o'), so the measured time is the Python
+side of the OCP helpers plus a constant process start.
+
+bench_ocp.py installs it as 'oc' in a temporary directory put first on PATH.
+"""
+import json
+import os
+import sys
+
+# Options taking a value, the value is the next argument unless given as
+# --option=value
+VALUE_OPTIONS = (
+    "--kubeconfig",
+    "-n",
+    "--namespace",
+    "-o",
+    "--output",
+    "-l",
+    "--selector",
+    "--field-selector",
+)
+
+
+def parse(args):
+    positional, options = [], {}
+    args = iter(args)
+    for arg in args:
+        if arg.startswith("-"):
+            option, has_value, value = arg.partition("=")
+            if option in VALUE_OPTIONS and not has_value:
+                value = next(args, "")
+            options[option] = value
+        else:
+            positional.append(arg)
+    return positional, options
+
+
+def fixture_path(kind, extension):
+    directory = os.environ["FAKE_OC_FIXTURES"]
+    kind = kind.split(".")[0].lower()
+    for name in (kind, kind[:-1] if kind.endswith("s") else kind):
+        path = os.path.join(directory, f"{name}.{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def main(args):
+    positional, options = parse(args)
+    if len(positional) < 2 or positional[0] != "get":
+        sys.stderr.write(f"error: unsupported fake oc command: {args}\n")
+        return 1
+    kind, name = positional[1], positional[2] if len(positional) > 2 else ""
+    if "/" in kind:
+        kind, name = kind.split("/", 1)
+    output = options.get("-o") or options.get("--output")
+    path = fixture_path(kind, "json" if output else "table")
+    if not path:
+        sys.stderr.write(f'error: the server doesn\'t have a resource type "{kind}"\n')
+        return 1
+    with open(path) as f:
+        if not output:
+            lines = f.read().splitlines()
+            rows = [lines[0]] + [
+                line for line in lines[1:] if not name or line.split()[0] == name
+            ]
+            sys.stdout.write("\n".join(rows) + "\n")
+            return 0
+        data = json.load(f)
+    if name:
+        data = next((i for i in data["items"] if i["metadata"]["name"] == name), None)
+        if data is None:
+            sys.stderr.write(
+                f'Error from server (NotFound): {kind} "{name}" not found\n'
+            )
+            return 1
+    # '-o yaml' is answered with JSON as well, which is valid YAML
+    sys.stdout.write(json.dumps(data, indent=4))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -26,6 +26,10 @@ setup(
         "botocore<1.21.0,>=1.20.112",
         "urllib3==1.25.11"
     ],
+    extras_require={
+        # faster decoding of the oc and API server output
+        "fast": ["orjson"],
+    },
     entry_points={
         "console_scripts": [
             "deploy-ocp=src.framework.deploy_ocp.main:main",
@@ -5,6 +5,7 @@ import multiprocessing as mp
 
 from src.utility.constants import BASIC_FORMAT
 from src.framework import config
+from src.framework.checkpoint import DeploymentState
 from src.utility import utils
 from src.utility.exceptions import CommandFailed
 from src.deployment.submariner import remove_aws_policy
@@ -31,6 +32,8 @@ def destroy_ocp(
             ),
             timeout=3600,
         )
+        # the deployment steps recorded for the cluster are gone with it
+        DeploymentState(cluster_path).clear()
     except CommandFailed as ex:
         logger.error("Unable to destroy ocp cluster.")
 
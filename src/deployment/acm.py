@@ -1,18 +1,15 @@
 import logging
 import os
 import base64
-import tempfile
 import time
-from subprocess import PIPE, Popen
 
-from src.framework import config
 from src.ocs.resources.package_manifest import PackageManifest
 from src.utility import constants, templating
 from src.utility.utils import load_auth_config, clone_repo
 from src.utility.cmd import exec_cmd
 from src.utility.exceptions import CommandFailed
-from src.ocs.resources.csv import CSV
-from src.ocs.ocp import OCP
+from src.ocs.resources.csv import CSV, is_csv_failed
+from src.ocs.ocp import OCP, invalidate_cluster_cache
 from src.deployment.operator_deployment import OperatorDeployment
 
 
@@ -20,18 +17,22 @@ logger = logging.getLogger(__name__)
 
 
 class ACMDeployment(OperatorDeployment):
-    def __init__(self):
-        super().__init__(constants.ACM_OPERATOR_NAMESPACE)
+    def __init__(self, ctx=None):
+        super().__init__(constants.ACM_OPERATOR_NAMESPACE, ctx)
 
     @staticmethod
-    def validate_acm_hub_install():
+    def validate_acm_hub_install(ctx=None):
         """
         Verify the ACM MultiClusterHub installation was successful.
+        Args:
+            ctx (ClusterContext): Context of the ACM hub cluster, the scoped
+                or the current cluster if not set
         """
         logger.info("Verify ACM MultiClusterHub Installation")
         acm_mch = OCP(
             kind=constants.ACM_MULTICLUSTER_HUB,
             namespace=constants.ACM_HUB_NAMESPACE,
+            ctx=ctx,
         )
         acm_mch.wait_for_resource(
             condition=constants.STATUS_RUNNING,
@@ -57,9 +58,7 @@ class ACMDeployment(OperatorDeployment):
         pw = base64.b64decode(docker_config)
         pw = pw.decode().replace("quay.io", "quay.io:443").encode()
         quay_token = base64.b64encode(pw).decode()
-        kubeconfig_location = os.path.join(
-            config.ENV_DATA["cluster_path"], "auth", "kubeconfig"
-        )
+        kubeconfig_location = self.ctx.kubeconfig
 
         logger.info("Setting env vars")
         env_vars = {
@@ -70,9 +69,10 @@ class ACMDeployment(OperatorDeployment):
             "DEBUG": "true",
             "KUBECONFIG": kubeconfig_location,
         }
-        for key, value in env_vars.items():
-            if value:
-                os.environ[key] = value
+        # passed to the deploy script only, the environment of this process
+        # is shared by the work on the other clusters
+        script_env = dict(os.environ)
+        script_env.update({key: value for key, value in env_vars.items() if value})
 
         logger.info("Writing pull-secret")
         _templating = templating.Templating(
@@ -90,60 +90,45 @@ class ACMDeployment(OperatorDeployment):
             f.write(data)
 
         logger.info("Creating ImageContentSourcePolicy")
-        exec_cmd(f"oc apply -f {constants.ACM_HUB_UNRELEASED_ICSP_YAML}")
+        self.apply(constants.ACM_HUB_UNRELEASED_ICSP_YAML)
 
         logger.info("Writing tag data to snapshot.ver")
-        image_tag = config.MULTICLUSTER.get(
+        image_tag = self.ctx.MULTICLUSTER.get(
             "acm_unreleased_image",
-            config.MULTICLUSTER.get("default_acm_unreleased_image"),
+            self.ctx.MULTICLUSTER.get("default_acm_unreleased_image"),
         )
         with open(os.path.join(acm_hub_deploy_dir, "snapshot.ver"), "w") as f:
             f.write(image_tag)
 
         logger.info("Running open-cluster-management deploy")
         cmd = ["./start.sh", "--silent"]
-        logger.info("Running cmd: %s", " ".join(cmd))
-        proc = Popen(
-            cmd,
-            cwd=acm_hub_deploy_dir,
-            stdout=PIPE,
-            stderr=PIPE,
-            encoding="utf-8",
-        )
-        stdout, stderr = proc.communicate()
-        logger.info(stdout)
-        if proc.returncode:
-            logger.error(stderr)
+        try:
+            exec_cmd(
+                cmd,
+                timeout=None,
+                cwd=acm_hub_deploy_dir,
+                env=script_env,
+                stream=True,
+            )
+        except CommandFailed as ex:
+            logger.error(ex)
             raise CommandFailed("open-cluster-management deploy script error")
+        finally:
+            invalidate_cluster_cache(self.ctx.kubeconfig)
 
-        self.validate_acm_hub_install()
+        self.validate_acm_hub_install(self.ctx)
 
     def deploy_acm_hub_released(self):
         """
         Handle ACM HUB released image deployment
         """
-        channel = config.MULTICLUSTER.get("acm_hub_channel")
-        logger.info("Creating ACM HUB namespace")
+        channel = self.ctx.MULTICLUSTER.get("acm_hub_channel")
         acm_hub_namespace_yaml_data = templating.load_yaml(constants.NAMESPACE_TEMPLATE)
         acm_hub_namespace_yaml_data["metadata"]["name"] = constants.ACM_HUB_NAMESPACE
-        acm_hub_namespace_manifest = tempfile.NamedTemporaryFile(
-            mode="w+", prefix="acm_hub_namespace_manifest", delete=False
-        )
-        templating.dump_data_to_temp_yaml(
-            acm_hub_namespace_yaml_data, acm_hub_namespace_manifest.name
-        )
-        exec_cmd(f"oc create -f {acm_hub_namespace_manifest.name}")
-
-        logger.info("Creating OperationGroup for ACM deployment")
         package_manifest = PackageManifest(
             resource_name=constants.ACM_HUB_OPERATOR_NAME,
+            ctx=self.ctx,
         )
-
-        exec_cmd(
-            f"oc create -f {constants.ACM_HUB_OPERATORGROUP_YAML} -n {constants.ACM_HUB_NAMESPACE}"
-        )
-
-        logger.info("Creating ACM HUB Subscription")
         acm_hub_subscription_yaml_data = templating.load_yaml(
             constants.ACM_HUB_SUBSCRIPTION_YAML
         )
@@ -153,22 +138,27 @@ class ACMDeployment(OperatorDeployment):
         ] = package_manifest.get_current_csv(
             channel=channel, csv_pattern=constants.ACM_HUB_OPERATOR_NAME
         )
-
-        acm_hub_subscription_manifest = tempfile.NamedTemporaryFile(
-            mode="w+", prefix="acm_hub_subscription_manifest", delete=False
+        logger.info(
+            "Creating ACM HUB namespace, OperatorGroup and Subscription for ACM "
+            "deployment"
         )
-        templating.dump_data_to_temp_yaml(
-            acm_hub_subscription_yaml_data, acm_hub_subscription_manifest.name
+        self.apply(
+            acm_hub_namespace_yaml_data,
+            constants.ACM_HUB_OPERATORGROUP_YAML,
+            acm_hub_subscription_yaml_data,
+            namespace=constants.ACM_HUB_NAMESPACE,
         )
-        exec_cmd(f"oc create -f {acm_hub_subscription_manifest.name}")
         logger.info("Sleeping for 90 seconds after subscribing to ACM")
         time.sleep(90)
         csv_name = package_manifest.get_current_csv(channel=channel)
-        csv = CSV(resource_name=csv_name, namespace=constants.ACM_HUB_NAMESPACE)
-        csv.wait_for_phase("Succeeded", timeout=720)
+        csv = CSV(
+            resource_name=csv_name, namespace=constants.ACM_HUB_NAMESPACE, ctx=self.ctx
+        )
+        csv.wait_for_phase("Succeeded", timeout=720, fatal=is_csv_failed)
         logger.info("ACM HUB Operator Deployment Succeeded")
         logger.info("Creating MultiCluster Hub")
-        exec_cmd(
-            f"oc create -f {constants.ACM_HUB_MULTICLUSTERHUB_YAML} -n {constants.ACM_HUB_NAMESPACE}"
+        self.apply(
+            constants.ACM_HUB_MULTICLUSTERHUB_YAML,
+            namespace=constants.ACM_HUB_NAMESPACE,
         )
-        self.validate_acm_hub_install()
+        self.validate_acm_hub_install(self.ctx)
@@ -1,12 +1,11 @@
 import logging
-import tempfile
 import time
 
 from src.ocs import ocp
-from src.ocs.resources.csv import CSV
+from src.ocs.applier import ManifestApplier
+from src.ocs.resources.csv import CSV, is_csv_failed
 from src.framework import config
 from src.utility import constants, templating, defaults
-from src.utility.cmd import exec_cmd
 from src.ocs.resources.package_manifest import PackageManifest
 from src.deployment.operator_deployment import OperatorDeployment
 from src.utility.exceptions import UnexpectedDeploymentConfiguration
@@ -15,10 +14,12 @@ logger = logging.getLogger(__name__)
 
 
 class GitopsDeployment(OperatorDeployment):
-    def __init__(self):
+    def __init__(self, ctx=None):
+        ctx = ctx or config.get_cluster_context()
         super().__init__(
-            config.ENV_DATA.get("gitops_install_namespace")
-            or constants.OPENSHIFT_OPERATORS
+            ctx.ENV_DATA.get("gitops_install_namespace")
+            or constants.OPENSHIFT_OPERATORS,
+            ctx,
         )
 
     def deploy_prereq(self):
@@ -32,19 +33,14 @@ class GitopsDeployment(OperatorDeployment):
         )
         package_manifest = PackageManifest(
             resource_name=constants.GITOPS_OPERATOR_NAME,
+            ctx=self.ctx,
         )
         gitops_subscription_yaml_data["spec"][
             "startingCSV"
         ] = package_manifest.get_current_csv(
             channel="latest", csv_pattern=constants.GITOPS_OPERATOR_NAME
         )
-        gitops_subscription_manifest = tempfile.NamedTemporaryFile(
-            mode="w+", prefix="gitops_subscription_manifest", delete=False
-        )
-        templating.dump_data_to_temp_yaml(
-            gitops_subscription_yaml_data, gitops_subscription_manifest.name
-        )
-        exec_cmd(f"oc apply -f {gitops_subscription_manifest.name}")
+        self.apply(gitops_subscription_yaml_data)
         self.wait_for_subscription(constants.GITOPS_OPERATOR_NAME)
         logger.info("Sleeping for 90 seconds after subscribing to GitOps Operator")
         time.sleep(90)
@@ -52,31 +48,29 @@ class GitopsDeployment(OperatorDeployment):
             kind=constants.SUBSCRIPTION_WITH_ACM,
             resource_name=constants.GITOPS_OPERATOR_NAME,
             namespace=constants.OPENSHIFT_OPERATORS,
+            ctx=self.ctx,
         ).get()
         gitops_csv_name = subscriptions["status"]["currentCSV"]
-        csv = CSV(resource_name=gitops_csv_name, namespace=constants.GITOPS_NAMESPACE)
-        csv.wait_for_phase("Succeeded", timeout=720)
+        csv = CSV(
+            resource_name=gitops_csv_name,
+            namespace=constants.GITOPS_NAMESPACE,
+            ctx=self.ctx,
+        )
+        csv.wait_for_phase("Succeeded", timeout=720, fatal=is_csv_failed)
         logger.info("GitOps Operator Deployment Succeeded")
 
     @staticmethod
-    def deploy_gitops(log_cli_level="INFO"):
-        logger.info("Creating GitOps CLuster Resource")
-        exec_cmd(f"oc apply -f {constants.GITOPS_CLUSTER_YAML}")
-
-        logger.info("Creating GitOps CLuster Placement Resource")
-        exec_cmd(f"oc apply -f {constants.GITOPS_PLACEMENT_YAML}")
-
-        logger.info("Creating ManagedClusterSetBinding")
-
+    def deploy_gitops(log_cli_level="INFO", ctx=None):
+        ctx = ctx or config.get_cluster_context()
         cluster_set = []
         managed_clusters = (
-            ocp.OCP(kind=constants.ACM_MANAGEDCLUSTER).get().get("items", [])
+            ocp.OCP(kind=constants.ACM_MANAGEDCLUSTER, ctx=ctx).get().get("items", [])
         )
         # ignore local-cluster here
         for i in managed_clusters:
             if (
                 i["metadata"]["name"] != constants.ACM_LOCAL_CLUSTER
-                or config.MULTICLUSTER["primary_cluster"]
+                or ctx.MULTICLUSTER["primary_cluster"]
             ):
                 cluster_set.append(
                     i["metadata"]["labels"][constants.ACM_CLUSTERSET_LABEL]
@@ -93,18 +87,21 @@ class GitopsDeployment(OperatorDeployment):
         )
         managedclustersetbinding_obj["metadata"]["name"] = cluster_set[0]
         managedclustersetbinding_obj["spec"]["clusterSet"] = cluster_set[0]
-        managedclustersetbinding = tempfile.NamedTemporaryFile(
-            mode="w+", prefix="managedcluster_setbinding", delete=False
+
+        logger.info(
+            "Creating GitOps Cluster, Placement and ManagedClusterSetBinding resources"
         )
-        templating.dump_data_to_temp_yaml(
-            managedclustersetbinding_obj, managedclustersetbinding.name
+        ManifestApplier(ctx).apply(
+            constants.GITOPS_CLUSTER_YAML,
+            constants.GITOPS_PLACEMENT_YAML,
+            managedclustersetbinding_obj,
         )
-        exec_cmd(f"oc apply -f {managedclustersetbinding.name}")
 
         gitops_obj = ocp.OCP(
             resource_name=constants.GITOPS_CLUSTER_NAME,
             namespace=constants.GITOPS_CLUSTER_NAMESPACE,
             kind=constants.GITOPS_CLUSTER,
+            ctx=ctx,
         )
         gitops_obj._has_phase = True
         gitops_obj.wait_for_phase("successful", timeout=720)
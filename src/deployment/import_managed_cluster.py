@@ -1,11 +1,9 @@
 import logging
 import os
-import tempfile
 
-import yaml
-
-from src.utility import templating
-from src.utility.utils import get_kube_config, exec_cmd
+from src.ocs.applier import ManifestApplier
+from src.utility import codec, templating
+from src.utility.utils import get_kube_config
 
 logger = logging.getLogger(__name__)
 
@@ -15,9 +13,18 @@ class ImportManagedCluster(object):
     Import as managed cluster for ACM
     """
 
-    def __init__(self, cluster_name, cluster_path):
+    def __init__(self, cluster_name, cluster_path, ctx=None):
+        """
+        Initializer function
+        Args:
+            cluster_name (str): Name of the cluster to import
+            cluster_path (str): Path to the directory of the cluster to import
+            ctx (ClusterContext): Context of the ACM hub cluster, the scoped
+                or the current cluster if not set
+        """
         self.cluster_name = cluster_name
         self.cluster_path = cluster_path
+        self.ctx = ctx
 
     def import_cluster(self):
         logger.info("Generating import-yaml")
@@ -29,12 +36,10 @@ class ImportManagedCluster(object):
                 "cluster_name": self.cluster_name,
             },
         )
-        import_cluster_obj = list(yaml.load_all(import_cluster_str, yaml.FullLoader))
+        import_cluster_obj = codec.loads_yaml_all(import_cluster_str)
         import_cluster_obj[1]["stringData"]["kubeconfig"] = get_kube_config(
             self.cluster_path
         )
-        import_cluster_temp = tempfile.NamedTemporaryFile(
-            mode="w+", prefix="aws_import_cluster", delete=False
-        )
-        templating.dump_data_to_temp_yaml(import_cluster_obj, import_cluster_temp.name)
-        exec_cmd(f"oc apply -f {import_cluster_temp.name}", timeout=2400)
+        # the Secret and KlusterletAddonConfig are applied once the
+        # ManagedCluster provides their namespace
+        ManifestApplier(self.ctx, timeout=2400).apply(import_cluster_obj)
@@ -1,10 +1,8 @@
 import logging
-import tempfile
 import time
 
 from src.framework import config
 from src.utility import constants, templating, defaults
-from src.utility.cmd import exec_cmd
 from src.ocs.resources.package_manifest import PackageManifest
 from src.ocs.resources.package_manifest import get_selector_for_ocs_operator
 from src.deployment.operator_deployment import OperatorDeployment
@@ -14,10 +12,11 @@ logger = logging.getLogger(__name__)
 
 
 class MCODeployment(OperatorDeployment):
-    def __init__(self):
+    def __init__(self, ctx=None):
+        ctx = ctx or config.get_cluster_context()
         super().__init__(
-            config.ENV_DATA.get("mco_install_namespace")
-            or constants.OPENSHIFT_OPERATORS
+            ctx.ENV_DATA.get("mco_install_namespace") or constants.OPENSHIFT_OPERATORS,
+            ctx,
         )
 
     def deploy_prereq(self):
@@ -27,23 +26,24 @@ class MCODeployment(OperatorDeployment):
         self.mco_subscription()
         # enable odf-multicluster-console plugin
         self.enable_console_plugin(
-            constants.MCO_PLUGIN_NAME, config.MULTICLUSTER.get("enable_mco_plugin")
+            constants.MCO_PLUGIN_NAME, self.ctx.MULTICLUSTER.get("enable_mco_plugin")
         )
 
     def mco_subscription(self):
         logger.info("Creating namespace and operator group.")
-        operator_selector = get_selector_for_ocs_operator()
+        operator_selector = get_selector_for_ocs_operator(self.ctx)
         mco_operator_name = defaults.MCO_OPERATOR_NAME
         subscription_file = constants.SUBSCRIPTION_MCO_YAML
         package_manifest = PackageManifest(
             resource_name=defaults.MCO_OPERATOR_NAME,
             selector=operator_selector,
+            ctx=self.ctx,
         )
         # Wait for package manifest is ready
         package_manifest.wait_for_resource(timeout=300)
         default_channel = package_manifest.get_default_channel()
         subscription_yaml_data = templating.load_yaml(subscription_file)
-        custom_channel = config.DEPLOYMENT.get("ocs_csv_channel")
+        custom_channel = self.ctx.DEPLOYMENT.get("ocs_csv_channel")
         if custom_channel:
             logger.info(f"Custom channel will be used: {custom_channel}")
             subscription_yaml_data["spec"]["channel"] = custom_channel
@@ -56,15 +56,9 @@ class MCODeployment(OperatorDeployment):
             subscription_yaml_data["spec"][
                 "startingCSV"
             ] = package_manifest.get_current_csv(channel=default_channel)
-        if config.DEPLOYMENT.get("stage"):
+        if self.ctx.DEPLOYMENT.get("stage"):
             subscription_yaml_data["spec"]["source"] = constants.OPERATOR_SOURCE_NAME
-        subscription_manifest = tempfile.NamedTemporaryFile(
-            mode="w+", prefix="subscription_manifest", delete=False
-        )
-        templating.dump_data_to_temp_yaml(
-            subscription_yaml_data, subscription_manifest.name
-        )
-        exec_cmd(f"oc apply -f {subscription_manifest.name}")
+        self.apply(subscription_yaml_data)
         self.wait_for_subscription(mco_operator_name)
         self.wait_for_csv(mco_operator_name)
         logger.info("Sleeping for 30 seconds after CSV created")
@@ -1,7 +1,6 @@
 import os
 import logging
 import json
-import yaml
 import shutil
 
 from src.utility.retry import retry
@@ -9,16 +8,17 @@ from src.framework import config
 from src.utility import utils
 from src.utility import constants
 from src.utility.exceptions import PullSecretNotFoundException, CommandFailed
-from src.utility import templating
+from src.utility import codec, templating
 
 logger = logging.getLogger(__name__)
 
 
 class OCPDeployment:
-    def __init__(self, cluster_name, cluster_path):
+    def __init__(self, cluster_name, cluster_path, ctx=None):
         self.cluster_name = cluster_name
         self.cluster_path = cluster_path
         self.installer_binary_path = ""
+        self.ctx = ctx or config.get_cluster_context()
 
     def deploy_prereq(self):
         # download openshift installer
@@ -26,13 +26,13 @@ class OCPDeployment:
         # create config
         self.create_config()
 
-    @retry(CommandFailed, tries=5, delay=60, backoff=1)
+    @retry(CommandFailed, tries=5, delay=60, backoff=1, jitter=False)
     def download_installer(self):
         return utils.download_installer(
-            version=config.DEPLOYMENT["installer_version"],
-            bin_dir=config.RUN["bin_dir"],
-            force_download=config.DEPLOYMENT["force_download_installer"],
-            verify_ssl_certificate=config.RUN["https_certification_verification"],
+            version=self.ctx.DEPLOYMENT["installer_version"],
+            bin_dir=self.ctx.RUN["bin_dir"],
+            force_download=self.ctx.DEPLOYMENT["force_download_installer"],
+            verify_ssl_certificate=self.ctx.RUN["https_certification_verification"],
         )
 
     def get_pull_secret(self):
@@ -59,7 +59,7 @@ class OCPDeployment:
         Returns:
             str: public ssh key or empty string if not found
         """
-        ssh_key = os.path.expanduser(config.DEPLOYMENT.get("ssh_key"))
+        ssh_key = os.path.expanduser(self.ctx.DEPLOYMENT.get("ssh_key"))
         if not os.path.isfile(ssh_key):
             return ""
         with open(ssh_key, "r") as fs:
@@ -70,25 +70,25 @@ class OCPDeployment:
         """
         Create the OCP deploy config
         """
-        deployment_platform = config.ENV_DATA["platform"]
+        deployment_platform = self.ctx.ENV_DATA["platform"]
         # Generate install-config from template
         logger.info("Generating install-config")
         _templating = templating.Templating()
         ocp_install_template = f"install-config-{deployment_platform.lower()}.yaml.j2"
         ocp_install_template_path = os.path.join(ocp_install_template)
         install_config_str = _templating.render_template(
-            ocp_install_template_path, config.ENV_DATA
+            ocp_install_template_path, self.ctx.ENV_DATA
         )
         # Log the install-config *before* adding the pull secret,
         # so we don't leak sensitive data.
         logger.info(f"Install config: \n{install_config_str}")
         # Parse the rendered YAML so that we can manipulate the object directly
-        install_config_obj = yaml.safe_load(install_config_str)
+        install_config_obj = codec.loads_yaml(install_config_str)
         install_config_obj["pullSecret"] = self.get_pull_secret()
         ssh_key = self.get_ssh_key()
         if ssh_key:
             install_config_obj["sshKey"] = ssh_key
-        install_config_str = yaml.safe_dump(install_config_obj)
+        install_config_str = codec.dumps_yaml(install_config_obj)
         install_config_path = os.path.join(self.cluster_path, "install-config.yaml")
         # create cluster directory
         if not os.path.exists(self.cluster_path):
@@ -108,6 +108,8 @@ class OCPDeployment:
                     log_level=log_cli_level,
                 ),
                 timeout=3600,
+                stream=True,
             )
         except CommandFailed as ex:
             logger.error("Unable to deploy ocp cluster.")
+            raise
@@ -1,11 +1,8 @@
 import logging
-import tempfile
 import time
 
 from src.ocs import ocp
-from src.framework import config
 from src.utility import constants, templating, version, defaults
-from src.utility.cmd import exec_cmd
 
 from src.ocs.resources.package_manifest import PackageManifest
 from src.ocs.resources.package_manifest import get_selector_for_ocs_operator
@@ -18,8 +15,8 @@ logger = logging.getLogger(__name__)
 
 
 class OCSDeployment(OperatorDeployment):
-    def __init__(self):
-        super().__init__(constants.OPENSHIFT_STORAGE_NAMESPACE)
+    def __init__(self, ctx=None):
+        super().__init__(constants.OPENSHIFT_STORAGE_NAMESPACE, ctx)
 
     def deploy_prereq(self):
         # create OCS catalog source
@@ -28,17 +25,19 @@ class OCSDeployment(OperatorDeployment):
         self.ocs_subscription()
         # enable odf-console plugin
         self.enable_console_plugin(
-            constants.OCS_PLUGIN_NAME, config.ENV_DATA.get("enable_ocs_plugin")
+            constants.OCS_PLUGIN_NAME, self.ctx.ENV_DATA.get("enable_ocs_plugin")
         )
         # label nodes
         self.label_nodes()
 
     def ocs_subscription(self):
         logger.info("Creating namespace and operator group.")
-        exec_cmd(f"oc apply -f {constants.OLM_YAML}")
-        operator_selector = get_selector_for_ocs_operator()
+        self.apply(constants.OLM_YAML)
+        operator_selector = get_selector_for_ocs_operator(self.ctx)
         # For OCS version >= 4.9, we have odf-operator
-        ocs_version = version.get_semantic_ocs_version_from_config()
+        ocs_version = version.get_semantic_version(
+            self.ctx.ENV_DATA["ocs_version"], True
+        )
         if ocs_version >= version.VERSION_4_9:
             ocs_operator_name = defaults.ODF_OPERATOR_NAME
             subscription_file = constants.SUBSCRIPTION_ODF_YAML
@@ -48,34 +47,29 @@ class OCSDeployment(OperatorDeployment):
         package_manifest = PackageManifest(
             resource_name=ocs_operator_name,
             selector=operator_selector,
+            ctx=self.ctx,
         )
         # Wait for package manifest is ready
         package_manifest.wait_for_resource(timeout=300)
         default_channel = package_manifest.get_default_channel()
         subscription_yaml_data = templating.load_yaml(subscription_file)
-        custom_channel = config.DEPLOYMENT.get("ocs_csv_channel")
+        custom_channel = self.ctx.DEPLOYMENT.get("ocs_csv_channel")
         if custom_channel:
             logger.info(f"Custom channel will be used: {custom_channel}")
             subscription_yaml_data["spec"]["channel"] = custom_channel
         else:
             logger.info(f"Default channel will be used: {default_channel}")
             subscription_yaml_data["spec"]["channel"] = default_channel
-        if config.DEPLOYMENT.get("stage"):
+        if self.ctx.DEPLOYMENT.get("stage"):
             subscription_yaml_data["spec"]["source"] = constants.OPERATOR_SOURCE_NAME
-        subscription_manifest = tempfile.NamedTemporaryFile(
-            mode="w+", prefix="subscription_manifest", delete=False
-        )
-        templating.dump_data_to_temp_yaml(
-            subscription_yaml_data, subscription_manifest.name
-        )
-        exec_cmd(f"oc apply -f {subscription_manifest.name}")
+        self.apply(subscription_yaml_data)
         self.wait_for_subscription(ocs_operator_name)
         self.wait_for_csv(ocs_operator_name)
         logger.info("Sleeping for 30 seconds after CSV created")
         time.sleep(30)
 
     def label_nodes(self):
-        nodes = ocp.OCP(kind="node").get().get("items", [])
+        nodes = ocp.OCP(kind="node", ctx=self.ctx).get().get("items", [])
         worker_nodes = [
             node
             for node in nodes
@@ -108,7 +102,7 @@ class OCSDeployment(OperatorDeployment):
             raise UnavailableResourceException(
                 f"Not enough distributed worker nodes: {distributed_worker_count} to label: "
             )
-        _ocp = ocp.OCP(kind="node")
+        _ocp = ocp.OCP(kind="node", ctx=self.ctx)
         workers_to_label = " ".join(distributed_worker_nodes[:to_label])
         if workers_to_label:
             logger.info(
@@ -121,7 +115,7 @@ class OCSDeployment(OperatorDeployment):
                     f"{constants.OPERATOR_NODE_LABEL} --overwrite"
                 )
             ]
-            if config.DEPLOYMENT.get("infra_nodes") and not config.ENV_DATA.get(
+            if self.ctx.DEPLOYMENT.get("infra_nodes") and not self.ctx.ENV_DATA.get(
                 "infra_replicas"
             ):
                 logger.info(
@@ -157,7 +151,7 @@ class OCSDeployment(OperatorDeployment):
     def deploy_ocs(kubeconfig, skip_cluster_creation):
         # Do not access framework.config directly inside deploy_ocs, it is not thread safe
         if not skip_cluster_creation:
-            exec_cmd(
-                f"oc apply -f {constants.STORAGE_CLUSTER_YAML} --kubeconfig {kubeconfig}"
+            ocp.OCP(cluster_kubeconfig=kubeconfig).exec_oc_cmd(
+                f"apply -f {constants.STORAGE_CLUSTER_YAML}", out_yaml_format=False
             )
             OCSDeployment.verify_storage_cluster(kubeconfig)
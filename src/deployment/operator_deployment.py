@@ -1,38 +1,73 @@
 import os
 import logging
-import tempfile
 
 from src.framework import config
-from src.utility.cmd import exec_cmd
 from src.utility import constants, templating
 from src.ocs.resources.catalog_source import disable_specific_source
 from src.ocs.resources.catalog_source import CatalogSource
 from src.utility.utils import (
-    get_kube_config_path,
     create_directory_path,
     wait_for_machineconfigpool_status,
 )
 from src.utility.timeout import TimeoutSampler
 from src.utility.exceptions import CommandFailed
 from src.ocs import ocp
+from src.ocs.applier import ManifestApplier
 
 logger = logging.getLogger(__name__)
 
 
-def get_and_apply_icsp_from_catalog(apply=True):
+def get_and_apply_icsp_from_catalog(apply=True, ctx=None):
     """
     Args:
         apply (bool): controls if the ICSP should be applied or not
             (default: true)
+        ctx (ClusterContext): Context of the cluster, the scoped or the
+            current cluster if not set
     """
     if apply:
-        exec_cmd(f"oc apply -f {constants.ODF_ICSP_YAML}")
-        wait_for_machineconfigpool_status("all")
+        ManifestApplier(ctx).apply(constants.ODF_ICSP_YAML)
+        wait_for_machineconfigpool_status("all", ctx=ctx)
 
 
 class OperatorDeployment(object):
-    def __init__(self, namespace):
+    def __init__(self, namespace, ctx=None):
+        """
+        Initializer function
+        Args:
+            namespace (str): Namespace of the operator
+            ctx (ClusterContext): Context of the cluster to deploy the
+                operator on, the scoped or the current cluster if not set
+        """
         self.namespace = namespace
+        self.ctx = ctx or config.get_cluster_context()
+
+    def exec_oc_cmd(self, command, **kwargs):
+        """
+        Run the 'oc' command against the cluster of this deployment
+        Args:
+            command (str): The command without the initial 'oc'
+        Returns:
+            CompletedProcess: The completed 'oc' process
+        """
+        return ocp.OCP(ctx=self.ctx).exec_oc_cmd(
+            command, out_yaml_format=False, **kwargs
+        )
+
+    def apply(self, *manifests, namespace=None, **kwargs):
+        """
+        Apply the manifests to the cluster of this deployment
+        Args:
+            manifests (str, dict or list): Paths to YAML files, objects or
+                lists of them
+            namespace (str): Namespace of the objects which don't set one
+            kwargs: Passed to ManifestApplier, e.g. the 'oc apply' timeout
+        Returns:
+            list: The apply results of the objects
+        """
+        return ManifestApplier(self.ctx, **kwargs).apply(
+            *manifests, namespace=namespace
+        )
 
     def create_catalog_source(self, image=None):
         """
@@ -46,11 +81,10 @@ class OperatorDeployment(object):
         # default sources. This should not be an issue as OCS internal registry images
         # are now based on OCP registry image
         disable_specific_source(
-            constants.OPERATOR_CATALOG_SOURCE_NAME,
-            get_kube_config_path(config.ENV_DATA["cluster_path"]),
+            constants.OPERATOR_CATALOG_SOURCE_NAME, self.ctx.kubeconfig
         )
         logger.info("Adding CatalogSource")
-        image = image or config.ENV_DATA.get("ocs_registry_image", "")
+        image = image or self.ctx.ENV_DATA.get("ocs_registry_image", "")
         image_and_tag = image.rsplit(":", 1)
         image = image_and_tag[0]
         image_tag = image_and_tag[1] if len(image_and_tag) == 2 else None
@@ -62,23 +96,18 @@ class OperatorDeployment(object):
             and catalog_source_data["metadata"]["name"] == cs_name
         )
         if change_cs_condition:
-            default_image = config.ENV_DATA["default_ocs_registry_image"]
+            default_image = self.ctx.ENV_DATA["default_ocs_registry_image"]
             image = image if image else default_image.rsplit(":", 1)[0]
             catalog_source_data["spec"][
                 "image"
             ] = f"{image}:{image_tag if image_tag else 'latest'}"
         # apply icsp
-        get_and_apply_icsp_from_catalog()
-        catalog_source_manifest = tempfile.NamedTemporaryFile(
-            mode="w+", prefix="catalog_source_manifest", delete=False
-        )
-        templating.dump_data_to_temp_yaml(
-            catalog_source_data, catalog_source_manifest.name
-        )
-        exec_cmd(f"oc apply -f {catalog_source_manifest.name}", timeout=2400)
+        get_and_apply_icsp_from_catalog(ctx=self.ctx)
+        self.apply(catalog_source_data, timeout=2400)
         catalog_source = CatalogSource(
             resource_name=constants.OPERATOR_CATALOG_SOURCE_NAME,
             namespace=constants.MARKETPLACE_NAMESPACE,
+            ctx=self.ctx,
         )
         # Wait for catalog source is ready
         catalog_source.wait_for_state("READY")
@@ -91,11 +120,12 @@ class OperatorDeployment(object):
         """
 
         resource_kind = constants.SUBSCRIPTION
-        ocp.OCP(kind=resource_kind, namespace=self.namespace)
-        for sample in TimeoutSampler(
-            300, 10, ocp.OCP, kind=resource_kind, namespace=self.namespace
-        ):
-            subscriptions = sample.get().get("items", [])
+        subscription_obj = ocp.OCP(
+            kind=resource_kind, namespace=self.namespace, ctx=self.ctx
+        )
+        # sample the list, so the interval is reset when it changes
+        for sample in TimeoutSampler(300, 10, subscription_obj.get):
+            subscriptions = sample.get("items", [])
             for subscription in subscriptions:
                 found_subscription_name = subscription.get("metadata", {}).get(
                     "name", ""
@@ -111,11 +141,9 @@ class OperatorDeployment(object):
         Args:
             csv_name (str): CSV name pattern
         """
-        ocp.OCP(kind="subscription", namespace=self.namespace)
-        for sample in TimeoutSampler(
-            300, 10, ocp.OCP, kind="csv", namespace=self.namespace
-        ):
-            csvs = sample.get().get("items", [])
+        csv_obj = ocp.OCP(kind="csv", namespace=self.namespace, ctx=self.ctx)
+        for sample in TimeoutSampler(300, 10, csv_obj.get):
+            csvs = sample.get("items", [])
             for csv in csvs:
                 found_csv_name = csv.get("metadata", {}).get("name", "")
                 if csv_name in found_csv_name:
@@ -130,7 +158,7 @@ class OperatorDeployment(object):
         if enable_console:
             try:
                 logger.info("Enabling console plugin")
-                ocp_obj = ocp.OCP()
+                ocp_obj = ocp.OCP(ctx=self.ctx)
                 patch = (
                     '\'[{"op": "add", "path": "/spec/plugins/-", "value": "$name"}]\''
                 )
@@ -1,37 +1,75 @@
-import tempfile
+import asyncio
 import logging
-import yaml
-from yaml.loader import SafeLoader
-from src.utility.cmd import exec_cmd
-from src.utility import templating
+from src.ocs import ocp
+from src.ocs.applier import ManifestApplier
+from src.utility import codec
 from src.utility import constants
 
 logger = logging.getLogger(__name__)
 
+INGRESS_CA_BUNDLE_CMD = (
+    "get cm default-ingress-cert -n openshift-config-managed "
+    "-o jsonpath=\"{['data']['ca-bundle\\.crt']}\""
+)
+
 
 class SSLCertificate(object):
     def __init__(self):
         self.ssl_certificate = ""
-        self.ssl_certificate_path = ""
+        self.ssl_certificate_manifest = None
 
-    def get_certificate(self):
-        result = exec_cmd(
-            "oc get cm default-ingress-cert -n openshift-config-managed -o jsonpath=\"{['data']['ca-bundle\.crt']}\""
+    def get_certificate(self, ctx=None):
+        """
+        Fetch the ingress CA bundle of the cluster
+        Args:
+            ctx (ClusterContext): Context of the cluster, the scoped or the
+                current cluster if not set
+        """
+        result = ocp.OCP(ctx=ctx).exec_oc_cmd(
+            INGRESS_CA_BUNDLE_CMD, out_yaml_format=False
         )
         self.ssl_certificate += result.stdout.decode("utf-8")
 
-    def get_certificate_file_path(self):
-        cert_file = tempfile.NamedTemporaryFile(
-            mode="w+", prefix="ssl_cert", delete=False
-        )
-        f = open(constants.SSL_CERTIFICATE_YAML, "r")
-        ssl_certificate = yaml.load(f, Loader=SafeLoader)
+    def get_certificates(self, contexts):
+        """
+        Fetch the ingress CA bundles of the clusters concurrently
+        Args:
+            contexts (list): ClusterContext of the clusters
+        """
+
+        async def fetch_all():
+            return await asyncio.gather(
+                *(
+                    ocp.OCP(ctx=ctx).exec_oc_cmd_async(
+                        INGRESS_CA_BUNDLE_CMD, out_yaml_format=False
+                    )
+                    for ctx in contexts
+                )
+            )
+
+        for result in asyncio.run(fetch_all()):
+            self.ssl_certificate += result.stdout.decode("utf-8")
+
+    def get_certificate_manifest(self):
+        """
+        Build the user-ca-bundle ConfigMap of the collected CA bundles
+        Returns:
+            dict: The ConfigMap
+        """
+        ssl_certificate = codec.load_yaml_file(constants.SSL_CERTIFICATE_YAML)
         ssl_certificate["data"]["ca-bundle.crt"] = self.ssl_certificate
-        templating.dump_data_to_temp_yaml(ssl_certificate, cert_file.name)
-        self.ssl_certificate_path = cert_file.name
+        self.ssl_certificate_manifest = ssl_certificate
+        return ssl_certificate
 
-    def exchange_certificate(self):
-        exec_cmd(f"oc create -f {self.ssl_certificate_path}")
-        exec_cmd(
-            'oc patch proxy cluster --type=merge  --patch=\'{"spec":{"trustedCA":{"name":"user-ca-bundle"}}}\''
+    def exchange_certificate(self, ctx=None):
+        """
+        Trust the collected CA bundles on the cluster
+        Args:
+            ctx (ClusterContext): Context of the cluster, the scoped or the
+                current cluster if not set
+        """
+        ManifestApplier(ctx).apply(self.ssl_certificate_manifest)
+        ocp.OCP(ctx=ctx).exec_oc_cmd(
+            'patch proxy cluster --type=merge  --patch=\'{"spec":{"trustedCA":{"name":"user-ca-bundle"}}}\'',
+            out_yaml_format=False,
         )
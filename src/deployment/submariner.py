@@ -3,23 +3,32 @@ import logging
 import requests
 import tempfile
 import os
+import shutil
 import boto3
-from src.utility.retry import retry
+from src.utility.retry import cluster_budget, retry
 from botocore.exceptions import ClientError
 from src.framework import config
+from src.utility.binary_store import get_binary_store
+from src.ocs.ocp import invalidate_cluster_cache
 from src.utility.cmd import exec_cmd
 from src.utility.nodes import get_typed_worker_nodes
-from src.utility.exceptions import CommandFailed, DRPrimaryNotFoundException
+from src.utility.exceptions import (
+    CommandFailed,
+    DRPrimaryNotFoundException,
+    ResourceWrongStatusException,
+)
 from src.utility import constants
 from src.utility.utils import (
-    get_non_acm_cluster_config,
-    get_kube_config_path,
+    get_non_acm_cluster_contexts,
     delete_file_with_prefix,
+    download_file,
     get_cluster_metadata,
 )
 
 logger = logging.getLogger(__name__)
 iam = boto3.client("iam")
+# Seconds the latest subctl release in the binary store is used
+SUBCTL_LATEST_MAX_AGE = 86400
 
 
 def get_api_username(cluster_name):
@@ -57,7 +66,7 @@ def get_aws_user_id():
 
 def assign_aws_policy(cluster_name):
     try:
-        print("Assigning a policy to aws API user")
+        logger.info("Assigning a policy to aws API user")
         policy = (
             "arn:aws:iam::"
             + get_aws_user_id()
@@ -73,7 +82,7 @@ def assign_aws_policy(cluster_name):
 
 def remove_aws_policy(cluster_name):
     try:
-        print("Removing a policy to aws API user")
+        logger.info("Removing a policy to aws API user")
         policy = (
             "arn:aws:iam::"
             + get_aws_user_id()
@@ -114,7 +123,11 @@ def run_subctl_cmd(cmd=None):
         cmd: subctl command to be executed
     """
     cmd = " ".join(["subctl", cmd])
-    exec_cmd(cmd)
+    try:
+        exec_cmd(cmd, stream=True)
+    finally:
+        # subctl changes the clusters with its own client
+        invalidate_cluster_cache()
 
 
 class Submariner(object):
@@ -122,9 +135,11 @@ class Submariner(object):
     Submariner configuaration and deployment
     """
 
-    def __init__(self):
+    def __init__(self, ctx=None):
+        # Context of the ACM hub cluster which drives the configuration
+        self.ctx = ctx or config.get_cluster_context()
         # whether upstream OR downstream
-        self.source = config.MULTICLUSTER["submariner_source"]
+        self.source = self.ctx.MULTICLUSTER["submariner_source"]
         # Designated broker cluster index where broker will be deployed
         self.designated_broker_cluster_index = self.get_primary_cluster_index()
         # sequence number for the clusters from submariner perspective
@@ -147,86 +162,118 @@ class Submariner(object):
 
     def download_binary(self):
         if self.source == "upstream":
-            # This script puts the platform specific binary in ~/.local/bin
-            # we need to move the subctl binary to ocs-ci/bin dir
-            downloader_prefix = "submariner_downloader_"
-            try:
+            # The downloader script installs the subctl of VERSION in DESTDIR,
+            # the binary store keeps it for the next runs
+            version = self.ctx.MULTICLUSTER.get("submariner_version") or "latest"
+
+            def fetch(directory):
                 submarier_url = (
-                    config.MULTICLUSTER["submariner_url"]
+                    self.ctx.MULTICLUSTER["submariner_url"]
                     or constants.SUBMARINER_DOWNLOAD_URL
                 )
-                resp = requests.get(submarier_url)
-            except requests.ConnectionError:
-                logger.error(
-                    "Failed to download the downloader script from submariner site"
-                )
-                raise
-            delete_file_with_prefix(downloader_prefix)
-            tempf = tempfile.NamedTemporaryFile(
-                dir=".", mode="wb", prefix=downloader_prefix, delete=False
+                with tempfile.TemporaryDirectory() as download_dir:
+                    script = os.path.join(download_dir, "get-subctl.sh")
+                    try:
+                        download_file(submarier_url, script)
+                    except (ResourceWrongStatusException, requests.RequestException):
+                        logger.error(
+                            "Failed to download the downloader script from "
+                            "submariner site"
+                        )
+                        raise
+                    # Actual submariner binary download
+                    try:
+                        exec_cmd(
+                            f"bash {script}",
+                            env=dict(os.environ, DESTDIR=download_dir, VERSION=version),
+                        )
+                    except CommandFailed:
+                        logger.error("Failed to download submariner binary")
+                        raise
+                    shutil.copy2(
+                        os.path.realpath(os.path.join(download_dir, "subctl")),
+                        os.path.join(directory, "subctl"),
+                    )
+
+            store = get_binary_store()
+            subctl = store.get(
+                "subctl",
+                version,
+                fetch,
+                # the latest release is looked up again once a day
+                max_age=SUBCTL_LATEST_MAX_AGE if version == "latest" else None,
             )
-            tempf.write(resp.content)
-
-            # Actual submariner binary download
-            cmd = f"bash {tempf.name}"
-            try:
-                exec_cmd(cmd)
-            except CommandFailed:
-                logger.error("Failed to download submariner binary")
-                raise
-
-            # Copy submariner from ~/.local/bin to ocs-ci/bin
-            # ~/.local/bin is the default path selected by submariner script
-            dest_path = os.path.join(config.RUN["bin_dir"], "subctl")
-            if not os.path.exists(dest_path):
-                os.symlink(
-                    os.path.expanduser("~/.local/bin/subctl"),
-                    dest_path,
-                )
-
-    @retry(CommandFailed, tries=5, delay=60, backoff=1)
+            store.link(subctl, self.ctx.RUN["bin_dir"])
+
+    @retry(
+        CommandFailed,
+        tries=None,
+        delay=15,
+        max_delay=120,
+        deadline=300,
+        budget=lambda self, cluster: cluster_budget(cluster.kubeconfig),
+    )
     def join_cluster(self, cluster):
         # Join all the clusters (except ACM cluster in case of hub deployment)
-        cluster_index = cluster.MULTICLUSTER["multicluster_index"]
-        if (
-            cluster_index != config.get_acm_index()
-            or config.MULTICLUSTER["primary_cluster"]
-        ):
+        if not cluster.acm_cluster or cluster.primary_cluster:
             join_cmd = (
-                f"join --kubeconfig {get_kube_config_path(cluster.ENV_DATA['cluster_path'])} "
-                f"{config.MULTICLUSTER['submariner_info_file']} "
+                f"join --kubeconfig {cluster.kubeconfig} "
+                f"{cluster.MULTICLUSTER['submariner_info_file']} "
                 f"--clusterid c{self.cluster_seq}"
             )
             run_subctl_cmd(
                 join_cmd,
             )
-            logger.info(f"Subctl join succeeded for {cluster.ENV_DATA['cluster_name']}")
+            logger.info(f"Subctl join succeeded for {cluster.name}")
             self.cluster_seq = self.cluster_seq + 1
-            self.dr_only_list.append(cluster_index)
-
-    @retry(CommandFailed, tries=5, delay=30, backoff=1)
+            self.dr_only_list.append(cluster.index)
+
+    @retry(
+        CommandFailed,
+        tries=None,
+        delay=10,
+        max_delay=60,
+        deadline=150,
+        budget=lambda self: cluster_budget(
+            config.get_cluster_context(self.designated_broker_cluster_index).kubeconfig
+        ),
+    )
     def deploy_broker(self):
         # Deploy broker on designated cluster
-        # follow this config switch statement carefully to be mindful
-        # about the context with which we are performing the operations
-        config.switch_ctx(self.designated_broker_cluster_index)
-        logger.info(f"Switched context: {config.cluster_ctx.ENV_DATA['cluster_name']}")
+        broker = config.get_cluster_context(self.designated_broker_cluster_index)
+        logger.info(f"Deploying broker on cluster: {broker.name}")
         delete_file_with_prefix("broker-info.subm")
-        deploy_broker_cmd = "deploy-broker"
+        deploy_broker_cmd = f"deploy-broker --kubeconfig {broker.kubeconfig}"
         run_subctl_cmd(deploy_broker_cmd)
 
-    @retry(CommandFailed, tries=5, delay=30, backoff=1)
+    @retry(
+        CommandFailed,
+        tries=None,
+        delay=10,
+        max_delay=60,
+        deadline=150,
+        budget=lambda self, cluster: cluster_budget(cluster.kubeconfig),
+    )
     def prepare_aws_cloud(self, cluster):
-        infra_id = get_infra_id(cluster.ENV_DATA["cluster_path"])
-        prepare_cmd = f'cloud prepare aws --ocp-metadata {cluster.ENV_DATA["cluster_path"]}/metadata.json  --region {cluster.ENV_DATA["region"]}'
+        infra_id = get_infra_id(cluster.cluster_path)
+        prepare_cmd = (
+            f"cloud prepare aws --kubeconfig {cluster.kubeconfig} "
+            f"--ocp-metadata {cluster.cluster_path}/metadata.json  "
+            f"--region {cluster.ENV_DATA['region']}"
+        )
         run_subctl_cmd(prepare_cmd)
 
-    @retry(CommandFailed, tries=5, delay=60, backoff=1)
+    @retry(
+        CommandFailed,
+        tries=None,
+        delay=15,
+        max_delay=120,
+        deadline=300,
+        budget=lambda self: cluster_budget(self.ctx.kubeconfig),
+    )
     def verify_connections(self):
         for i in self.dr_only_list:
-            kube_config_path = get_kube_config_path(
-                config.clusters[i].ENV_DATA["cluster_path"]
-            )
+            kube_config_path = config.get_cluster_context(i).kubeconfig
             connect_check = f"show connections --kubeconfig {kube_config_path}"
             run_subctl_cmd(connect_check)
 
@@ -241,17 +288,14 @@ class Submariner(object):
 
         self.deploy_broker()
         create_aws_policy()
-        restore_index = config.cur_index
-        for cluster in get_non_acm_cluster_config(True):
-            config.switch_ctx(cluster.MULTICLUSTER["multicluster_index"])
-            assign_aws_policy(cluster.ENV_DATA["cluster_name"])
+        for cluster in get_non_acm_cluster_contexts(True):
+            assign_aws_policy(cluster.name)
             try:
                 self.prepare_aws_cloud(cluster)
                 self.join_cluster(cluster)
             except CommandFailed:
                 logger.error("Unable to prepare aws cloud for submariner")
                 raise
-        config.switch_ctx(restore_index)
         # verify command throws error
         self.verify_connections()
 
@@ -8,10 +8,13 @@ under section PYTEST_DONT_REWRITE
 # Use the new python 3.7 dataclass decorator, which provides an object similar
 # to a namedtuple, but allows type enforcement and defining methods.
 import os
-import yaml
 import logging
+import contextvars
 from collections.abc import Mapping
+from contextlib import contextmanager
 from dataclasses import dataclass, field, fields
+from types import MappingProxyType
+from src.utility import codec
 from src.utility.exceptions import ClusterNotFoundException
 
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -19,6 +22,9 @@ DEFAULT_CONFIG_PATH = os.path.join(THIS_DIR, "conf/default_config.yaml")
 
 logger = logging.getLogger(__name__)
 
+# Cluster context of the current thread or asyncio task, see cluster_scope
+_scoped_context = contextvars.ContextVar("cluster_context", default=None)
+
 
 @dataclass
 class Config:
@@ -44,11 +50,10 @@ class Config:
         """
         Return a fresh copy of the default configuration
         """
-        with open(DEFAULT_CONFIG_PATH) as file_stream:
-            return {
-                k: (v if v is not None else {})
-                for (k, v) in yaml.safe_load(file_stream).items()
-            }
+        return {
+            k: (v if v is not None else {})
+            for (k, v) in codec.load_yaml_file(DEFAULT_CONFIG_PATH).items()
+        }
 
     def update(self, user_dict: dict):
         """
@@ -113,9 +118,88 @@ def merge_dict(orig: dict, new: dict) -> dict:
     return orig
 
 
+def freeze(data):
+    """
+    Read-only copy of the configuration data: dicts become read-only
+    mappings and lists become tuples
+    """
+    if isinstance(data, Mapping):
+        return MappingProxyType({k: freeze(v) for k, v in data.items()})
+    if isinstance(data, list):
+        return tuple(freeze(v) for v in data)
+    return data
+
+
+@dataclass(frozen=True)
+class ClusterContext:
+    """
+    Immutable snapshot of the configuration of one cluster. It is passed to
+    OCP, the deployment classes and utilities instead of switching the
+    global context, so the work on multiple clusters can run on threads or
+    asyncio tasks of one process.
+    """
+
+    index: int
+    name: str
+    cluster_path: str
+    kubeconfig: str
+    acm_cluster: bool
+    primary_cluster: bool
+    DEPLOYMENT: Mapping
+    ENV_DATA: Mapping
+    RUN: Mapping
+    REPORTING: Mapping
+    MULTICLUSTER: Mapping
+
+    @classmethod
+    def from_config(cls, index, cluster_config):
+        """
+        Create the context from the Config() object of the cluster
+        Args:
+            index (int): Index of the cluster
+            cluster_config (Config): Configuration of the cluster
+        Returns:
+            ClusterContext: The context
+        """
+        env_data = cluster_config.ENV_DATA
+        return cls(
+            index=index,
+            name=env_data.get("cluster_name"),
+            cluster_path=env_data.get("cluster_path"),
+            kubeconfig=os.path.join(
+                env_data.get("cluster_path", ""),
+                cluster_config.RUN.get("kubeconfig_location", ""),
+            ),
+            acm_cluster=bool(cluster_config.MULTICLUSTER.get("acm_cluster")),
+            primary_cluster=bool(cluster_config.MULTICLUSTER.get("primary_cluster")),
+            **{f.name: freeze(getattr(cluster_config, f.name)) for f in fields(Config)},
+        )
+
+
+def _config_section(name):
+    """
+    Property of the configuration section of the scoped cluster context if
+    set, of the current cluster otherwise
+    """
+
+    def getter(self):
+        ctx = _scoped_context.get()
+        if ctx is not None:
+            return getattr(ctx, name)
+        return getattr(self.cluster_ctx, name)
+
+    return property(getter)
+
+
 class MultiClusterConfig:
     # This class wraps Config() objects so that we can handle
     # multiple cluster contexts
+    DEPLOYMENT = _config_section("DEPLOYMENT")
+    ENV_DATA = _config_section("ENV_DATA")
+    RUN = _config_section("RUN")
+    REPORTING = _config_section("REPORTING")
+    MULTICLUSTER = _config_section("MULTICLUSTER")
+
     def __init__(self):
         # this will be redefined in the execution
         self.run_id = ""
@@ -130,6 +214,8 @@ class MultiClusterConfig:
         # Points to cluster conf objects which holds ACM cluster conf
         # Applicable only if we are deploying ACM cluster
         self.acm_index = None
+        self._acm_position = None
+        self._contexts = {}
         self.single_cluster_default = True
         self._single_cluster_init_cluster_configs()
 
@@ -153,6 +239,7 @@ class MultiClusterConfig:
         self.cluster_ctx = self.clusters[0]
         self.attr_init()
         self._refresh_ctx()
+        self._refresh_roles()
 
     def init_cluster_configs(self):
         if self.nclusters > 1:
@@ -164,6 +251,7 @@ class MultiClusterConfig:
             self.cluster_ctx = self.clusters[0]
             self.attr_init()
             self._refresh_ctx()
+            self._refresh_roles()
             self.single_cluster_default = False
 
     def attr_init(self):
@@ -172,10 +260,41 @@ class MultiClusterConfig:
     def update(self, user_dict):
         self.cluster_ctx.update(user_dict)
         self._refresh_ctx()
+        self._refresh_roles()
 
     def reset(self):
         self.cluster_ctx.reset()
         self._refresh_ctx()
+        self._refresh_roles()
+
+    def _refresh_roles(self):
+        """
+        Drop the cluster context snapshots and index the cluster roles
+        after the configuration changed
+        """
+        self._contexts = {}
+        self._acm_position = None
+        self.acm_index = None
+        for i, cluster in enumerate(self.clusters):
+            if cluster.MULTICLUSTER.get("acm_cluster"):
+                self._acm_position = i
+                self.acm_index = cluster.MULTICLUSTER.get("multicluster_index", i)
+                break
+
+    def __getstate__(self):
+        # the context snapshots are read-only mappings, rebuilt on demand
+        state = dict(self.__dict__)
+        state["_contexts"] = {}
+        return state
+
+    def restore(self, other):
+        """
+        Take over the configuration of another instance, e.g. the one of the
+        parent process in a spawned child process
+        Args:
+            other (MultiClusterConfig): The configuration
+        """
+        self.__dict__.update(other.__getstate__())
 
     def get_defaults(self):
         return self.cluster_ctx.get_defaults()
@@ -185,14 +304,9 @@ class MultiClusterConfig:
         self._refresh_ctx()
 
     def _refresh_ctx(self):
-        [
-            self.__setattr__(attr, self.cluster_ctx.__getattribute__(attr))
-            for attr in self.attr_list
-        ]
+        # The sections are read through the _config_section properties, the
+        # kubeconfig is passed to oc explicitly, no KUBECONFIG is exported
         self.to_dict = self.cluster_ctx.to_dict
-        os.environ["KUBECONFIG"] = os.path.join(
-            self.ENV_DATA["cluster_path"], self.RUN.get("kubeconfig_location")
-        )
 
     def switch_ctx(self, index=0):
         self.cluster_ctx = self.clusters[index]
@@ -205,9 +319,62 @@ class MultiClusterConfig:
         self.switch_ctx(self.get_acm_index())
 
     def get_acm_index(self):
-        for cluster in self.clusters:
-            if cluster.MULTICLUSTER["acm_cluster"]:
-                return cluster.MULTICLUSTER["multicluster_index"]
+        return self.acm_index
+
+    def get_cluster_context(self, index=None):
+        """
+        Get the immutable context of the cluster
+        Args:
+            index (int): Index of the cluster, the scoped or the current
+                cluster if not set
+        Returns:
+            ClusterContext: The context of the cluster
+        """
+        if index is None:
+            scoped = _scoped_context.get()
+            if scoped is not None:
+                return scoped
+            index = next(
+                i for i, c in enumerate(self.clusters) if c is self.cluster_ctx
+            )
+        ctx = self._contexts.get(index)
+        if ctx is None:
+            ctx = ClusterContext.from_config(index, self.clusters[index])
+            self._contexts[index] = ctx
+        return ctx
+
+    def get_cluster_contexts(self):
+        """
+        Returns:
+            list: ClusterContext of every cluster
+        """
+        return [self.get_cluster_context(i) for i in range(len(self.clusters))]
+
+    def get_acm_context(self):
+        """
+        Returns:
+            ClusterContext: Context of the ACM hub cluster, None if there is
+                no ACM cluster
+        """
+        if self._acm_position is None:
+            return None
+        return self.get_cluster_context(self._acm_position)
+
+    @contextmanager
+    def cluster_scope(self, ctx):
+        """
+        Use the cluster context in the current thread or asyncio task: the
+        configuration sections, the cluster name in the logs and OCP objects
+        without an explicit kubeconfig resolve to this cluster. Unlike
+        switch_ctx, it doesn't change the context of other threads.
+        Args:
+            ctx (ClusterContext): The context to use
+        """
+        token = _scoped_context.set(ctx)
+        try:
+            yield ctx
+        finally:
+            _scoped_context.reset(token)
 
     def switch_default_cluster_ctx(self):
         # We can check any conf for default_cluster_context_index
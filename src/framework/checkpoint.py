@@ -0,0 +1,186 @@
+"""
+Deployment state kept in the cluster_path of every cluster: the deployment
+tasks (see scheduler) done or failed on the cluster with the hash of their
+inputs, so that a rerun of deploy-ocp skips the steps which are still valid
+and continues from the failed one
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+logger = logging.getLogger(__name__)
+
+STATE_FILENAME = "deploy-state.json"
+
+
+def input_hash(*data):
+    """
+    Returns:
+        str: SHA-256 of the JSON of the data, the configuration sections of
+            the cluster contexts included
+    """
+
+    def default(value):
+        if isinstance(value, Mapping):
+            return dict(value)
+        return str(value)
+
+    encoded = json.dumps(data, sort_keys=True, default=default).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class DeploymentState(object):
+    """
+    The state file of a cluster
+    """
+
+    def __init__(self, cluster_path):
+        self.path = os.path.join(cluster_path, STATE_FILENAME)
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Returns:
+            dict: The records of the steps by task name, empty if there is
+                no state or it's unreadable
+        """
+        try:
+            with open(self.path) as f:
+                return json.load(f).get("steps", {})
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as ex:
+            logger.warning(
+                f"Ignoring the unreadable deployment state {self.path}: {ex}"
+            )
+            return {}
+
+    def update(self, name, record):
+        """
+        Record the step, the file is replaced atomically
+        Args:
+            name (str): Name of the task
+            record (dict): The record of the step
+        """
+        with self._lock:
+            steps = self.load()
+            steps[name] = record
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"updated": time.time(), "steps": steps}, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """
+        Drop the state, e.g. after the cluster is destroyed
+        """
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class Checkpoint(object):
+    """
+    Looks up and records the tasks of the scheduler in the state file of
+    the cluster they run on
+    """
+
+    def __init__(self, cluster_paths, run_id=None, resume=True, is_running=None):
+        """
+        Initializer function
+        Args:
+            cluster_paths (dict): cluster_path by cluster name
+            run_id: Id of the run recorded with the steps
+            resume (bool): Skip the steps done by an earlier run with the
+                same input hash, only record them if False
+            is_running (function): Called with the cluster_path, the steps
+                of a cluster which is not running (e.g. destroyed outside
+                cleanup) are not skipped
+        """
+        self.cluster_paths = cluster_paths
+        self.states = {
+            name: DeploymentState(path) for name, path in cluster_paths.items()
+        }
+        self.run_id = run_id
+        self.resume = resume
+        self.is_running = is_running
+
+    def input_hash(self, task, dep_hashes):
+        """
+        Returns:
+            str: Hash of the name, the inputs and the dependencies of the task
+        """
+        inputs = task.inputs() if task.inputs else None
+        return input_hash(task.name, inputs, dep_hashes)
+
+    def lookup(self, task):
+        """
+        Returns:
+            dict: The record of the task done with the same input hash by an
+                earlier run, None if the task has to run
+        """
+        state = self.states.get(task.cluster)
+        if not (self.resume and state):
+            return None
+        record = state.load().get(task.name)
+        if not (
+            record and record["state"] == "done" and record["hash"] == task.input_hash
+        ):
+            return None
+        if self.is_running and not self.is_running(self.cluster_paths[task.cluster]):
+            logger.info(f"Cluster {task.cluster} is not running, not skipping tasks")
+            return None
+        return record
+
+    def record(self, task):
+        """
+        Record the done or failed task
+        """
+        state = self.states.get(task.cluster)
+        if not state:
+            return
+        state.update(
+            task.name,
+            {
+                "phase": task.phase,
+                "state": task.state,
+                "hash": task.input_hash,
+                "run_id": self.run_id,
+                "finished": time.time(),
+                "duration": round(task.duration, 1),
+                "error": task.error,
+            },
+        )
+
+
+def format_status(cluster_path):
+    """
+    Args:
+        cluster_path (str): Path of the cluster
+    Returns:
+        str: Table of the recorded steps of the cluster
+    """
+    steps = DeploymentState(cluster_path).load()
+    if not steps:
+        return f"{cluster_path}: no deployment state"
+    lines = [
+        cluster_path,
+        f"  {'step':<40}{'state':<10}{'run':>12}  {'finished':<20}{'seconds':>9}",
+    ]
+    for name, record in sorted(steps.items(), key=lambda item: item[1]["finished"]):
+        finished = time.strftime(
+            "%Y-%m-%d %H:%M:%S", time.localtime(record["finished"])
+        )
+        lines.append(
+            f"  {name:<40}{record['state']:<10}{str(record['run_id']):>12}  "
+            f"{finished:<20}{record['duration']:>9.1f}"
+        )
+        if record.get("error"):
+            lines.append(f"    {record['error']}")
+    return "\n".join(lines)
@@ -1,14 +1,23 @@
 import argparse
+import logging
 import os
 import re
 import sys
-import yaml
 import time
 
 from src import framework
 from src.utility.exceptions import UnSupportedPlatformException
-from src.utility import utils
+from src.utility import codec, utils
+from src.utility.binary_store import get_binary_store
+from src.framework.checkpoint import Checkpoint, format_status
 from src.framework.deployment import Deployment
+from src.framework.prefetch import start_prefetch
+from src.framework.scheduler import Scheduler
+from src.utility.memo import memo_cache
+from src.utility.metrics import write_metrics
+from src.utility import tracing
+
+logger = logging.getLogger(__name__)
 
 
 def check_config_requirements():
@@ -33,9 +42,10 @@ def load_config(config_files):
         config_files (list): conf file paths
     """
     for config_file in config_files:
-        with open(os.path.abspath(os.path.expanduser(config_file))) as file_stream:
-            custom_config_data = yaml.safe_load(file_stream)
-            framework.config.update(custom_config_data)
+        custom_config_data = codec.load_yaml_file(
+            os.path.abspath(os.path.expanduser(config_file))
+        )
+        framework.config.update(custom_config_data)
 
 
 def init_ocp4mcoci_conf(arguments=None):
@@ -201,26 +211,65 @@ def process_email_recipients(arguments):
     framework.config.update({"REPORTING": {"email": {"recipients": args.email_ids}}})
 
 
+def show_status(arguments):
+    """
+    Print the deployment state recorded in the cluster paths, the clusters
+    are not contacted
+    Args:
+        arguments (list): Arguments of the status subcommand
+    """
+    parser = argparse.ArgumentParser(
+        prog="deploy-ocp status",
+        description="Show the deployment steps recorded by the earlier runs",
+    )
+    parser.add_argument(
+        "--cluster-paths",
+        nargs="+",
+        required=True,
+        help="cluster install directory paths with space",
+    )
+    args = parser.parse_args(arguments)
+    for cluster_path in args.cluster_paths:
+        status = format_status(os.path.abspath(os.path.expanduser(cluster_path)))
+        sys.stdout.write(f"{status}\n")
+
+
 def main(argv=None):
     arguments = argv or sys.argv[1:]
+    if arguments and arguments[0] == "status":
+        show_status(arguments[1:])
+        return
     init_ocp4mcoci_conf(arguments)
     log_cli_level = process_log_level_arg(arguments)
-    deployment = Deployment()
-    # Deploy OCP
-    deployment.deploy_ocp(log_cli_level)
-    # Deploy OCS
-    deployment.deploy_ocs(log_cli_level)
-    # Deploy MCO
-    deployment.deploy_mco()
-    # Deploy ACM
-    deployment.deploy_acm()
-    # Configure submariner
-    deployment.configure_submariner()
-    # import managed cluster
-    deployment.aws_import_cluster()
-    # Deploy GitOps
-    deployment.deploy_gitops()
-    # SSL certificate exchange
-    deployment.ssl_certificate()
-    # Send email report
-    deployment.send_email()
+    get_binary_store().evict(framework.config.RUN["binary_store_max_unused_days"])
+    try:
+        with tracing.span("deploy-ocp", run_id=framework.config.run_id):
+            # downloads the binaries while the first tasks start
+            prefetch = start_prefetch(framework.config.RUN["prefetch_workers"])
+            deployment = Deployment()
+            checkpoint = Checkpoint(
+                {
+                    ctx.name: ctx.cluster_path
+                    for ctx in framework.config.get_cluster_contexts()
+                },
+                framework.config.run_id,
+                framework.config.RUN["resume_deployment"],
+                utils.is_cluster_running,
+            )
+            scheduler = Scheduler(framework.config.RUN["deploy_workers"], checkpoint)
+            deployment.schedule(scheduler, log_cli_level)
+            failed = scheduler.run()
+            prefetch.wait()
+            scheduler.report()
+            # Send email report
+            deployment.send_email()
+        if failed:
+            logger.error(
+                f"Deployment failed: {', '.join(task.name for task in failed)}"
+            )
+            return 1
+    finally:
+        # written for the failed runs as well, they are the interesting ones
+        logger.info(f"Memoized query cache stats: {memo_cache.stats()}")
+        write_metrics()
+        tracing.write_trace()
@@ -1,7 +1,9 @@
+import json
 import logging
+import os
 import sys
 import time
-import multiprocessing as mp
+from functools import partial
 
 from src.deployment.ocp import OCPDeployment
 from src.deployment.ocs import OCSDeployment
@@ -12,13 +14,14 @@ from src.deployment.ssl_certificate import SSLCertificate
 from src.deployment.submariner import Submariner
 from src.deployment.import_managed_cluster import ImportManagedCluster
 from src import framework
+from src.ocs.ocp import invalidate_cluster_cache
 from src.framework.logger_factory import set_log_record_factory
+from src.utility import tracing
 from src.utility.constants import LOG_FORMAT
 from src.utility.utils import (
     is_cluster_running,
     email_reports,
-    get_non_acm_cluster_config,
-    get_kube_config_path,
+    get_non_acm_cluster_contexts,
 )
 
 log = logging.getLogger(__name__)
@@ -38,235 +41,276 @@ def set_log_level(log_cli_level):
     log.setLevel(logging.getLevelName(level))
 
 
+def run_process(process):
+    """
+    Start the process and wait for it
+    Args:
+        process (multiprocessing.Process): The process
+    Raises:
+        ChildProcessError: If the process failed
+    """
+    process.start()
+    process.join()
+    # the writes of the child are not seen by the caches of this process
+    invalidate_cluster_cache()
+    if process.exitcode != 0:
+        raise ChildProcessError(
+            f"Process {process.name} exited with {process.exitcode}"
+        )
+
+
+def cluster_inputs(ctx, installed=False):
+    """
+    Inputs of the deployment tasks of the cluster hashed by the checkpoint
+    Args:
+        ctx (ClusterContext): Context of the cluster
+        installed (bool): Include the infrastructure id of the installed
+            cluster, it changes when the cluster is reinstalled
+    Returns:
+        dict: The configuration sections the deployment depends on
+    """
+    inputs = {
+        section: getattr(ctx, section)
+        for section in ("DEPLOYMENT", "ENV_DATA", "MULTICLUSTER")
+    }
+    if installed:
+        metadata_path = os.path.join(ctx.cluster_path, "metadata.json")
+        try:
+            with open(metadata_path) as f:
+                inputs["infra_id"] = json.load(f).get("infraID")
+        except (OSError, ValueError):
+            inputs["infra_id"] = None
+    return inputs
+
+
 class Deployment(object):
     def __init__(self):
         set_log_record_factory()
         set_log_level(framework.config.RUN["log_level"])
 
-    def deploy_ocp(self, log_cli_level):
+    def deploy_ocp(self, ctx, log_cli_level):
         # OCP Deployment
-        processes = []
-        for i in range(framework.config.nclusters):
-            try:
-                framework.config.switch_ctx(i)
-                cluster_path = framework.config.ENV_DATA["cluster_path"]
-                cluster_name = framework.config.ENV_DATA["cluster_name"]
-                if not framework.config.ENV_DATA.get("skip_ocp_deployment", True):
-                    if is_cluster_running(cluster_path):
-                        log.warning(
-                            "OCP cluster is already running, skipping installation"
-                        )
-                    else:
-                        log.info(f"Deploying OCP cluster for {cluster_name}")
-                        ocp_deployment = OCPDeployment(cluster_name, cluster_path)
-                        ocp_deployment.deploy_prereq()
-                        p = mp.Process(
-                            target=OCPDeployment.deploy_ocp,
-                            args=(
-                                ocp_deployment.installer_binary_path,
-                                ocp_deployment.cluster_path,
-                                log_cli_level,
-                            ),
-                        )
-                        processes.append(p)
-                else:
-                    log.warning("OCP deployment will be skipped")
-            except Exception as ex:
-                log.error("Unable to deploy OCP cluster !", exc_info=True)
-        framework.config.switch_default_cluster_ctx()
-        if len(processes) > 0:
-            [proc.start() for proc in processes]
-            # complete the processes
-            for proc in processes:
-                proc.join()
+        with framework.config.cluster_scope(ctx):
+            if ctx.ENV_DATA.get("skip_ocp_deployment", True):
+                log.warning("OCP deployment will be skipped")
+                return
+            if is_cluster_running(ctx.cluster_path):
+                log.warning("OCP cluster is already running, skipping installation")
+                return
+            log.info(f"Deploying OCP cluster for {ctx.name}")
+            ocp_deployment = OCPDeployment(ctx.name, ctx.cluster_path, ctx)
+            ocp_deployment.deploy_prereq()
+            run_process(
+                tracing.traced_process(
+                    target=OCPDeployment.deploy_ocp,
+                    args=(
+                        ocp_deployment.installer_binary_path,
+                        ocp_deployment.cluster_path,
+                        log_cli_level,
+                    ),
+                    cluster=ctx.name,
+                )
+            )
 
-    def deploy_ocs(self, log_cli_level):
-        # OCS Deployment
-        processes = []
-        for i in range(framework.config.nclusters):
-            try:
-                framework.config.switch_ctx(i)
-                if not framework.config.ENV_DATA["skip_ocs_deployment"]:
-                    if (
-                        framework.config.multicluster
-                        and framework.config.get_acm_index() == i
-                        and not framework.config.MULTICLUSTER["primary_cluster"]
-                    ):
-                        continue
-                    log.info("Deploying OCS Operator")
-                    ocs_deployment = OCSDeployment()
-                    ocs_deployment.deploy_prereq()
-                    p = mp.Process(
-                        target=OCSDeployment.deploy_ocs,
-                        args=(
-                            get_kube_config_path(
-                                framework.config.ENV_DATA["cluster_path"]
-                            ),
-                            framework.config.ENV_DATA["skip_ocs_cluster_creation"],
-                        ),
-                    )
-                    processes.append(p)
-                else:
-                    log.warning("OCS deployment will be skipped")
-            except Exception as ex:
-                log.error("Unable to deploy OCS cluster", exc_info=True)
-        framework.config.switch_default_cluster_ctx()
-        if len(processes) > 0:
-            log.info(f"Creating OCS cluster on {len(processes)} clusters")
-            [proc.start() for proc in processes]
-            # complete the processes
-            for proc in processes:
-                proc.join()
+    def skip_ocs(self, ctx):
+        """
+        Returns:
+            bool: True if OCS is not deployed on the cluster
+        """
+        if ctx.ENV_DATA["skip_ocs_deployment"]:
+            return True
+        return bool(
+            framework.config.multicluster
+            and ctx.acm_cluster
+            and not ctx.primary_cluster
+        )
+
+    def deploy_ocs_prereq(self, ctx):
+        # OCS operator Deployment
+        with framework.config.cluster_scope(ctx):
+            if self.skip_ocs(ctx):
+                log.warning("OCS deployment will be skipped")
+                return
+            log.info("Deploying OCS Operator")
+            OCSDeployment(ctx).deploy_prereq()
+
+    def deploy_ocs(self, ctx):
+        # StorageCluster creation
+        with framework.config.cluster_scope(ctx):
+            if self.skip_ocs(ctx):
+                return
+            log.info(f"Creating OCS cluster on {ctx.name}")
+            run_process(
+                tracing.traced_process(
+                    target=OCSDeployment.deploy_ocs,
+                    args=(
+                        ctx.kubeconfig,
+                        ctx.ENV_DATA["skip_ocs_cluster_creation"],
+                    ),
+                    cluster=ctx.name,
+                )
+            )
 
-    def deploy_mco(self):
+    def deploy_mco(self, ctx):
         # MCO Deployment
-        for i in range(framework.config.nclusters):
-            try:
-                framework.config.switch_ctx(i)
-                if (
-                    framework.config.multicluster
-                    and framework.config.get_acm_index() == i
-                ):
-                    if not framework.config.MULTICLUSTER["skip_mco_deployment"]:
-                        log.info("Deploying MCO Operator")
-                        mco_deployment = MCODeployment()
-                        mco_deployment.deploy_prereq()
-                        MCODeployment.deploy_mco()
-                    else:
-                        log.warning("MCO deployment will be skipped")
-            except Exception as ex:
-                log.error("Unable to deploy MCO operator", exc_info=True)
-        framework.config.switch_default_cluster_ctx()
+        with framework.config.cluster_scope(ctx):
+            if not ctx.MULTICLUSTER["skip_mco_deployment"]:
+                log.info("Deploying MCO Operator")
+                mco_deployment = MCODeployment(ctx)
+                mco_deployment.deploy_prereq()
+                MCODeployment.deploy_mco()
+            else:
+                log.warning("MCO deployment will be skipped")
 
-    def deploy_acm(self):
+    def deploy_acm(self, ctx):
         # ACM Deployment
-        for i in range(framework.config.nclusters):
-            try:
-                framework.config.switch_ctx(i)
-                if (
-                    framework.config.multicluster
-                    and framework.config.get_acm_index() == i
-                ):
-                    if framework.config.MULTICLUSTER["deploy_acm_hub_cluster"]:
-                        log.info("Deploying ACM")
-                        acm_deployment = ACMDeployment()
-                        if framework.config.MULTICLUSTER.get("acm_hub_unreleased"):
-                            acm_deployment.deploy_acm_hub_unreleased()
-                        else:
-                            acm_deployment.deploy_acm_hub_released()
-                    else:
-                        log.warning("ACM deployment will be skipped")
-            except Exception as ex:
-                log.error("Unable to deploy ACM hub operator", exc_info=True)
-        framework.config.switch_default_cluster_ctx()
+        with framework.config.cluster_scope(ctx):
+            if ctx.MULTICLUSTER["deploy_acm_hub_cluster"]:
+                log.info("Deploying ACM")
+                acm_deployment = ACMDeployment(ctx)
+                if ctx.MULTICLUSTER.get("acm_hub_unreleased"):
+                    acm_deployment.deploy_acm_hub_unreleased()
+                else:
+                    acm_deployment.deploy_acm_hub_released()
+            else:
+                log.warning("ACM deployment will be skipped")
 
-    def configure_submariner(self):
-        try:
-            for i in range(framework.config.nclusters):
-                framework.config.switch_ctx(i)
-                if (
-                    framework.config.multicluster
-                    and framework.config.get_acm_index() == i
-                ):
-                    if framework.config.MULTICLUSTER["configure_submariner"]:
-                        log.info("Configuring submariner")
-                        submariner = Submariner()
-                        submariner.deploy()
-                    else:
-                        log.warning("Submariner configuration will be skipped")
-        except Exception as ex:
-            log.error("Unable to configure submariner", exc_info=True)
-        framework.config.switch_default_cluster_ctx()
+    def configure_submariner(self, ctx):
+        with framework.config.cluster_scope(ctx):
+            if ctx.MULTICLUSTER["configure_submariner"]:
+                log.info("Configuring submariner")
+                submariner = Submariner(ctx)
+                submariner.deploy()
+            else:
+                log.warning("Submariner configuration will be skipped")
 
-    def aws_import_cluster(self):
-        try:
-            for i in range(framework.config.nclusters):
-                framework.config.switch_ctx(i)
-                if (
-                    framework.config.multicluster
-                    and framework.config.get_acm_index() == i
-                ):
-                    if framework.config.MULTICLUSTER["import_managed_clusters"]:
-                        for cluster in get_non_acm_cluster_config():
-                            log.info(
-                                f"Importing cluster {cluster.ENV_DATA['cluster_name']} into ACM"
-                            )
-                            import_managed_cluster = ImportManagedCluster(
-                                cluster.ENV_DATA["cluster_name"],
-                                cluster.ENV_DATA["cluster_path"],
-                            )
-                            import_managed_cluster.import_cluster()
-                        log.info(
-                            "Sleeping for 90 seconds after importing managed cluster"
-                        )
-                        time.sleep(90)
-                    else:
-                        log.warning(f"Skipping managed cluster import")
-        except Exception as ex:
-            log.error("Unable to import cluster", exc_info=True)
-        framework.config.switch_default_cluster_ctx()
+    def aws_import_cluster(self, ctx):
+        with framework.config.cluster_scope(ctx):
+            if ctx.MULTICLUSTER["import_managed_clusters"]:
+                for cluster in get_non_acm_cluster_contexts():
+                    log.info(f"Importing cluster {cluster.name} into ACM")
+                    import_managed_cluster = ImportManagedCluster(
+                        cluster.name, cluster.cluster_path, ctx
+                    )
+                    import_managed_cluster.import_cluster()
+                log.info("Sleeping for 90 seconds after importing managed cluster")
+                time.sleep(90)
+            else:
+                log.warning(f"Skipping managed cluster import")
 
-    def deploy_gitops(self):
-        # MCO Deployment
-        for i in range(framework.config.nclusters):
-            try:
-                framework.config.switch_ctx(i)
-                if (
-                    framework.config.multicluster
-                    and framework.config.get_acm_index() == i
-                ):
-                    if not framework.config.MULTICLUSTER["skip_gitops_deployment"]:
-                        log.info("Deploying GitOps Operator")
-                        gitops_deployment = GitopsDeployment()
-                        gitops_deployment.deploy_prereq()
-                        GitopsDeployment.deploy_gitops()
-                    else:
-                        log.warning("GitOps deployment will be skipped")
-            except Exception as ex:
-                log.error("Unable to deploy GitOps operator", exc_info=True)
-        framework.config.switch_default_cluster_ctx()
+    def deploy_gitops(self, ctx):
+        # GitOps Deployment
+        with framework.config.cluster_scope(ctx):
+            if not ctx.MULTICLUSTER["skip_gitops_deployment"]:
+                log.info("Deploying GitOps Operator")
+                gitops_deployment = GitopsDeployment(ctx)
+                gitops_deployment.deploy_prereq()
+                GitopsDeployment.deploy_gitops(ctx=ctx)
+            else:
+                log.warning("GitOps deployment will be skipped")
 
-    def ssl_certificate(self):
-        try:
-            for i in range(framework.config.nclusters):
-                framework.config.switch_ctx(i)
-                if (
-                    framework.config.multicluster
-                    and framework.config.get_acm_index() == i
-                ):
-                    if framework.config.MULTICLUSTER["exchange_ssl_certificate"]:
-                        ssl_certificate = SSLCertificate()
-                        for cluster in framework.config.clusters:
-                            framework.config.switch_ctx(
-                                cluster.MULTICLUSTER["multicluster_index"]
-                            )
-                            log.info("Fetching ssl secrets")
-                            ssl_certificate.get_certificate()
-                        ssl_certificate.get_certificate_file_path()
-                        log.warning(ssl_certificate.ssl_certificate_path)
-                        for cluster in framework.config.clusters:
-                            framework.config.switch_ctx(
-                                cluster.MULTICLUSTER["multicluster_index"]
-                            )
-                            log.info("Exchanging ssl secrets")
-                            ssl_certificate.exchange_certificate()
-                    else:
-                        log.warning(
-                            f"Skipping SSL certificate exchange for managed clusters"
-                        )
-        except Exception as ex:
-            log.error(
-                "Unable to configure SSL certificate for the cluster", exc_info=True
+    def ssl_certificate(self, ctx):
+        if not ctx.MULTICLUSTER["exchange_ssl_certificate"]:
+            log.warning(f"Skipping SSL certificate exchange for managed clusters")
+            return
+        ssl_certificate = SSLCertificate()
+        clusters = framework.config.get_cluster_contexts()
+        log.info("Fetching ssl secrets")
+        ssl_certificate.get_certificates(clusters)
+        ssl_certificate.get_certificate_manifest()
+        for cluster in clusters:
+            with framework.config.cluster_scope(cluster), tracing.span(
+                cluster.name, cluster=cluster.name
+            ):
+                log.info("Exchanging ssl secrets")
+                ssl_certificate.exchange_certificate(cluster)
+
+    def schedule(self, scheduler, log_cli_level):
+        """
+        Add the deployment tasks to the scheduler. Every cluster runs its own
+        pipeline: OCP, then the OCS operator and the StorageCluster as soon
+        as its own install is done. On the ACM hub, the operators, the
+        submariner configuration, the import of the managed clusters and
+        GitOps wait only for the clusters they need, and for the OCS
+        operator prereqs of the hub (a no-op without ODF on the hub). The SSL certificates
+        are exchanged last, the proxy update restarts the cluster operators.
+        A failure only skips the tasks depending on the failed one. With
+        RUN['resume_deployment'], the tasks are skipped when an earlier run
+        did them with the same configuration on the same installed clusters
+        which are still running, except the OCP install which checks on its
+        own whether the cluster is running.
+        Args:
+            scheduler (Scheduler): The scheduler
+            log_cli_level (str): OCP installer log level
+        """
+        for ctx in framework.config.get_cluster_contexts():
+            scheduler.add(
+                "ocp",
+                self.deploy_ocp,
+                ctx.name,
+                args=(ctx, log_cli_level),
+                inputs=partial(cluster_inputs, ctx, installed=True),
+                checkpoint=False,
+            )
+            scheduler.add(
+                "ocs-prereq",
+                self.deploy_ocs_prereq,
+                ctx.name,
+                [f"ocp/{ctx.name}"],
+                args=(ctx,),
+                inputs=partial(cluster_inputs, ctx),
             )
-        framework.config.switch_default_cluster_ctx()
+            scheduler.add(
+                "ocs",
+                self.deploy_ocs,
+                ctx.name,
+                [f"ocs-prereq/{ctx.name}"],
+                args=(ctx,),
+                inputs=partial(cluster_inputs, ctx),
+            )
+        ctx = framework.config.get_acm_context()
+        if not (framework.config.multicluster and ctx):
+            return
+        hub = ctx.name
+        managed = [f"ocp/{c.name}" for c in get_non_acm_cluster_contexts()]
+        dr_clusters = [f"ocp/{c.name}" for c in get_non_acm_cluster_contexts(True)]
+        # the OCS operator prereqs replace the redhat-operators catalog source
+        # and roll out the ICSP, the hub operators subscribe from it
+        hub_prereqs = [f"ocp/{hub}", f"ocs-prereq/{hub}"]
+        hub_tasks = [
+            ("mco", self.deploy_mco, [f"ocp/{hub}", f"ocs/{hub}"]),
+            ("acm", self.deploy_acm, hub_prereqs),
+            ("submariner", self.configure_submariner, hub_prereqs + dr_clusters),
+            ("import", self.aws_import_cluster, [f"acm/{hub}"] + managed),
+            ("gitops", self.deploy_gitops, [f"import/{hub}"]),
+        ]
+        for phase, func, deps in hub_tasks:
+            scheduler.add(
+                phase,
+                func,
+                hub,
+                sorted(set(deps)),
+                args=(ctx,),
+                inputs=partial(cluster_inputs, ctx),
+            )
+        scheduler.add(
+            "ssl",
+            self.ssl_certificate,
+            hub,
+            list(scheduler.tasks),
+            args=(ctx,),
+            inputs=partial(cluster_inputs, ctx),
+        )
 
+    @tracing.traced()
     def send_email(self):
         # send email notification
-        for i in range(framework.config.nclusters):
-            framework.config.switch_ctx(i)
-            skip_notification = framework.config.REPORTING["email"]["skip_notification"]
-            if not skip_notification:
-                email_reports()
-            else:
-                log.warning("Email notification will be skipped")
-        framework.config.switch_default_cluster_ctx()
+        for ctx in framework.config.get_cluster_contexts():
+            with framework.config.cluster_scope(ctx), tracing.span(
+                ctx.name, cluster=ctx.name
+            ):
+                skip_notification = ctx.REPORTING["email"]["skip_notification"]
+                if not skip_notification:
+                    email_reports()
+                else:
+                    log.warning("Email notification will be skipped")
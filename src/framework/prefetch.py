@@ -0,0 +1,142 @@
+"""
+Prefetch of the binaries the deployment needs (the installers of the
+clusters, the client, subctl) with the release metadata their versions are
+resolved with, downloaded in parallel to the binary store when the run starts.
+The deployment steps get them from the store as before: a step asking for a
+binary still being prefetched waits for the download under the store lock
+instead of starting another one.
+"""
+import concurrent.futures
+import contextvars
+import logging
+import time
+
+from src import framework
+from src.deployment.submariner import Submariner
+from src.utility import tracing, utils
+
+logger = logging.getLogger(__name__)
+
+
+def installer_fetcher(ctx):
+    def fetch():
+        return utils.download_installer(
+            version=ctx.DEPLOYMENT["installer_version"],
+            bin_dir=ctx.RUN["bin_dir"],
+            force_download=ctx.DEPLOYMENT["force_download_installer"],
+            verify_ssl_certificate=ctx.RUN["https_certification_verification"],
+        )
+
+    return fetch
+
+
+def client_fetcher(ctx):
+    def fetch():
+        return utils.get_openshift_client(
+            version=ctx.RUN["client_version"],
+            bin_dir=ctx.RUN["bin_dir"],
+            force_download=ctx.DEPLOYMENT["force_download_client"],
+        )
+
+    return fetch
+
+
+def subctl_fetcher(ctx):
+    def fetch():
+        return Submariner(ctx).download_binary()
+
+    return fetch
+
+
+def needed_artifacts():
+    """
+    The binaries needed by the deployment of the configured clusters
+    Returns:
+        dict: Tuples of the context the artifact is resolved in and the
+            function fetching it by artifact name, the clusters of the same
+            version share one
+    """
+    artifacts = {}
+    contexts = framework.config.get_cluster_contexts()
+    for ctx in contexts:
+        if not ctx.ENV_DATA.get("skip_ocp_deployment", True):
+            name = f"openshift-install {ctx.DEPLOYMENT['installer_version']}"
+            artifacts.setdefault(name, (ctx, installer_fetcher(ctx)))
+    ctx = contexts[0]
+    if not ctx.DEPLOYMENT.get("skip_download_client"):
+        artifacts[f"openshift-client {ctx.RUN['client_version']}"] = (
+            ctx,
+            client_fetcher(ctx),
+        )
+    acm_ctx = framework.config.get_acm_context()
+    if (
+        framework.config.multicluster
+        and acm_ctx
+        and acm_ctx.MULTICLUSTER["configure_submariner"]
+        and acm_ctx.MULTICLUSTER["submariner_source"] == "upstream"
+    ):
+        artifacts["subctl"] = (acm_ctx, subctl_fetcher(acm_ctx))
+    return artifacts
+
+
+class Prefetch(object):
+    """
+    The downloads running in the background
+    """
+
+    def __init__(self, artifacts, max_workers=4):
+        """
+        Initializer function
+        Args:
+            artifacts (dict): See needed_artifacts
+            max_workers (int): Max number of concurrent downloads
+        """
+        self.futures = {}
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers, thread_name_prefix="prefetch"
+        )
+        for name, (ctx, fetch) in artifacts.items():
+            context = contextvars.copy_context()
+            self.futures[name] = self.executor.submit(
+                context.run, self._fetch, name, ctx, fetch
+            )
+        self.executor.shutdown(wait=False)
+
+    @staticmethod
+    def _fetch(name, ctx, fetch):
+        start = time.monotonic()
+        with framework.config.cluster_scope(ctx), tracing.span(
+            f"prefetch {name}", category="prefetch"
+        ):
+            result = fetch()
+        logger.info(f"Prefetched {name} in {time.monotonic() - start:.1f}s")
+        return result
+
+    def wait(self):
+        """
+        Wait for the downloads, a failed one is logged: the step needing the
+        binary downloads it again and fails if it still can't
+        Returns:
+            list: Names of the failed downloads
+        """
+        failed = []
+        for name, future in self.futures.items():
+            try:
+                future.result()
+            except Exception:
+                logger.warning(f"Unable to prefetch {name}", exc_info=True)
+                failed.append(name)
+        return failed
+
+
+def start_prefetch(max_workers=4):
+    """
+    Start downloading the binaries needed by the deployment in the background
+    Args:
+        max_workers (int): Max number of concurrent downloads
+    Returns:
+        Prefetch: The downloads
+    """
+    artifacts = needed_artifacts()
+    logger.info(f"Prefetching {', '.join(artifacts) or 'nothing'}")
+    return Prefetch(artifacts, max_workers)
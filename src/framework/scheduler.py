@@ -0,0 +1,286 @@
+"""
+Dependency graph of the deployment tasks, a (phase, cluster) pair each, run by
+a bounded pool of worker threads: a task starts as soon as all of its
+dependencies are done, so the independent work of different phases and
+clusters overlaps. The dependents of a failed task are skipped, the other
+tasks carry on.
+"""
+import concurrent.futures
+import contextvars
+import logging
+import time
+
+from src.utility import tracing
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class Task(object):
+    """
+    A step of the deployment, the phase run on one cluster (or on all of
+    them for the phases without a cluster)
+    """
+
+    def __init__(
+        self,
+        phase,
+        func,
+        cluster=None,
+        deps=(),
+        args=(),
+        kwargs=None,
+        inputs=None,
+        checkpoint=True,
+    ):
+        """
+        Initializer function
+        Args:
+            phase (str): Name of the phase, e.g. ocs
+            func (function): Function running the task, it raises on failure
+            cluster (str): Name of the cluster the task runs on
+            deps (list): Names of the tasks it depends on
+            args (tuple): Arguments of the function
+            kwargs (dict): Keyword arguments of the function
+            inputs (function): Returns the inputs of the task hashed by the
+                checkpoint, e.g. the configuration of the cluster
+            checkpoint (bool): Skip the task when it's done with the same
+                input hash by an earlier run, if False the task always runs
+                and its inputs are hashed after it ran, they are the result
+                its dependents build on (e.g. the installed cluster)
+        """
+        self.phase = phase
+        self.cluster = cluster
+        self.func = func
+        self.deps = list(deps)
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.inputs = inputs
+        self.checkpoint = checkpoint
+        self.input_hash = None
+        self.resumed = False
+        self.state = PENDING
+        self.error = None
+        self.start = None
+        self.end = None
+
+    @property
+    def name(self):
+        return f"{self.phase}/{self.cluster}" if self.cluster else self.phase
+
+    @property
+    def duration(self):
+        if self.start is None:
+            return 0.0
+        return (self.end or time.monotonic()) - self.start
+
+    def __repr__(self):
+        return f"Task({self.name}, {self.state})"
+
+
+class Scheduler(object):
+    """
+    Runs the tasks of the dependency graph
+    """
+
+    def __init__(self, max_workers=4, checkpoint=None):
+        """
+        Initializer function
+        Args:
+            max_workers (int): Max number of tasks running at once
+            checkpoint (Checkpoint): Records the tasks and skips the ones done
+                by an earlier run
+        """
+        self.max_workers = max_workers
+        self.checkpoint = checkpoint
+        self.tasks = {}
+        self.start = None
+        self.end = None
+
+    def add(self, phase, func, cluster=None, deps=(), args=(), kwargs=None, **options):
+        """
+        Add a task to the graph, see Task
+        Returns:
+            Task: The task
+        Raises:
+            ValueError: If there is already a task with the same name
+        """
+        task = Task(phase, func, cluster, deps, args, kwargs, **options)
+        if task.name in self.tasks:
+            raise ValueError(f"Task {task.name} is already scheduled")
+        self.tasks[task.name] = task
+        return task
+
+    def names(self, phase):
+        """
+        Returns:
+            list: Names of the tasks of the phase
+        """
+        return [name for name, task in self.tasks.items() if task.phase == phase]
+
+    def topological_order(self):
+        """
+        Returns:
+            list: The tasks, every task after its dependencies
+        Raises:
+            ValueError: If a dependency is unknown or the graph has a cycle
+        """
+        for task in self.tasks.values():
+            unknown = [dep for dep in task.deps if dep not in self.tasks]
+            if unknown:
+                raise ValueError(f"Task {task.name} depends on unknown tasks {unknown}")
+        order, visiting, visited = [], set(), set()
+
+        def visit(task):
+            if task.name in visited:
+                return
+            if task.name in visiting:
+                raise ValueError(f"Dependency cycle through task {task.name}")
+            visiting.add(task.name)
+            for dep in task.deps:
+                visit(self.tasks[dep])
+            visiting.discard(task.name)
+            visited.add(task.name)
+            order.append(task)
+
+        for task in self.tasks.values():
+            visit(task)
+        return order
+
+    def run(self):
+        """
+        Run the tasks, each as soon as its dependencies are done, in the
+        tracing span and the context of the caller
+        Returns:
+            list: The failed tasks
+        """
+        order = self.topological_order()
+        self.start = time.monotonic()
+        logger.info(
+            f"Running {len(order)} deployment tasks with {self.max_workers} workers"
+        )
+        running = {}
+        with concurrent.futures.ThreadPoolExecutor(
+            self.max_workers, thread_name_prefix="deploy"
+        ) as executor:
+            while True:
+                for task in order:
+                    if task.state == PENDING and self._ready(task):
+                        if self._resume(task):
+                            continue
+                        task.state = RUNNING
+                        context = contextvars.copy_context()
+                        future = executor.submit(context.run, self._run_task, task)
+                        running[future] = task
+                if not running:
+                    break
+                finished, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in finished:
+                    task = running.pop(future)
+                    if task.state == FAILED:
+                        self._skip_dependents(task)
+        self.end = time.monotonic()
+        return [task for task in order if task.state == FAILED]
+
+    def _ready(self, task):
+        return all(self.tasks[dep].state == DONE for dep in task.deps)
+
+    def _hash(self, task):
+        return self.checkpoint.input_hash(
+            task, [self.tasks[dep].input_hash for dep in task.deps]
+        )
+
+    def _resume(self, task):
+        """
+        Returns:
+            bool: True if the task was done by an earlier run, it's done
+        """
+        if not (self.checkpoint and task.checkpoint):
+            return False
+        task.input_hash = self._hash(task)
+        record = self.checkpoint.lookup(task)
+        if not record:
+            return False
+        task.state = DONE
+        task.resumed = True
+        logger.info(f"Skipping task {task.name}, done by run {record['run_id']}")
+        return True
+
+    def _run_task(self, task):
+        task.start = time.monotonic()
+        logger.info(f"Starting task {task.name}")
+        try:
+            with tracing.span(
+                task.name, category="task", phase=task.phase, cluster=task.cluster
+            ):
+                task.func(*task.args, **task.kwargs)
+            task.state = DONE
+            logger.info(f"Task {task.name} done in {task.duration:.1f}s")
+        except Exception as ex:
+            task.error = f"{type(ex).__name__}: {ex}"
+            task.state = FAILED
+            logger.error(f"Task {task.name} failed", exc_info=True)
+        finally:
+            task.end = time.monotonic()
+        if self.checkpoint:
+            try:
+                if not task.checkpoint:
+                    task.input_hash = self._hash(task)
+                self.checkpoint.record(task)
+            except Exception:
+                logger.warning(f"Unable to record task {task.name}", exc_info=True)
+
+    def _skip_dependents(self, failed):
+        for task in self.tasks.values():
+            if task.state == PENDING and failed.name in task.deps:
+                task.state = SKIPPED
+                task.error = f"dependency {failed.name} {failed.state}"
+                logger.warning(f"Skipping task {task.name}: {task.error}")
+                self._skip_dependents(task)
+
+    def critical_path(self):
+        """
+        The chain of dependent tasks with the longest total duration, the
+        tasks which made the run as long as it was
+        Returns:
+            list: The tasks of the path, in order
+        """
+        finish, previous = {}, {}
+        for task in self.topological_order():
+            deps = [self.tasks[dep] for dep in task.deps]
+            longest = max(deps, key=lambda dep: finish[dep.name], default=None)
+            previous[task.name] = longest
+            finish[task.name] = task.duration + (
+                finish[longest.name] if longest else 0.0
+            )
+        if not finish:
+            return []
+        task = self.tasks[max(finish, key=finish.get)]
+        path = []
+        while task:
+            path.append(task)
+            task = previous[task.name]
+        return list(reversed(path))
+
+    def report(self):
+        """
+        Log the state and duration of the tasks and the critical path
+        """
+        lines = [f"{'task':<40}{'state':<10}{'seconds':>10}"]
+        for task in sorted(self.tasks.values(), key=lambda t: t.start or float("inf")):
+            state = "resumed" if task.resumed else task.state
+            lines.append(f"{task.name:<40}{state:<10}{task.duration:>10.1f}")
+        path = self.critical_path()
+        wall = (self.end or time.monotonic()) - (self.start or time.monotonic())
+        lines.append(
+            f"Critical path ({sum(task.duration for task in path):.1f}s of "
+            f"{wall:.1f}s): {' -> '.join(task.name for task in path)}"
+        )
+        logger.info("Deployment tasks:\n" + "\n".join(lines))
@@ -0,0 +1,284 @@
+"""
+Dependency ordered, concurrent server-side apply of manifests
+"""
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.framework import config
+from src.ocs.ocp import OCP
+from src.utility import codec, templating, tracing
+from src.utility.cmd import ASYNC_CONCURRENCY
+from src.utility.exceptions import CommandFailed, TransportUnavailableError
+from src.utility.memo import kind_key
+from src.utility.retry import cluster_budget, retry
+
+logger = logging.getLogger(__name__)
+
+FIELD_MANAGER = "ocp4-mco-ci"
+# Apply level of the kinds: the objects of a level are applied once all the
+# objects of the previous levels are, kinds not listed here (custom resources)
+# are applied last
+KIND_LEVELS = {
+    "CustomResourceDefinition": 0,
+    "Namespace": 0,
+    "Project": 0,
+    "ImageContentSourcePolicy": 0,
+    "ServiceAccount": 1,
+    "Secret": 1,
+    "ConfigMap": 1,
+    "Role": 1,
+    "RoleBinding": 1,
+    "ClusterRole": 1,
+    "ClusterRoleBinding": 1,
+    "OperatorGroup": 2,
+    "CatalogSource": 3,
+    "Subscription": 4,
+}
+CUSTOM_RESOURCE_LEVEL = 5
+# Kinds whose objects provide the namespace of the same name, e.g. ACM
+# creates the namespace of an imported ManagedCluster
+NAMESPACE_KINDS = ("Namespace", "Project", "ManagedCluster")
+
+
+class ManifestApplier(object):
+    """
+    Apply a set of manifests to a cluster: the objects are ordered into
+    levels by their kind (Namespace -> OperatorGroup -> CatalogSource ->
+    Subscription -> custom resources) and the objects of one level are
+    applied concurrently with server-side apply, so re-applying the same
+    manifests is a no-op instead of an 'AlreadyExists' error.
+    """
+
+    def __init__(
+        self,
+        ctx=None,
+        concurrency=None,
+        field_manager=FIELD_MANAGER,
+        timeout=600,
+        tries=3,
+        delay=10,
+    ):
+        """
+        Initializer function
+        Args:
+            ctx (ClusterContext): Context of the cluster, the scoped or the
+                current cluster if not set
+            concurrency (int): Max number of objects applied at once, defaults
+                to RUN['oc_concurrency']
+            field_manager (str): Field manager of the applied fields
+            timeout (int): Timeout of one 'oc apply' in seconds
+            tries (int): Number of tries of one object, e.g. the namespace of
+                a ManagedCluster shows up a moment after it is created
+            delay (int): Delay between the tries in seconds
+        """
+        self.ctx = ctx or config.get_cluster_context()
+        self.concurrency = concurrency or self.ctx.RUN.get(
+            "oc_concurrency", ASYNC_CONCURRENCY
+        )
+        self.field_manager = field_manager
+        self.timeout = timeout
+        self.tries = tries
+        self.delay = delay
+        self.results = []
+
+    def apply(self, *manifests, namespace=None):
+        """
+        Apply the manifests
+        Args:
+            manifests (str, dict or list): Paths to (multi document) YAML
+                files, objects or lists of them
+            namespace (str): Namespace of the objects which don't set one
+        Returns:
+            list: dict with the kind, name, namespace, level, method ('api'
+                or 'oc') and the apply time in seconds of every object
+        Raises:
+            CommandFailed: In case an object can't be applied, the objects of
+                the later levels are not applied
+        """
+        start = time.monotonic()
+        levels = self.levels(self.load(manifests, namespace))
+        results = []
+        for level, objects in levels:
+            results.extend(self._apply_level(level, objects))
+        self.results.extend(results)
+        logger.info(
+            f"Applied {len(results)} objects in {len(levels)} levels to "
+            f"{self.ctx.name} in {time.monotonic() - start:.2f}s"
+        )
+        return results
+
+    @staticmethod
+    def load(manifests, namespace=None):
+        """
+        Load the objects of the manifests
+        Args:
+            manifests (list): Paths to YAML files, objects or lists of them
+            namespace (str): Namespace of the objects which don't set one
+        Returns:
+            list: tuples of the object and its namespace
+        """
+        objects = []
+        for manifest in manifests:
+            if isinstance(manifest, str):
+                documents = templating.load_yaml(manifest, multi_document=True)
+            elif isinstance(manifest, dict):
+                documents = [manifest]
+            else:
+                documents = manifest
+            for document in documents:
+                if not document:
+                    continue
+                if document.get("kind") == "List":
+                    objects.extend(
+                        ManifestApplier.load([document.get("items", [])], namespace)
+                    )
+                    continue
+                objects.append(
+                    (document, document["metadata"].get("namespace", namespace))
+                )
+        return objects
+
+    @staticmethod
+    def levels(objects):
+        """
+        Order the objects into apply levels
+        Args:
+            objects (list): tuples of the object and its namespace
+        Returns:
+            list: tuples of the level and its objects, by level
+        """
+        providers = {}
+        for obj, _ in objects:
+            if obj["kind"] in NAMESPACE_KINDS:
+                providers[obj["metadata"]["name"]] = KIND_LEVELS.get(
+                    obj["kind"], CUSTOM_RESOURCE_LEVEL
+                )
+        levels = {}
+        for obj, namespace in objects:
+            level = KIND_LEVELS.get(obj["kind"], CUSTOM_RESOURCE_LEVEL)
+            if obj["kind"] not in NAMESPACE_KINDS and namespace in providers:
+                level = max(level, providers[namespace] + 1)
+            levels.setdefault(level, []).append((obj, namespace))
+        return sorted(levels.items())
+
+    def _apply_level(self, level, objects):
+        apply_object = retry(
+            CommandFailed,
+            tries=self.tries,
+            delay=self.delay,
+            backoff=1,
+            budget=cluster_budget(self.ctx.kubeconfig),
+        )(self._apply_object)
+        if len(objects) == 1:
+            return [apply_object(level, *objects[0])]
+        results, errors = [], []
+        with ThreadPoolExecutor(
+            max_workers=min(self.concurrency, len(objects)),
+            thread_name_prefix="apply",
+        ) as executor:
+            # every task runs in a copy of the context, so it keeps the
+            # cluster scope of the caller
+            futures = [
+                (
+                    obj,
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        apply_object,
+                        level,
+                        obj,
+                        namespace,
+                    ),
+                )
+                for obj, namespace in objects
+            ]
+            for obj, future in futures:
+                try:
+                    results.append(future.result())
+                except CommandFailed as ex:
+                    errors.append(f"{obj['kind']}/{obj['metadata']['name']}: {ex}")
+        if errors:
+            raise CommandFailed(
+                f"Unable to apply {len(errors)} objects of level {level}: "
+                + "; ".join(errors)
+            )
+        return results
+
+    def _apply_object(self, level, obj, namespace):
+        kind = obj["kind"]
+        name = obj["metadata"]["name"]
+        with tracing.span(
+            f"apply {kind}/{name}", category="apply", cluster=self.ctx.name, level=level
+        ):
+            return self._apply(level, obj, namespace)
+
+    def _apply(self, level, obj, namespace):
+        kind = obj["kind"]
+        name = obj["metadata"]["name"]
+        start = time.monotonic()
+        ocp_obj = OCP(kind=kind, namespace=namespace, ctx=self.ctx)
+        transport = ocp_obj.transport
+        method = "oc"
+        if transport:
+            try:
+                transport.apply(
+                    self.qualified_kind(obj),
+                    obj,
+                    namespace,
+                    field_manager=self.field_manager,
+                )
+                ocp_obj.invalidate_kind(kind)
+                method = "api"
+            except TransportUnavailableError as ex:
+                logger.debug(f"Server-side apply of {kind}/{name} via oc: {ex}")
+        if method == "oc":
+            self._oc_apply(ocp_obj, obj)
+        seconds = time.monotonic() - start
+        logger.info(f"Applied {kind}/{name} in {seconds:.2f}s via {method}")
+        return {
+            "kind": kind,
+            "name": name,
+            "namespace": namespace,
+            "level": level,
+            "method": method,
+            "seconds": seconds,
+        }
+
+    def _oc_apply(self, ocp_obj, obj):
+        # the manifest is streamed to stdin, no file is written
+        ocp_obj.exec_oc_cmd(
+            f"apply --server-side --force-conflicts "
+            f"--field-manager={self.field_manager} -f -",
+            out_yaml_format=False,
+            timeout=self.timeout,
+            metrics_labels={"kind": kind_key(obj["kind"])},
+            input=codec.dumps_yaml(obj).encode(),
+        )
+
+    @staticmethod
+    def qualified_kind(obj):
+        """
+        The kind of the object qualified with its API version, so it
+        resolves to the same resource 'oc' would use
+        """
+        api_version = obj.get("apiVersion", "v1")
+        if "/" not in api_version:
+            return obj["kind"]
+        group, version = api_version.split("/", 1)
+        return f"{obj['kind']}.{version}.{group}"
+
+
+def apply_manifests(*manifests, ctx=None, namespace=None):
+    """
+    Apply the manifests with a ManifestApplier
+    Args:
+        manifests (str, dict or list): Paths to YAML files, objects or lists
+            of them
+        ctx (ClusterContext): Context of the cluster, the scoped or the
+            current cluster if not set
+        namespace (str): Namespace of the objects which don't set one
+    Returns:
+        list: The apply results of the objects
+    """
+    return ManifestApplier(ctx).apply(*manifests, namespace=namespace)
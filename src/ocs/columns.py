@@ -0,0 +1,156 @@
+"""
+Values of the columns printed by 'oc get', computed from already fetched
+resource data, so no additional 'oc get' is needed to read a column
+"""
+import re
+
+JSONPATH_TOKEN = re.compile(
+    r"\.(?P<key>[\w-]+)"
+    r"|\[(?P<index>-?\d+)\]"
+    r"|\[\?\(@\.(?P<filter_key>[\w-]+)==[\"'](?P<filter_value>[^\"']*)[\"']\)\]"
+)
+
+
+def get_jsonpath_value(data, jsonpath):
+    """
+    Evaluate a simple JSONPath, in the format 'oc get -o jsonpath' accepts,
+    on the resource data. Supported are keys, list indexes and equality
+    filters, e.g. {.status.conditions[?(@.type=="Ready")].status}
+    Args:
+        data (dict): Resource data
+        jsonpath (str): JSONPath expression
+    Returns:
+        The value found, None if the path doesn't exist in the data
+    """
+    path = jsonpath.strip().lstrip("{").rstrip("}")
+    value = data
+    position = 0
+    while position < len(path):
+        token = JSONPATH_TOKEN.match(path, position)
+        if not token:
+            raise ValueError(f"Unsupported JSONPath: {jsonpath}")
+        position = token.end()
+        try:
+            if token.group("key") is not None:
+                value = value[token.group("key")]
+            elif token.group("index") is not None:
+                value = value[int(token.group("index"))]
+            else:
+                value = next(
+                    i
+                    for i in value
+                    if str(i.get(token.group("filter_key")))
+                    == token.group("filter_value")
+                )
+        except (KeyError, IndexError, TypeError, StopIteration):
+            return None
+    return value
+
+
+def get_pod_status(pod):
+    """
+    Pod status as printed in the STATUS column of 'oc get pod'
+    Args:
+        pod (dict): Pod data
+    Returns:
+        str: Pod status (e.g. Running, ContainerCreating, CrashLoopBackOff)
+    """
+    status = pod.get("status", {})
+    reason = status.get("reason") or status.get("phase", "")
+    init_statuses = status.get("initContainerStatuses", [])
+    for index, container in enumerate(init_statuses):
+        terminated = container.get("state", {}).get("terminated")
+        waiting = container.get("state", {}).get("waiting", {})
+        if terminated and terminated.get("exitCode") == 0:
+            continue
+        if terminated:
+            return f"Init:{terminated.get('reason') or 'Error'}"
+        if waiting.get("reason") and waiting["reason"] != "PodInitializing":
+            return f"Init:{waiting['reason']}"
+        return f"Init:{index}/{len(init_statuses)}"
+    for container in reversed(status.get("containerStatuses", [])):
+        state = container.get("state", {})
+        if state.get("waiting", {}).get("reason"):
+            reason = state["waiting"]["reason"]
+        elif state.get("terminated", {}).get("reason"):
+            reason = state["terminated"]["reason"]
+    if pod.get("metadata", {}).get("deletionTimestamp"):
+        reason = "Terminating"
+    return reason
+
+
+def get_node_status(node):
+    """
+    Node status as printed in the STATUS column of 'oc get node'
+    Args:
+        node (dict): Node data
+    Returns:
+        str: Ready or NotReady, with SchedulingDisabled when cordoned
+    """
+    ready = get_jsonpath_value(node, '{.status.conditions[?(@.type=="Ready")].status}')
+    status = "Ready" if ready == "True" else "NotReady"
+    if node.get("spec", {}).get("unschedulable"):
+        status += ",SchedulingDisabled"
+    return status
+
+
+def get_node_roles(node):
+    """
+    Node roles as printed in the ROLES column of 'oc get node'
+    Args:
+        node (dict): Node data
+    Returns:
+        str: Comma separated roles (e.g. master,worker)
+    """
+    prefix = "node-role.kubernetes.io/"
+    labels = node.get("metadata", {}).get("labels", {})
+    roles = sorted(k[len(prefix) :] for k in labels if k.startswith(prefix))
+    return ",".join(roles) or "<none>"
+
+
+# Columns printed by 'oc get' per kind: either the JSONPath of the value or a
+# function computing it from the resource data
+COLUMN_JSONPATH = {
+    "Pod": {"STATUS": get_pod_status},
+    "Node": {"STATUS": get_node_status, "ROLES": get_node_roles},
+    "MachineConfigPool": {
+        "MACHINECOUNT": "{.status.machineCount}",
+        "READYMACHINECOUNT": "{.status.readyMachineCount}",
+        "UPDATEDMACHINECOUNT": "{.status.updatedMachineCount}",
+        "DEGRADEDMACHINECOUNT": "{.status.degradedMachineCount}",
+        "UPDATED": '{.status.conditions[?(@.type=="Updated")].status}',
+        "UPDATING": '{.status.conditions[?(@.type=="Updating")].status}',
+        "DEGRADED": '{.status.conditions[?(@.type=="Degraded")].status}',
+    },
+    "MultiClusterHub": {"STATUS": "{.status.phase}"},
+    "ClusterServiceVersion": {"PHASE": "{.status.phase}"},
+    "StorageCluster": {"PHASE": "{.status.phase}"},
+    "PersistentVolumeClaim": {"STATUS": "{.status.phase}"},
+    "PersistentVolume": {"STATUS": "{.status.phase}"},
+    "Namespace": {"STATUS": "{.status.phase}"},
+}
+
+
+def get_column_value(data, column):
+    """
+    Get the value of the 'oc get' column from the resource data
+    Args:
+        data (dict): Resource data, it has to contain the kind
+        column (str): The name of the column (e.g. STATUS)
+    Returns:
+        str: Column value as 'oc get' prints it, empty string if the value
+            is not set yet
+        None: In case the column of the kind is not known
+    """
+    column_jsonpath = COLUMN_JSONPATH.get(data.get("kind"), {}).get(column)
+    if column_jsonpath is None:
+        return None
+    if callable(column_jsonpath):
+        value = column_jsonpath(data)
+    else:
+        value = get_jsonpath_value(data, column_jsonpath)
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
@@ -0,0 +1,342 @@
+"""
+Shared list+watch cache of cluster resources which OCP.get can serve reads
+from
+"""
+import atexit
+import copy
+import logging
+import os
+import re
+import threading
+import time
+
+from src.ocs.watch import WATCH_EXPIRED_CODE
+from src.utility.exceptions import CommandFailed, TransportUnavailableError
+
+log = logging.getLogger(__name__)
+
+# Seconds without a read after which the watch of an informer is stopped,
+# the next read lists again and restarts it
+IDLE_SECONDS = 300
+# Max seconds between the attempts to resume a disconnected watch
+MAX_BACKOFF_SECONDS = 30
+
+SET_REQUIREMENT = re.compile(r"^(?P<key>\S+)\s+(?P<op>in|notin)\s+\((?P<values>.*)\)$")
+
+
+def split_selector(selector):
+    """
+    Split the label selector to requirements, ignoring commas inside of
+    the set based requirements (e.g. env in (prod,qa))
+    """
+    requirements, depth, current = [], 0, ""
+    for char in selector:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            requirements.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        requirements.append(current.strip())
+    return requirements
+
+
+def match_label_selector(labels, selector):
+    """
+    Check if the labels match the label selector, the same way the API
+    server does it
+    Args:
+        labels (dict): Labels of the resource
+        selector (str): Label selector (e.g. app=ocs,tier!=db,env in (qa))
+    Returns:
+        bool: True if the labels match the selector
+    """
+    labels = labels or {}
+    for requirement in split_selector(selector or ""):
+        set_requirement = SET_REQUIREMENT.match(requirement)
+        if set_requirement:
+            values = [v.strip() for v in set_requirement.group("values").split(",")]
+            value = labels.get(set_requirement.group("key"))
+            if set_requirement.group("op") == "in" and value not in values:
+                return False
+            if set_requirement.group("op") == "notin" and value in values:
+                return False
+        elif "!=" in requirement:
+            key, value = [i.strip() for i in requirement.split("!=", 1)]
+            if labels.get(key) == value:
+                return False
+        elif "=" in requirement:
+            key, value = [i.strip() for i in re.split("==?", requirement, 1)]
+            if labels.get(key) != value:
+                return False
+        elif requirement.startswith("!"):
+            if requirement[1:].strip() in labels:
+                return False
+        elif requirement not in labels:
+            return False
+    return True
+
+
+class Informer(object):
+    """
+    Local cache of all resources of one kind in one namespace of a cluster.
+    The cache is filled by a list and kept up to date by a background watch,
+    which resumes from the last seen resourceVersion. Reads are served from
+    memory as long as the watch is healthy.
+    """
+
+    def __init__(self, transport, kind, namespace=""):
+        """
+        Initializer function
+        Args:
+            transport (ApiTransport): Transport of the cluster
+            kind (str): Kind of the resources
+            namespace (str): Namespace of the resources, empty for all
+                namespaces or cluster scoped resources
+        """
+        self.transport = transport
+        self.kind = kind
+        self.namespace = namespace
+        self.resource_version = None
+        self.failure = None
+        self._items = {}
+        self._generation = 0
+        self._synced = False
+        self._last_read = time.monotonic()
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def usable(self):
+        """
+        bool: False once the resource turned out not to support list+watch
+        """
+        return self.failure is None
+
+    def _relist(self):
+        try:
+            data = self.transport.get(
+                self.kind, namespace=self.namespace or None, all_namespaces=True
+            )
+        except CommandFailed as ex:
+            # e.g. listing is forbidden, reads have to go to the API server
+            self.failure = ex
+            raise TransportUnavailableError(f"Unable to list {self.kind}: {ex}")
+        self._items = {
+            (i["metadata"].get("namespace"), i["metadata"]["name"]): i
+            for i in data["items"]
+        }
+        self.resource_version = data["metadata"].get("resourceVersion")
+        self._generation += 1
+        self._synced = True
+        log.debug(
+            f"Informer of {self.kind} in '{self.namespace}' synced at "
+            f"resourceVersion {self.resource_version}"
+        )
+
+    def sync(self):
+        """
+        Make sure the cache holds the current state, listing the resources
+        again if the cache was invalidated, and start the watch
+        Raises:
+            TransportUnavailableError: In case the resources can't be listed
+        """
+        with self._lock:
+            if not self._synced:
+                self._relist()
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name=f"informer-{self.kind}-{self.namespace}",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def invalidate(self):
+        """
+        Drop the cached state, next read lists the resources again
+        """
+        with self._lock:
+            self._synced = False
+
+    def stop(self):
+        """
+        Stop the background watch
+        """
+        self._stopped.set()
+
+    def _run(self):
+        backoff = 1
+        while not self._stopped.is_set():
+            with self._lock:
+                generation = self._generation
+                resource_version = self.resource_version
+                if time.monotonic() - self._last_read > IDLE_SECONDS:
+                    # nobody reads the cache, don't keep it up to date
+                    self._synced = False
+                if not self._synced:
+                    # next read lists again and restarts the watch
+                    self._thread = None
+                    return
+            try:
+                for event_type, obj in self.transport.watch(
+                    self.kind,
+                    namespace=self.namespace or None,
+                    all_namespaces=True,
+                    resource_version=resource_version,
+                    timeout_seconds=IDLE_SECONDS,
+                ):
+                    if self._stopped.is_set():
+                        return
+                    backoff = 1
+                    with self._lock:
+                        if generation != self._generation or not self._synced:
+                            # state was listed again, restart from its version
+                            break
+                        if event_type == "ERROR":
+                            if obj.get("code") == WATCH_EXPIRED_CODE:
+                                self._synced = False
+                                break
+                            raise CommandFailed(f"Watch of {self.kind} failed: {obj}")
+                        self._apply(event_type, obj)
+            except TransportUnavailableError as ex:
+                log.debug(
+                    f"Informer watch of {self.kind} disconnected, resuming in "
+                    f"{backoff}s: {ex}"
+                )
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+            except CommandFailed as ex:
+                log.warning(f"Informer of {self.kind} disabled, watch failed: {ex}")
+                self.failure = ex
+                return
+
+    def _apply(self, event_type, obj):
+        metadata = obj.get("metadata", {})
+        self.resource_version = metadata.get("resourceVersion", self.resource_version)
+        if event_type == "BOOKMARK":
+            return
+        resource = self.transport.resolve(self.kind)
+        obj.setdefault("kind", resource.kind)
+        obj.setdefault("apiVersion", resource.group_version)
+        key = (metadata.get("namespace"), metadata.get("name"))
+        if event_type == "DELETED":
+            self._items.pop(key, None)
+        else:
+            self._items[key] = obj
+
+    def get(self, resource_name="", selector=None):
+        """
+        Equivalent of OCP.get served from the cache
+        Args:
+            resource_name (str): Name of the resource, lists all if empty
+            selector (str): The label selector to look for
+        Returns:
+            dict: Copy of the resource, or a 'List' of resources
+        Raises:
+            CommandFailed: In case the named resource is not found
+        """
+        self.sync()
+        with self._lock:
+            self._last_read = time.monotonic()
+            if resource_name:
+                items = [i for k, i in self._items.items() if k[1] == resource_name]
+                if not items:
+                    raise CommandFailed(
+                        f'Error from server (NotFound): {self.kind} "{resource_name}" '
+                        f"not found"
+                    )
+                return copy.deepcopy(items[0])
+            items = [
+                i
+                for i in self._items.values()
+                if not selector
+                or match_label_selector(i["metadata"].get("labels"), selector)
+            ]
+            return {
+                "apiVersion": "v1",
+                "kind": "List",
+                "items": copy.deepcopy(items),
+                "metadata": {"resourceVersion": self.resource_version},
+            }
+
+
+_informers = {}
+_informers_lock = threading.Lock()
+
+
+def get_informer(transport, kind, namespace=None, all_namespaces=False):
+    """
+    Get the shared informer of the cluster for the kind and namespace
+    Args:
+        transport (ApiTransport): Transport of the cluster
+        kind (str): Kind of the resources
+        namespace (str): Namespace of the resources
+        all_namespaces (bool): Cache the resources of all namespaces
+    Returns:
+        Informer: The informer, None if the kind can't be cached
+    """
+    try:
+        resource = transport.resolve(kind)
+    except TransportUnavailableError:
+        return None
+    if not resource.namespaced or (all_namespaces and not namespace):
+        namespace = ""
+    else:
+        namespace = namespace or transport.kubeconfig.namespace or "default"
+    key = (transport.kubeconfig.path, resource.group_version, resource.name, namespace)
+    with _informers_lock:
+        informer = _informers.get(key)
+        if informer and informer.transport is not transport:
+            # kubeconfig changed and new transport was created
+            informer.stop()
+            informer = None
+        if not informer:
+            informer = Informer(transport, kind, namespace)
+            _informers[key] = informer
+    return informer if informer.usable else None
+
+
+def invalidate_informers(kubeconfig=None, kind=None):
+    """
+    Invalidate the cached state of the cluster after a write
+    Args:
+        kubeconfig (str): Path to the kubeconfig of the cluster, all clusters
+            if not set
+        kind (str): Kind which was changed, all kinds if not set
+    """
+    path = os.path.abspath(kubeconfig) if kubeconfig else None
+    with _informers_lock:
+        informers = list(_informers.items())
+    for (informer_path, group_version, name, _), informer in informers:
+        if path and informer_path != path:
+            continue
+        if kind:
+            try:
+                resource = informer.transport.resolve(kind)
+            except TransportUnavailableError:
+                resource = None
+            if resource and (group_version, name) != (
+                resource.group_version,
+                resource.name,
+            ):
+                continue
+        informer.invalidate()
+
+
+def stop_informers():
+    """
+    Stop all the informers
+    """
+    with _informers_lock:
+        for informer in _informers.values():
+            informer.stop()
+        _informers.clear()
+
+
+atexit.register(stop_informers)
@@ -1,21 +1,34 @@
 import logging
 import os
-import yaml
 import time
 import shlex
 import re
 
-from src.utility.retry import retry
+from src.utility.retry import cluster_budget, retry
 from src.utility.timeout import TimeoutSampler
 from src.framework import config
 from src.utility.exceptions import (
     ResourceNameNotSpecifiedException,
     ResourceWrongStatusException,
     CommandFailed,
+    SamplingAbortedError,
     TimeoutExpiredError,
     NotSupportedFunctionError,
+    TransportUnavailableError,
 )
-from src.utility.cmd import exec_cmd
+from src.utility import metrics, tracing
+from src.utility.cmd import (
+    exec_cmd,
+    exec_cmd_async,
+    add_write_listener,
+    ASYNC_CONCURRENCY,
+)
+from src.utility.codec import loads
+from src.utility.memo import memo_cache, kind_key
+from src.ocs.transport import get_transport
+from src.ocs.informer import get_informer, invalidate_informers
+from src.ocs.watch import WatchSampler
+from src.ocs.columns import get_column_value
 
 log = logging.getLogger(__name__)
 
@@ -39,6 +52,8 @@ class OCP(object):
         threading_lock=None,
         silent=False,
         skip_tls_verify=False,
+        transport=None,
+        ctx=None,
     ):
         """
         Initializer function
@@ -57,6 +72,11 @@ class OCP(object):
             silent (bool): If True will silent errors from the server, default false
             skip_tls_verify (bool): Adding '--insecure-skip-tls-verify' to oc command for
                 exec_oc_cmd
+            transport (ApiTransport): Transport used to talk to the API server.
+                If not set, the shared transport of the cluster is used as
+                configured by RUN['ocp_transport']
+            ctx (ClusterContext): Context of the cluster to run the commands
+                against, the scoped or the current cluster if not set
         """
         self._api_version = api_version
         self._kind = kind
@@ -65,10 +85,12 @@ class OCP(object):
         self._data = {}
         self.selector = selector
         self.field_selector = field_selector
-        self.cluster_kubeconfig = cluster_kubeconfig
+        self.cluster_kubeconfig = cluster_kubeconfig or (ctx.kubeconfig if ctx else "")
+        self.ctx = ctx
         self.threading_lock = threading_lock
         self.silent = silent
         self.skip_tls_verify = skip_tls_verify
+        self._transport = transport
 
     @property
     def api_version(self):
@@ -86,13 +108,42 @@ class OCP(object):
     def resource_name(self):
         return self._resource_name
 
+    @property
+    def transport(self):
+        """
+        Transport used to reach the API server directly
+        Returns:
+            ApiTransport: The transport, None if 'oc' should be used
+        """
+        if self._transport:
+            return self._transport
+        return get_transport(
+            self.kubeconfig_path(), config.RUN.get("ocp_transport", "oc")
+        )
+
+    def kubeconfig_path(self):
+        """
+        Get the kubeconfig path the 'oc' command of this object would use
+        Returns:
+            str: Path to the kubeconfig file, None if not found
+        """
+        if os.path.exists(self.cluster_kubeconfig):
+            return self.cluster_kubeconfig
+        cluster_dir_kubeconfig = config.get_cluster_context().kubeconfig
+        if os.path.exists(cluster_dir_kubeconfig):
+            return cluster_dir_kubeconfig
+        env_kubeconfig = os.getenv("KUBECONFIG")
+        if env_kubeconfig and os.path.exists(env_kubeconfig):
+            return env_kubeconfig
+        return None
+
     @property
     def data(self, silent=False):
         if self._data:
             return self._data
         if self.silent:
             silent = True
-        self._data = self.get(silent=silent)
+        self._data = self.get(silent=silent, cached=True)
         return self._data
 
     def check_name_is_specified(self, resource_name=""):
@@ -121,12 +172,14 @@ class OCP(object):
         silent=False,
         field_selector=None,
         skip_tls_verify=False,
+        cached=False,
     ):
         """
         Get command - 'oc get <resource>'
         Args:
             resource_name (str): The resource name to fetch
-            out_yaml_format (bool): Adding '-o yaml' to oc command
+            out_yaml_format (bool): Adding '-o json' to oc command and
+                returning the decoded data
             selector (str): The label selector to look for.
             all_namespaces (bool): Equal to oc get <resource> -A
             retry (int): Number of attempts to retry to get resource
@@ -135,10 +188,12 @@ class OCP(object):
             field_selector (str): Selector (field query) to filter on, supports
                 '=', '==', and '!='. (e.g. status.phase=Running)
             skip_tls_verify (bool): Adding '--insecure-skip-tls-verify' to oc command
+            cached (bool): Return the result of the same get done in the last
+                RUN['memo_ttl'] seconds, if it was not invalidated by a write
         Example:
             get('my-pv1')
         Returns:
-            dict: Dictionary represents a returned yaml file
+            dict: Dictionary represents the returned resource(s)
             None: Incase dont_raise is True and get is not found
         """
         resource_name = resource_name if resource_name else self.resource_name
@@ -156,15 +211,40 @@ class OCP(object):
         if field_selector is not None:
             command += f" --field-selector={field_selector}"
         if out_yaml_format:
-            command += " -o yaml"
+            command += " -o json"
+        memo_key = None
+        memo_ttl = config.RUN.get("memo_ttl", 0)
+        if cached and memo_ttl:
+            memo_key = (
+                self.kubeconfig_path(),
+                "get",
+                kind_key(self.kind),
+                resource_name,
+                selector,
+                field_selector,
+                self.namespace,
+                all_namespaces,
+                out_yaml_format,
+            )
+            hit, data = memo_cache.get(memo_key)
+            if hit:
+                return data
         retry += 1
         while retry:
             try:
-                return self.exec_oc_cmd(
+                data = self._fetch(
                     command,
-                    silent=silent,
-                    skip_tls_verify=skip_tls_verify,
+                    resource_name,
+                    selector,
+                    field_selector,
+                    all_namespaces,
+                    out_yaml_format,
+                    silent,
+                    skip_tls_verify,
                 )
+                if memo_key:
+                    memo_cache.set(memo_key, data, memo_ttl)
+                return data
             except CommandFailed as ex:
                 if not silent:
                     log.warning(
@@ -180,6 +260,7 @@ class OCP(object):
                     else:
                         return None
                 else:
+                    metrics.record_retry("OCP.get", ex)
                     log.info(
                         f"Number of attempts: {retry} to get resource: "
                         f"{resource_name}, selector: {selector}, remain! "
@@ -187,8 +268,70 @@ class OCP(object):
                     )
                     time.sleep(wait if wait else 1)
 
-    @retry(ResourceWrongStatusException, tries=4, delay=5, backoff=1)
-    def wait_for_phase(self, phase, timeout=300, sleep=5):
+    def _fetch(
+        self,
+        command,
+        resource_name,
+        selector,
+        field_selector,
+        all_namespaces,
+        out_yaml_format,
+        silent,
+        skip_tls_verify,
+    ):
+        """
+        Fetch the resource(s) for get: from the informer cache when enabled,
+        through the API transport when available, with 'oc' otherwise
+        """
+        transport = self.transport if out_yaml_format else None
+        informer = None
+        if (
+            transport
+            and config.RUN.get("informer_cache")
+            and not field_selector
+            and not (skip_tls_verify or self.skip_tls_verify)
+        ):
+            informer = get_informer(
+                transport, self.kind, self.namespace, all_namespaces
+            )
+        if informer:
+            try:
+                return informer.get(resource_name, selector=selector)
+            except TransportUnavailableError as ex:
+                log.debug(f"Not serving {self.kind} from cache: {ex}")
+        if transport:
+            try:
+                return transport.get(
+                    self.kind,
+                    resource_name=resource_name,
+                    namespace=self.namespace,
+                    all_namespaces=all_namespaces,
+                    selector=selector,
+                    field_selector=field_selector,
+                    skip_tls_verify=skip_tls_verify or self.skip_tls_verify,
+                )
+            except TransportUnavailableError as ex:
+                log.debug(f"Falling back to oc: {ex}")
+        return self.exec_oc_cmd(
+            command,
+            silent=silent,
+            skip_tls_verify=skip_tls_verify,
+        )
+
+    @retry(
+        ResourceWrongStatusException,
+        tries=4,
+        delay=5,
+        backoff=1,
+        budget=lambda self, *args, **kwargs: cluster_budget(self.kubeconfig_path()),
+    )
+    @tracing.traced(
+        lambda self, phase, *args, **kwargs: (
+            f"wait {self.kind}/{self.resource_name} {phase}"
+        ),
+        category="wait",
+    )
+    def wait_for_phase(self, phase, timeout=300, sleep=5, fatal=None):
         """
         Wait till phase of resource is the same as required one passed in
         the phase parameter.
@@ -196,17 +339,27 @@ class OCP(object):
             phase (str): Desired phase of resource object
             timeout (int): Timeout in seconds to wait for desired phase
             sleep (int): Time in seconds to sleep between attempts
+            fatal (function): Predicate of the resource data which ends the
+                wait right away, e.g. a failed install
         Raises:
             ResourceWrongStatusException: In case the resource is not in expected
                 phase.
+            SamplingAbortedError: If the fatal predicate is true, the wait
+                is not retried
             NotSupportedFunctionError: If resource doesn't have phase!
             ResourceNameNotSpecifiedException: in case the name is not
                 specified.
         """
         self.check_function_supported(self._has_phase)
         self.check_name_is_specified()
-        sampler = TimeoutSampler(timeout, sleep, func=self.check_phase, phase=phase)
-        if not sampler.wait_for_func_status(True):
+        try:
+            for sample in self.sampler(timeout, sleep, fatal=fatal):
+                if self.is_in_phase(sample, phase):
+                    return
+        except SamplingAbortedError:
+            log.error(f"Resource: {self.resource_name} won't reach phase: {phase}")
+            raise
+        except TimeoutExpiredError:
             raise ResourceWrongStatusException(
                 f"Resource: {self.resource_name} is not in expected phase: " f"{phase}"
             )
@@ -231,6 +384,18 @@ class OCP(object):
         except CommandFailed:
             log.info(f"Cannot find resource object {self.resource_name}")
             return False
+        return self.is_in_phase(data, phase)
+
+    def is_in_phase(self, data, phase):
+        """
+        Check phase of already fetched resource data
+        Args:
+            data (dict): Resource data as returned by get
+            phase (str): Phase of resource object
+        Returns:
+            bool: True if phase of object is the same as passed one, False
+                otherwise.
+        """
         try:
             current_phase = data["status"]["phase"]
             log.info(f"Resource {self.resource_name} is in phase: {current_phase}!")
@@ -242,6 +407,51 @@ class OCP(object):
             )
         return False
 
+    def sampler(self, timeout, sleep, resource_name="", selector=None, fatal=None):
+        """
+        Sampler of the resource(s) state used by the wait methods.
+        With RUN['wait_mode'] set to 'watch' and the API transport available,
+        the state is yielded right after every change reported by the watch
+        API. Otherwise it is polled with 'get' every `sleep` seconds.
+        Args:
+            timeout (int): Timeout in seconds
+            sleep (int): Sampling time in seconds when polling
+            resource_name (str): The name of the resource to sample
+            selector (str): The resource selector to search with
+            fatal (function): Predicate of the data which aborts the
+                sampling with SamplingAbortedError
+        Returns:
+            iterable: Yields the same data as 'get' returns
+        """
+        resource_name = resource_name if resource_name else self.resource_name
+        selector = selector if selector else self.selector
+        transport = self.transport
+        if (
+            transport
+            and config.RUN.get("wait_mode", "poll") == "watch"
+            and not self.skip_tls_verify
+        ):
+            return WatchSampler(
+                transport,
+                self.kind,
+                timeout,
+                sleep,
+                lambda: self.get(resource_name=resource_name, selector=selector),
+                resource_name=resource_name,
+                namespace=self.namespace,
+                selector=selector,
+                field_selector=self.field_selector,
+                fatal=fatal,
+            )
+        return TimeoutSampler(
+            timeout,
+            sleep,
+            self.get,
+            fatal=fatal,
+            resource_name=resource_name,
+            selector=selector,
+        )
+
     def check_function_supported(self, support_var):
         """
         Check if the resource supports the functionality based on the
@@ -272,8 +482,8 @@ class OCP(object):
         Args:
             command (str): The command to execute (e.g. create -f file.yaml)
                 without the initial 'oc' at the beginning
-            out_yaml_format (bool): whether to return  yaml loaded python
-                object or raw output
+            out_yaml_format (bool): whether to return the decoded python object
+                (JSON, or YAML when the output is not JSON) or raw output
             secrets (list): A list of secrets to be masked with asterisks
                 This kwarg is popped in order to not interfere with
                 subprocess.run(``**kwargs``)
@@ -283,28 +493,10 @@ class OCP(object):
             silent (bool): If True will silent errors from the server, default false
             skip_tls_verify (bool): Adding '--insecure-skip-tls-verify' to oc command
         Returns:
-            dict: Dictionary represents a returned yaml file.
+            dict: Dictionary represents the returned output.
             str: If out_yaml_format is False.
         """
-        oc_cmd = "oc "
-        env_kubeconfig = os.getenv("KUBECONFIG")
-        kubeconfig_path = (
-            self.cluster_kubeconfig if os.path.exists(self.cluster_kubeconfig) else None
-        )
-
-        if kubeconfig_path or not env_kubeconfig or not os.path.exists(env_kubeconfig):
-            cluster_dir_kubeconfig = kubeconfig_path or os.path.join(
-                config.ENV_DATA["cluster_path"], config.RUN.get("kubeconfig_location")
-            )
-            if os.path.exists(cluster_dir_kubeconfig):
-                oc_cmd += f"--kubeconfig {cluster_dir_kubeconfig} "
-
-        if self.namespace:
-            oc_cmd += f"-n {self.namespace} "
-        if skip_tls_verify or self.skip_tls_verify:
-            command += " --insecure-skip-tls-verify"
-
-        oc_cmd += command
+        oc_cmd = self.build_oc_cmd(command, skip_tls_verify)
         out = exec_cmd(
             cmd=oc_cmd,
             timeout=timeout,
@@ -314,9 +506,84 @@ class OCP(object):
             **kwargs,
         )
         if out_yaml_format:
-            return yaml.safe_load(out.stdout)
+            return loads(out.stdout)
         return out
 
+    async def exec_oc_cmd_async(
+        self,
+        command,
+        out_yaml_format=True,
+        timeout=600,
+        ignore_error=False,
+        silent=False,
+        skip_tls_verify=False,
+        **kwargs,
+    ):
+        """
+        Executing 'oc' command without blocking the event loop, the asyncio
+        equivalent of exec_oc_cmd. The commands of one cluster don't run more
+        than RUN['oc_concurrency'] at once.
+        Args:
+            command (str): The command to execute (e.g. create -f file.yaml)
+                without the initial 'oc' at the beginning
+            out_yaml_format (bool): whether to return the decoded python object
+                (JSON, or YAML when the output is not JSON) or raw output
+            timeout (int): timeout for the oc_cmd, defaults to 600 seconds
+            ignore_error (bool): True if ignore non zero return code and do not
+                raise the exception.
+            silent (bool): If True will silent errors from the server, default false
+            skip_tls_verify (bool): Adding '--insecure-skip-tls-verify' to oc command
+        Returns:
+            dict: Dictionary represents the returned output.
+            str: If out_yaml_format is False.
+        """
+        oc_cmd = self.build_oc_cmd(command, skip_tls_verify)
+        out = await exec_cmd_async(
+            cmd=oc_cmd,
+            timeout=timeout,
+            ignore_error=ignore_error,
+            silent=silent,
+            concurrency_key=self.kubeconfig_path(),
+            concurrency=config.RUN.get("oc_concurrency", ASYNC_CONCURRENCY),
+            **kwargs,
+        )
+        if out_yaml_format:
+            return loads(out.stdout)
+        return out
+
+    def build_oc_cmd(self, command, skip_tls_verify=False):
+        """
+        Build the full 'oc' command with the kubeconfig and namespace of
+        this object
+        Args:
+            command (str): The command without the initial 'oc'
+            skip_tls_verify (bool): Adding '--insecure-skip-tls-verify' to oc command
+        Returns:
+            str: The 'oc' command
+        """
+        oc_cmd = "oc "
+        kubeconfig_path = self.kubeconfig_path()
+        if kubeconfig_path:
+            oc_cmd += f"--kubeconfig {kubeconfig_path} "
+
+        if self.namespace:
+            oc_cmd += f"-n {self.namespace} "
+        if skip_tls_verify or self.skip_tls_verify:
+            command += " --insecure-skip-tls-verify"
+
+        oc_cmd += command
+        return oc_cmd
+
+    def invalidate_kind(self, kind=None):
+        """
+        Invalidate the cached state of the kind of the cluster after a write
+        through the API transport, the 'oc' writes are invalidated by
+        exec_cmd (see invalidate_cluster_cache)
+        Args:
+            kind (str): The changed kind, all kinds if not set
+        """
+        invalidate_cluster_cache(self.kubeconfig_path(), kind)
+
     def get_resource(self, resource_name, column, retry=0, wait=3, selector=None):
         """
         Get a column value for a resource based on:
@@ -333,6 +600,14 @@ class OCP(object):
         """
         resource_name = resource_name if resource_name else self.resource_name
         selector = selector if selector else self.selector
+        transport = self.transport
+        if transport:
+            try:
+                return self._get_resource_from_table(
+                    transport, resource_name, column, selector, retry, wait
+                )
+            except TransportUnavailableError as ex:
+                log.debug(f"Falling back to oc: {ex}")
         # Get the resource in str format
         resource = self.get(
             resource_name=resource_name,
@@ -388,6 +663,73 @@ class OCP(object):
 
         return resource_info[column_index]
 
+    def get_column_value(self, data, column, resource_name=""):
+        """
+        Get a column value from already fetched resource data, without
+        running another 'oc get'
+        Args:
+            data (dict): Resource or 'List' of resources as returned by get
+            column (str): The name of the column to retrieve
+            resource_name (str): Name of the resource to pick from a 'List'
+        Returns:
+            str: The column value
+            None: In case the value can't be computed from the data (unknown
+                column of the kind or resource not in the data)
+        """
+        if data.get("kind") == "List":
+            data = next(
+                (
+                    i
+                    for i in data.get("items", [])
+                    if i.get("metadata", {}).get("name") == resource_name
+                ),
+                {},
+            )
+        return get_column_value(data, column)
+
+    def _get_resource_from_table(
+        self, transport, resource_name, column, selector, retry=0, wait=3
+    ):
+        """
+        Get a column value for a resource from the table the API server
+        renders for 'oc get', so no text parsing is needed. Retried like
+        get, e.g. for a resource which doesn't exist yet.
+        """
+        if selector:
+            resource_name = ""
+        retry += 1
+        while True:
+            try:
+                titles, rows = transport.get_table(
+                    self.kind,
+                    resource_name=resource_name,
+                    namespace=self.namespace,
+                    selector=selector,
+                    skip_tls_verify=self.skip_tls_verify,
+                )
+                if not rows:
+                    raise CommandFailed(
+                        f"No resources found for {self.kind} {resource_name}"
+                    )
+                return rows[0][titles.index(column)]
+            except CommandFailed as ex:
+                retry -= 1
+                if not retry:
+                    raise
+                metrics.record_retry("OCP.get_resource", ex)
+                log.info(
+                    f"Number of attempts: {retry} to get resource: "
+                    f"{resource_name}, selector: {selector}, remain! "
+                    f"Trying again in {wait} sec."
+                )
+                time.sleep(wait if wait else 1)
+
+    @tracing.traced(
+        lambda self, condition, resource_name="", *args, **kwargs: (
+            f"wait {self.kind}/{resource_name or self.resource_name} {condition}"
+        ),
+        category="wait",
+    )
     def wait_for_resource(
         self,
         condition,
@@ -399,6 +741,7 @@ class OCP(object):
         sleep=3,
         dont_allow_other_resources=False,
         error_condition=None,
+        fatal=None,
     ):
         """
         Wait for a resource to reach to a desired condition
@@ -426,6 +769,9 @@ class OCP(object):
                 unrecoverable state of the resource(s) which is not expected to
                 be part of a workflow under test, and at the same time, the
                 timeout itself is large.
+            fatal (function): Predicate of the sampled data (as 'get'
+                returns it) which makes this method fail immediately with
+                SamplingAbortedError
         Returns:
             bool: True in case all resources reached desired condition,
                 False otherwise
@@ -454,18 +800,20 @@ class OCP(object):
         actual_status = None
 
         try:
-            for sample in TimeoutSampler(
-                timeout, sleep, self.get, resource_name, True, selector
+            for sample in self.sampler(
+                timeout, sleep, resource_name, selector, fatal=fatal
             ):
                 # Only 1 resource expected to be returned
                 if resource_name:
-                    retry = int(timeout / sleep if sleep else timeout / 1)
-                    status = self.get_resource(
-                        resource_name,
-                        column,
-                        retry=retry,
-                        wait=sleep,
-                    )
+                    status = self.get_column_value(sample, column, resource_name)
+                    if status is None:
+                        retry = int(timeout / sleep if sleep else timeout / 1)
+                        status = self.get_resource(
+                            resource_name,
+                            column,
+                            retry=retry,
+                            wait=sleep,
+                        )
                     if status == condition:
                         log.info(
                             f"status of {resource_name} at {column}"
@@ -496,7 +844,9 @@ class OCP(object):
                     for item in sample:
                         try:
                             item_name = item.get("metadata").get("name")
-                            status = self.get_resource(item_name, column)
+                            status = self.get_column_value(item, column)
+                            if status is None:
+                                status = self.get_resource(item_name, column)
                             actual_status.append(status)
                             if status == condition:
                                 in_condition.append(item)
@@ -593,6 +943,45 @@ class OCP(object):
             label (str): New label to be assigned for this pod
                 E.g: "label=app='rook-ceph-mds'"
         """
+        transport = self.transport
+        if transport:
+            labels = {}
+            for item in shlex.split(label):
+                if item.endswith("-"):
+                    labels[item[:-1]] = None
+                else:
+                    key, _, value = item.partition("=")
+                    labels[key] = value
+            try:
+                out = transport.patch(
+                    self.kind,
+                    resource_name,
+                    {"metadata": {"labels": labels}},
+                    namespace=self.namespace,
+                )
+                self.invalidate_kind(self.kind)
+                return out
+            except TransportUnavailableError as ex:
+                log.debug(f"Falling back to oc: {ex}")
         command = f"label {self.kind} {resource_name} {label} --overwrite "
         status = self.exec_oc_cmd(command)
         return status
+
+
+def invalidate_cluster_cache(kubeconfig=None, kind=None):
+    """
+    Invalidate the cached state of the cluster after a write, so the next
+    read through the informer cache lists again and the memoized results of
+    the changed kind are not used. Called by exec_cmd after every 'oc'
+    command changing the cluster state, and after the scripts and child
+    processes which change it on their own.
+    Args:
+        kubeconfig (str): Path to the kubeconfig of the cluster, all clusters
+            if not set
+        kind (str): The changed kind, all kinds if not set
+    """
+    memo_cache.invalidate(kubeconfig, kind)
+    invalidate_informers(kubeconfig, kind)
+
+
+add_write_listener(invalidate_cluster_cache)
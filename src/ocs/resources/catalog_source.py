@@ -4,13 +4,14 @@ CatalogSource related functionalities
 import logging
 from time import sleep
 
-from src.utility.cmd import exec_cmd
 from src.utility import constants
 from src.ocs.ocp import OCP
-from src.utility.exceptions import ResourceWrongStatusException, CommandFailed
-from src.utility.retry import retry
-from src.utility.timeout import TimeoutSampler
-from src.utility.openshift_ops import OpenshiftOps
+from src.utility.exceptions import (
+    ResourceWrongStatusException,
+    CommandFailed,
+    TimeoutExpiredError,
+)
+from src.utility.retry import cluster_budget, retry
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +40,13 @@ class CatalogSource(OCP):
             **kwargs,
         )
 
-    @retry(ResourceWrongStatusException, tries=4, delay=5, backoff=1)
+    @retry(
+        ResourceWrongStatusException,
+        tries=4,
+        delay=5,
+        backoff=1,
+        budget=lambda self, *args, **kwargs: cluster_budget(self.kubeconfig_path()),
+    )
     def wait_for_state(self, state, timeout=480, sleep=5):
         """
         Wait till state of catalog source resource is the same as required one
@@ -53,8 +60,11 @@ class CatalogSource(OCP):
                 expected state.
         """
         self.check_name_is_specified()
-        sampler = TimeoutSampler(timeout, sleep, self.check_state, state=state)
-        if not sampler.wait_for_func_status(True):
+        try:
+            for sample in self.sampler(timeout, sleep):
+                if self.is_in_state(sample, state):
+                    return
+        except TimeoutExpiredError:
             raise ResourceWrongStatusException(
                 f"Catalog source: {self.resource_name} is not in expected "
                 f"state: {state}"
@@ -75,6 +85,18 @@ class CatalogSource(OCP):
         except CommandFailed:
             logger.info(f"Cannot find CatalogSource object {self.resource_name}")
             return False
+        return self.is_in_state(data, state)
+
+    def is_in_state(self, data, state):
+        """
+        Check state of already fetched catalog source data
+        Args:
+            data (dict): CatalogSource data as returned by get
+            state (str): State of CatalogSource object
+        Returns:
+            bool: True if state of object is the same as desired one, False
+                otherwise.
+        """
         try:
             current_state = data["status"]["connectionState"]["lastObservedState"]
             logger.info(
@@ -94,13 +116,14 @@ def disable_specific_source(source_name, cluster_kubeconfig=""):
     Disable specific default source
     Args:
         source_name (str): Source name (e.g. redhat-operators)
+        cluster_kubeconfig (str): Path to the kubeconfig of the cluster
     """
     logger.info(f"Disabling default source: {source_name}")
-    OpenshiftOps.set_kubeconfig(cluster_kubeconfig)
-    exec_cmd(
+    OCP(cluster_kubeconfig=cluster_kubeconfig).exec_oc_cmd(
         constants.PATCH_SPECIFIC_SOURCES_CMD.format(
             disable="true", source_name=source_name
-        )
+        ),
+        out_yaml_format=False,
     )
     logger.info(f"Waiting 20 seconds after disabling source: {source_name}")
     sleep(20)
@@ -27,6 +27,17 @@ class CSV(OCP):
         )
 
 
+def is_csv_failed(data):
+    """
+    Fatal condition of the waits for a CSV phase
+    Args:
+        data (dict): The CSV
+    Returns:
+        bool: True if OLM failed to install the CSV
+    """
+    return (data or {}).get("status", {}).get("phase") == "Failed"
+
+
 def get_csvs_start_with_prefix(csv_prefix, namespace):
     """
     Get CSVs start with prefix
@@ -8,8 +8,8 @@ from src.utility.exceptions import (
     CSVNotFound,
     ChannelNotFound,
 )
-from src.utility.retry import retry
-from src.utility.timeout import TimeoutSampler
+from src.utility.retry import cluster_budget, retry
+from src.utility.memo import memoize
 from src.ocs.resources.catalog_source import CatalogSource
 
 logger = logging.getLogger(__name__)
@@ -43,7 +43,13 @@ class PackageManifest(OCP):
             **kwargs,
         )
 
-    @retry(ResourceNotFoundError, tries=10, delay=10, backoff=1)
+    @retry(
+        ResourceNotFoundError,
+        tries=10,
+        delay=10,
+        backoff=1,
+        budget=lambda self, *args, **kwargs: cluster_budget(self.kubeconfig_path()),
+    )
     def get(self, **kwargs):
         """
         Overloaded get method from OCP class.
@@ -82,7 +88,14 @@ class PackageManifest(OCP):
                     return items_match_name
         return data
 
-    @retry((CommandFailed), tries=100, delay=5, backoff=1)
+    @retry(
+        CommandFailed,
+        tries=None,
+        delay=5,
+        max_delay=60,
+        deadline=500,
+        budget=lambda self: cluster_budget(self.kubeconfig_path()),
+    )
     def get_default_channel(self):
         """
         Returns default channel for package manifest
@@ -197,20 +210,30 @@ class PackageManifest(OCP):
         selector = selector if selector else self.selector
         self.check_name_is_specified(resource_name)
 
-        for sample in TimeoutSampler(timeout=timeout, sleep=sleep, func=self.get):
-            if sample.get("metadata", {}).get("name") == resource_name:
+        for sample in self.sampler(timeout, sleep, resource_name, selector):
+            # watch based sampler yields the whole list for the selector
+            items = (
+                sample.get("items", []) if sample.get("kind") == "List" else [sample]
+            )
+            if any(i.get("metadata", {}).get("name") == resource_name for i in items):
                 logger.info(f"package manifest {resource_name} found!")
                 return
             logger.info(f"package manifest {resource_name} not found!")
 
 
-def get_selector_for_ocs_operator():
+@memoize(
+    key_func=lambda ctx=None: (OCP(ctx=ctx).kubeconfig_path(),), kind="CatalogSource"
+)
+def get_selector_for_ocs_operator(ctx=None):
     """
     This is the helper function which returns selector for package manifest.
     It's needed because of conflict with live content and multiple package
     manifests with the ocs-operator name. In case we are using internal builds
     we label catalog source or operator source and using the same selector for
     package manifest.
+    Args:
+        ctx (ClusterContext): Context of the cluster, the scoped or the
+            current cluster if not set
     Returns:
         str: Selector for package manifest if we are on internal
             builds, otherwise it returns None
@@ -219,6 +242,7 @@ def get_selector_for_ocs_operator():
         resource_name=constants.OPERATOR_CATALOG_SOURCE_NAME,
         namespace=constants.MARKETPLACE_NAMESPACE,
         selector=constants.OPERATOR_INTERNAL_SELECTOR,
+        ctx=ctx,
     )
     try:
         cs_data = catalog_source.get()
@@ -230,6 +254,7 @@ def get_selector_for_ocs_operator():
         kind="OperatorSource",
         resource_name=constants.OPERATOR_SOURCE_NAME,
         namespace=constants.MARKETPLACE_NAMESPACE,
+        ctx=ctx,
     )
     try:
         operator_source.get()
@@ -0,0 +1,634 @@
+"""
+Transports used by the OCP class to reach the cluster API server
+"""
+import atexit
+import base64
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import quote
+
+import requests
+import yaml
+from requests.adapters import HTTPAdapter
+
+from src.utility import metrics
+from src.utility.codec import dumps_json, load_yaml_file, loads_json
+from src.utility.exceptions import CommandFailed, TransportUnavailableError
+from src.utility.utils import get_scratch_dir
+
+log = logging.getLogger(__name__)
+
+API_TRANSPORT = "api"
+OC_TRANSPORT = "oc"
+
+VERSION_PATTERN = re.compile(r"^v\d+((alpha|beta)\d+)?$")
+TABLE_ACCEPT_HEADER = (
+    "application/json;as=Table;v=v1;g=meta.k8s.io,"
+    "application/json;as=Table;v=v1beta1;g=meta.k8s.io,application/json"
+)
+
+# HTTP status the API server uses when the requested resourceVersion is too old
+WATCH_EXPIRED_CODE = 410
+
+# Seconds 'oc' is used for a cluster after its API server couldn't be
+# reached, before the API transport is tried again
+UNAVAILABLE_SECONDS = 60
+
+ApiResource = namedtuple("ApiResource", ["group_version", "name", "kind", "namespaced"])
+
+
+class KubeConfig(object):
+    """
+    Minimal kubeconfig reader which exposes the connection details of the
+    current context.
+    """
+
+    def __init__(self, path):
+        """
+        Initializer function
+        Args:
+            path (str): Path to the kubeconfig file
+        Raises:
+            TransportUnavailableError: In case the kubeconfig can't be used
+        """
+        self.path = path
+        try:
+            data = load_yaml_file(path) or {}
+        except (OSError, yaml.YAMLError) as ex:
+            raise TransportUnavailableError(f"Unable to load kubeconfig {path}: {ex}")
+        context_name = data.get("current-context")
+        context = self._named(data.get("contexts"), context_name) or {}
+        if not context and data.get("contexts"):
+            context = data["contexts"][0].get("context", {})
+        self.namespace = context.get("namespace")
+        self.cluster = self._named(data.get("clusters"), context.get("cluster"))
+        self.user = self._named(data.get("users"), context.get("user")) or {}
+        if not self.cluster or not self.cluster.get("server"):
+            raise TransportUnavailableError(f"No API server found in kubeconfig {path}")
+        self.server = self.cluster["server"].rstrip("/")
+
+    @staticmethod
+    def _named(entries, name):
+        for entry in entries or []:
+            if entry.get("name") == name:
+                # the actual content is nested under the entry type key
+                # (e.g. cluster, user, context)
+                return next(
+                    (v for k, v in entry.items() if k != "name"),
+                    {},
+                )
+        return None
+
+
+class ApiTransport(object):
+    """
+    Transport which talks to the Kubernetes API server over a pooled,
+    keep-alive HTTP session built from the cluster kubeconfig.
+    """
+
+    name = API_TRANSPORT
+
+    def __init__(self, kubeconfig, pool_maxsize=10, timeout=60):
+        """
+        Initializer function
+        Args:
+            kubeconfig (str): Path to the cluster kubeconfig file
+            pool_maxsize (int): Number of connections kept in the pool
+            timeout (int): Read timeout in seconds for a single request
+        Raises:
+            TransportUnavailableError: In case the kubeconfig can't be used
+        """
+        self.kubeconfig = KubeConfig(kubeconfig)
+        self.server = self.kubeconfig.server
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._resources = {}
+        self._group_resources = {}
+        self._groups = None
+        self._cert_dir = None
+        self.unavailable_until = 0
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {
+                "Accept": "application/json",
+                "Accept-Encoding": "gzip",
+                "User-Agent": "ocp4-mco-ci",
+            }
+        )
+        self._configure_auth()
+
+    def _configure_auth(self):
+        cluster = self.kubeconfig.cluster
+        user = self.kubeconfig.user
+        if cluster.get("insecure-skip-tls-verify"):
+            self.session.verify = False
+        elif cluster.get("certificate-authority-data"):
+            self.session.verify = self._write_cert(
+                "ca.crt", cluster["certificate-authority-data"]
+            )
+        elif cluster.get("certificate-authority"):
+            self.session.verify = cluster["certificate-authority"]
+        if user.get("client-certificate-data") and user.get("client-key-data"):
+            self.session.cert = (
+                self._write_cert("client.crt", user["client-certificate-data"]),
+                self._write_cert("client.key", user["client-key-data"]),
+            )
+        elif user.get("client-certificate") and user.get("client-key"):
+            self.session.cert = (user["client-certificate"], user["client-key"])
+        if user.get("token"):
+            self.session.headers["Authorization"] = f"Bearer {user['token']}"
+        elif user.get("username") and user.get("password"):
+            self.session.auth = (user["username"], user["password"])
+
+    def _write_cert(self, name, data):
+        if not self._cert_dir:
+            self._cert_dir = tempfile.mkdtemp(
+                dir=get_scratch_dir(), prefix="ocp_transport_"
+            )
+        path = os.path.join(self._cert_dir, name)
+        with open(path, "wb") as f:
+            f.write(base64.b64decode(data))
+        os.chmod(path, 0o600)
+        return path
+
+    def close(self):
+        """
+        Close the pooled connections and remove the extracted certificates
+        """
+        self.session.close()
+        if self._cert_dir:
+            shutil.rmtree(self._cert_dir, ignore_errors=True)
+            self._cert_dir = None
+
+    def request(self, method, path, params=None, headers=None, verify=None, **kwargs):
+        """
+        Send a request to the API server
+        Args:
+            method (str): HTTP method
+            path (str): Absolute API path (e.g. /api/v1/nodes)
+            params (dict): Query parameters
+            headers (dict): Additional headers for this request
+            verify (bool): Override TLS verification for this request
+        Returns:
+            requests.Response: Response of the API server
+        Raises:
+            CommandFailed: In case the API server answered with an error
+            TransportUnavailableError: In case the API server can't be reached
+        """
+        if verify is not None and not verify:
+            kwargs["verify"] = False
+        kwargs.setdefault("timeout", (10, self.timeout))
+        start = time.monotonic()
+        try:
+            response = self.session.request(
+                method, self.server + path, params=params, headers=headers, **kwargs
+            )
+        except requests.RequestException as ex:
+            self._record(method, path, start, None, 0)
+            if not kwargs.get("stream"):
+                self.unavailable_until = time.monotonic() + UNAVAILABLE_SECONDS
+            raise TransportUnavailableError(
+                f"Unable to reach API server {self.server}: {ex}"
+            )
+        # the body of a streamed (watch) response is not read yet
+        size = 0 if kwargs.get("stream") else len(response.content)
+        self._record(method, path, start, response.status_code, size)
+        if response.status_code >= 400:
+            ex = CommandFailed(
+                f"Error from server ({self._reason(response)}): "
+                f"{method} {path} failed with status {response.status_code}: "
+                f"{self._message(response)}"
+            )
+            ex.status = response.status_code
+            raise ex
+        return response
+
+    @property
+    def available(self):
+        """
+        False for UNAVAILABLE_SECONDS after the API server couldn't be
+        reached, so the callers use 'oc' instead of waiting for the connect
+        timeout again
+        """
+        return time.monotonic() >= self.unavailable_until
+
+    def _record(self, method, path, start, status, size):
+        metrics.record_api_request(
+            method,
+            self.api_resource(path),
+            time.monotonic() - start,
+            status,
+            size,
+            self.kubeconfig.path,
+        )
+
+    @staticmethod
+    def api_resource(path):
+        """
+        The resource of the API path, e.g. 'pods' for
+        /api/v1/namespaces/default/pods/name, 'discovery' for the group and
+        version paths
+        """
+        segments = path.split("?")[0].strip("/").split("/")
+        rest = segments[2:] if segments[0] == "api" else segments[3:]
+        if rest[:1] == ["namespaces"] and len(rest) > 2:
+            rest = rest[2:]
+        return rest[0] if rest else "discovery"
+
+    @staticmethod
+    def _reason(response):
+        try:
+            return response.json().get("reason") or response.reason
+        except ValueError:
+            return response.reason
+
+    @staticmethod
+    def _message(response):
+        try:
+            return response.json().get("message") or response.text
+        except ValueError:
+            return response.text
+
+    def _group_version_resources(self, group_version):
+        resources = self._group_resources.get(group_version)
+        if resources is None:
+            prefix = "/api" if group_version == "v1" else "/apis"
+            try:
+                response = self.request("GET", f"{prefix}/{group_version}")
+                data = loads_json(response.content)
+            except CommandFailed as ex:
+                log.debug(f"Discovery of {group_version} failed: {ex}")
+                data = {}
+            resources = [
+                r for r in data.get("resources", []) if "/" not in r.get("name", "")
+            ]
+            self._group_resources[group_version] = resources
+        return resources
+
+    def _api_groups(self):
+        if self._groups is None:
+            try:
+                response = self.request("GET", "/apis")
+                self._groups = loads_json(response.content).get("groups", [])
+            except CommandFailed as ex:
+                raise TransportUnavailableError(f"API discovery failed: {ex}")
+        return self._groups
+
+    def _candidate_group_versions(self, group=None, version=None):
+        if not group:
+            yield "v1"
+        for api_group in self._api_groups():
+            if group and api_group["name"] != group:
+                continue
+            if version:
+                yield f"{api_group['name']}/{version}"
+            else:
+                yield api_group["preferredVersion"]["groupVersion"]
+
+    def resolve(self, kind):
+        """
+        Resolve the kind, the same way 'oc' does, to the API resource
+        Args:
+            kind (str): Kind, resource name, short name or fully qualified
+                resource (e.g. csv, Node, subscriptions.v1alpha1.operators.coreos.com)
+        Returns:
+            ApiResource: Resolved API resource
+        Raises:
+            TransportUnavailableError: In case the kind is not served by the
+                API server, so the caller can fall back to 'oc'
+        """
+        if kind in self._resources:
+            return self._resources[kind]
+        with self._lock:
+            if kind in self._resources:
+                return self._resources[kind]
+            name, group, version = kind.lower(), None, None
+            if "." in name:
+                name, group = name.split(".", 1)
+                if "." in group and VERSION_PATTERN.match(group.split(".", 1)[0]):
+                    version, group = group.split(".", 1)
+            for group_version in self._candidate_group_versions(group, version):
+                for r in self._group_version_resources(group_version):
+                    names = [r["name"], r.get("singularName"), r["kind"].lower()]
+                    if name in names or name in r.get("shortNames", []):
+                        resource = ApiResource(
+                            group_version, r["name"], r["kind"], r["namespaced"]
+                        )
+                        self._resources[kind] = resource
+                        return resource
+        raise TransportUnavailableError(f"Unable to resolve kind {kind} from API")
+
+    def resource_path(
+        self, kind, resource_name="", namespace=None, all_namespaces=False
+    ):
+        """
+        Build the API path for the kind
+        Args:
+            kind (str): Kind of the resource
+            resource_name (str): Name of the resource
+            namespace (str): Namespace of the resource, ignored for cluster
+                scoped resources. The kubeconfig namespace is used if not set.
+            all_namespaces (bool): Look in all namespaces if namespace is not set
+        Returns:
+            str: API path
+        """
+        resource = self.resolve(kind)
+        if not namespace and not all_namespaces:
+            namespace = self.kubeconfig.namespace or "default"
+        prefix = "/api" if resource.group_version == "v1" else "/apis"
+        path = f"{prefix}/{resource.group_version}"
+        if resource.namespaced and namespace:
+            path += f"/namespaces/{quote(namespace)}"
+        path += f"/{resource.name}"
+        if resource_name:
+            path += f"/{quote(resource_name)}"
+        return path
+
+    @staticmethod
+    def list_params(selector=None, field_selector=None):
+        params = {}
+        if selector:
+            params["labelSelector"] = selector
+        if field_selector:
+            params["fieldSelector"] = field_selector
+        return params
+
+    def get(
+        self,
+        kind,
+        resource_name="",
+        namespace=None,
+        selector=None,
+        field_selector=None,
+        all_namespaces=False,
+        skip_tls_verify=False,
+    ):
+        """
+        Equivalent of 'oc get <kind> [<resource_name>] -o yaml'
+        Args:
+            kind (str): Kind of the resource
+            resource_name (str): Name of the resource, lists all if empty
+            namespace (str): Namespace to look in
+            selector (str): The label selector to look for
+            field_selector (str): Selector (field query) to filter on
+            all_namespaces (bool): Equal to oc get <kind> -A
+            skip_tls_verify (bool): Skip TLS verification of this request
+        Returns:
+            dict: The resource, or a 'List' of resources like 'oc' returns
+        """
+        path = self.resource_path(kind, resource_name, namespace, all_namespaces)
+        params = self.list_params(selector, field_selector)
+        response = self.request("GET", path, params=params, verify=not skip_tls_verify)
+        data = loads_json(response.content)
+        if resource_name:
+            return data
+        return self.to_list(kind, data)
+
+    def to_list(self, kind, data):
+        """
+        Convert the typed list returned by the API server (e.g. NodeList) to
+        the generic 'List' returned by 'oc get -o yaml'
+        """
+        resource = self.resolve(kind)
+        items = data.get("items") or []
+        for item in items:
+            item.setdefault("apiVersion", resource.group_version)
+            item.setdefault("kind", resource.kind)
+        return {
+            "apiVersion": "v1",
+            "kind": "List",
+            "items": items,
+            "metadata": {
+                "resourceVersion": data.get("metadata", {}).get("resourceVersion", "")
+            },
+        }
+
+    def get_table(
+        self,
+        kind,
+        resource_name="",
+        namespace=None,
+        selector=None,
+        field_selector=None,
+        all_namespaces=False,
+        skip_tls_verify=False,
+    ):
+        """
+        Equivalent of 'oc get <kind> [<resource_name>]' in table format
+        Returns:
+            tuple: list of upper cased column names and list of rows, where
+                every row is a list of cell values as 'oc' prints them
+        """
+        path = self.resource_path(kind, resource_name, namespace, all_namespaces)
+        params = self.list_params(selector, field_selector)
+        params["includeObject"] = "None"
+        response = self.request(
+            "GET",
+            path,
+            params=params,
+            headers={"Accept": TABLE_ACCEPT_HEADER},
+            verify=not skip_tls_verify,
+        )
+        data = loads_json(response.content)
+        if data.get("kind") != "Table":
+            raise TransportUnavailableError(f"Table output not supported for {kind}")
+        titles = [c["name"].upper() for c in data.get("columnDefinitions", [])]
+        rows = [
+            [self._format_cell(cell) for cell in row.get("cells", [])]
+            for row in data.get("rows", [])
+        ]
+        return titles, rows
+
+    def watch(
+        self,
+        kind,
+        namespace=None,
+        selector=None,
+        field_selector=None,
+        all_namespaces=False,
+        resource_version=None,
+        timeout_seconds=300,
+    ):
+        """
+        Equivalent of 'oc get <kind> --watch', starting right after the
+        resource_version, so no event is lost between a list and a watch
+        Args:
+            kind (str): Kind of the resource
+            namespace (str): Namespace to look in
+            selector (str): The label selector to look for
+            field_selector (str): Selector (field query) to filter on
+            all_namespaces (bool): Equal to oc get <kind> -A
+            resource_version (str): Resource version to start the watch from
+            timeout_seconds (int): The API server closes the watch after this
+                time
+        Yields:
+            tuple: Event type (ADDED, MODIFIED, DELETED, BOOKMARK or ERROR)
+                and the object of the event. A resource_version too old to
+                start the watch from is reported as an ERROR event with the
+                WATCH_EXPIRED_CODE, the same as when it expires during the
+                watch.
+        Raises:
+            CommandFailed: In case the API server refuses the watch
+            TransportUnavailableError: In case the watch connection is lost
+        """
+        path = self.resource_path(kind, "", namespace, all_namespaces)
+        params = self.list_params(selector, field_selector)
+        params["watch"] = "true"
+        params["allowWatchBookmarks"] = "true"
+        params["timeoutSeconds"] = max(int(timeout_seconds), 1)
+        if resource_version:
+            params["resourceVersion"] = resource_version
+        try:
+            response = self.request(
+                "GET",
+                path,
+                params=params,
+                stream=True,
+                timeout=(10, params["timeoutSeconds"] + 10),
+            )
+        except CommandFailed as ex:
+            if getattr(ex, "status", None) != WATCH_EXPIRED_CODE:
+                raise
+            yield "ERROR", {
+                "kind": "Status",
+                "code": WATCH_EXPIRED_CODE,
+                "message": str(ex),
+            }
+            return
+        try:
+            for line in response.iter_lines():
+                if line:
+                    event = loads_json(line)
+                    yield event.get("type"), event.get("object", {})
+        except requests.RequestException as ex:
+            raise TransportUnavailableError(f"Watch of {kind} interrupted: {ex}")
+        finally:
+            response.close()
+
+    @staticmethod
+    def _format_cell(cell):
+        if cell is None:
+            return "<none>"
+        if isinstance(cell, bool):
+            return str(cell).lower()
+        return str(cell)
+
+    def patch(self, kind, resource_name, patch, namespace=None, patch_type="merge"):
+        """
+        Equivalent of 'oc patch <kind> <resource_name> --type <patch_type>'
+        Args:
+            kind (str): Kind of the resource
+            resource_name (str): Name of the resource
+            patch (dict or list): The patch to apply
+            namespace (str): Namespace of the resource
+            patch_type (str): One of merge, json or strategic
+        Returns:
+            dict: The patched resource
+        """
+        content_types = {
+            "merge": "application/merge-patch+json",
+            "json": "application/json-patch+json",
+            "strategic": "application/strategic-merge-patch+json",
+        }
+        path = self.resource_path(kind, resource_name, namespace)
+        response = self.request(
+            "PATCH",
+            path,
+            json=patch,
+            headers={"Content-Type": content_types[patch_type]},
+        )
+        return loads_json(response.content)
+
+    def apply(self, kind, body, namespace=None, field_manager=None, force=True):
+        """
+        Equivalent of 'oc apply --server-side -f <file>' for one object
+        Args:
+            kind (str): Kind of the resource, qualified with the version and
+                group for custom resources (e.g. subscription.v1alpha1.operators.coreos.com)
+            body (dict): The object to apply
+            namespace (str): Namespace of the object if not set in the body
+            field_manager (str): Name of the field manager
+            force (bool): Take over the fields owned by other managers
+        Returns:
+            dict: The applied resource
+        """
+        path = self.resource_path(
+            kind, body["metadata"]["name"], body["metadata"].get("namespace", namespace)
+        )
+        params = {"force": "true" if force else "false"}
+        if field_manager:
+            params["fieldManager"] = field_manager
+        response = self.request(
+            "PATCH",
+            path,
+            params=params,
+            data=dumps_json(body),
+            headers={"Content-Type": "application/apply-patch+yaml"},
+        )
+        return loads_json(response.content)
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(kubeconfig, transport_name=API_TRANSPORT):
+    """
+    Get the shared transport for the cluster. Transports are cached per
+    kubeconfig, so every OCP object of the same cluster reuses the same
+    connection pool. The cached transport is rebuilt when the kubeconfig
+    file changes, and not used for UNAVAILABLE_SECONDS after its API server
+    couldn't be reached.
+    Args:
+        kubeconfig (str): Path to the cluster kubeconfig file
+        transport_name (str): Requested transport: 'api' or 'oc'
+    Returns:
+        ApiTransport: Pooled API transport for the cluster
+        None: In case 'oc' should be used
+    """
+    if transport_name != API_TRANSPORT or not kubeconfig:
+        return None
+    path = os.path.abspath(kubeconfig)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _transports_lock:
+        cached = _transports.get(path)
+        if cached and cached[0] == mtime:
+            transport = cached[1]
+            if transport and not transport.available:
+                return None
+            return transport
+        try:
+            transport = ApiTransport(path)
+        except TransportUnavailableError as ex:
+            log.warning(f"API transport not available, using oc: {ex}")
+            transport = None
+        if cached and cached[1]:
+            cached[1].close()
+        _transports[path] = (mtime, transport)
+        return transport
+
+
+def close_transports():
+    """
+    Close all the cached transports
+    """
+    with _transports_lock:
+        for _, transport in _transports.values():
+            if transport:
+                transport.close()
+        _transports.clear()
+
+
+atexit.register(close_transports)
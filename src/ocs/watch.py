@@ -0,0 +1,199 @@
+"""
+Watch based sampling of resources
+"""
+import logging
+import time
+
+from src.ocs.transport import WATCH_EXPIRED_CODE
+from src.utility.exceptions import (
+    CommandFailed,
+    SamplingAbortedError,
+    TimeoutExpiredError,
+    TransportUnavailableError,
+)
+
+log = logging.getLogger(__name__)
+
+
+class WatchSampler(object):
+    """
+    Samples the state of resource(s) through the Kubernetes watch API.
+    This is a drop-in replacement of TimeoutSampler(timeout, sleep, ocp.get):
+    it yields the current state (the object for a named resource, a 'List'
+    otherwise) first, and then again right after every change reported by the
+    API server, until the timeout is reached.
+    The watch is resumed from the last seen resourceVersion when the
+    connection drops. When the API server doesn't allow listing or watching
+    the resource, it falls back to sampling poll_func every `sleep` seconds.
+    Args:
+        transport (ApiTransport): Transport of the cluster
+        kind (str): Kind of the resource
+        timeout (int): Timeout in seconds
+        sleep (int): Polling interval in seconds, used only if watch is not
+            available
+        poll_func (function): Function returning the current state, used
+            only if watch is not available
+        resource_name (str): Name of the resource, all resources if empty
+        namespace (str): Namespace of the resource(s)
+        selector (str): The label selector to look for
+        field_selector (str): Selector (field query) to filter on
+        fatal (function): Predicate of the state which aborts the sampling
+            with SamplingAbortedError, as in TimeoutSampler
+    """
+
+    def __init__(
+        self,
+        transport,
+        kind,
+        timeout,
+        sleep,
+        poll_func,
+        resource_name="",
+        namespace=None,
+        selector=None,
+        field_selector=None,
+        fatal=None,
+    ):
+        self.transport = transport
+        self.kind = kind
+        self.timeout = timeout
+        self.sleep = sleep
+        self.poll_func = poll_func
+        self.resource_name = "" if selector or field_selector else resource_name
+        self.namespace = namespace
+        self.selector = selector
+        self.field_selector = field_selector
+        self.fatal = fatal
+        if self.resource_name:
+            self.field_selector = f"metadata.name={self.resource_name}"
+        self.start_time = None
+        self.resource_version = None
+        self._items = {}
+        self.timeout_exc_args = [
+            self.timeout,
+            f"Timed out after {timeout}s watching {kind} "
+            f"{resource_name or selector or field_selector or ''}",
+        ]
+
+    def _remaining(self):
+        return self.timeout - (time.time() - self.start_time)
+
+    @staticmethod
+    def _key(item):
+        metadata = item.get("metadata", {})
+        return metadata.get("namespace"), metadata.get("name")
+
+    def _list(self):
+        data = self.transport.get(
+            self.kind,
+            namespace=self.namespace,
+            selector=self.selector,
+            field_selector=self.field_selector,
+        )
+        self.resource_version = data["metadata"].get("resourceVersion")
+        self._items = {self._key(item): item for item in data["items"]}
+
+    def _sample(self):
+        """
+        Current state in the same format as OCP.get returns it
+        Returns:
+            dict: The object for a named resource, 'List' otherwise
+            None: In case the named resource doesn't exist
+        """
+        items = list(self._items.values())
+        if self.resource_name:
+            return items[0] if items else None
+        return {
+            "apiVersion": "v1",
+            "kind": "List",
+            "items": items,
+            "metadata": {"resourceVersion": self.resource_version},
+        }
+
+    def _apply(self, event_type, obj):
+        """
+        Apply the watch event to the local state
+        Returns:
+            bool: True if the state changed
+        """
+        self.resource_version = obj.get("metadata", {}).get(
+            "resourceVersion", self.resource_version
+        )
+        if event_type == "BOOKMARK":
+            return False
+        obj.setdefault("kind", self.transport.resolve(self.kind).kind)
+        obj.setdefault("apiVersion", self.transport.resolve(self.kind).group_version)
+        if event_type == "DELETED":
+            self._items.pop(self._key(obj), None)
+        else:
+            self._items[self._key(obj)] = obj
+        return True
+
+    def _check_timeout(self):
+        if self._remaining() <= 0:
+            raise TimeoutExpiredError(*self.timeout_exc_args)
+
+    def _checked(self, sample):
+        """
+        Raises:
+            SamplingAbortedError: If the fatal predicate is true for the sample
+        """
+        if self.fatal and self.fatal(sample):
+            raise SamplingAbortedError(
+                self.timeout,
+                f"Aborted after {self.timeout - self._remaining():.0f}s watching "
+                f"{self.kind} {self.resource_name or self.selector or ''}, "
+                f"fatal condition reached",
+            )
+        return sample
+
+    def __iter__(self):
+        if self.start_time is None:
+            self.start_time = time.time()
+        try:
+            self._list()
+        except (CommandFailed, TransportUnavailableError) as ex:
+            log.info(f"Unable to list {self.kind}, polling instead: {ex}")
+            yield from self._poll()
+        if self._sample() is not None:
+            yield self._checked(self._sample())
+        while True:
+            self._check_timeout()
+            try:
+                for event_type, obj in self.transport.watch(
+                    self.kind,
+                    namespace=self.namespace,
+                    selector=self.selector,
+                    field_selector=self.field_selector,
+                    resource_version=self.resource_version,
+                    timeout_seconds=self._remaining(),
+                ):
+                    if event_type == "ERROR":
+                        if obj.get("code") == WATCH_EXPIRED_CODE:
+                            log.debug(f"Watch of {self.kind} expired, listing again")
+                            self._list()
+                            if self._sample() is not None:
+                                yield self._checked(self._sample())
+                            break
+                        raise CommandFailed(f"Watch of {self.kind} failed: {obj}")
+                    if self._apply(event_type, obj) and self._sample() is not None:
+                        yield self._checked(self._sample())
+                    self._check_timeout()
+            except TransportUnavailableError as ex:
+                log.info(f"Watch of {self.kind} disconnected, resuming: {ex}")
+                time.sleep(1)
+            except CommandFailed as ex:
+                log.info(f"Watch of {self.kind} not available, polling instead: {ex}")
+                yield from self._poll()
+
+    def _poll(self):
+        while True:
+            self._check_timeout()
+            try:
+                sample = self.poll_func()
+            except Exception as ex:
+                log.exception(f"Exception raised during iteration: {ex}")
+            else:
+                yield self._checked(sample)
+            self._check_timeout()
+            time.sleep(min(self.sleep, max(self._remaining(), 0)))
@@ -0,0 +1,237 @@
+"""
+Store of the downloaded binaries (openshift-install, oc and kubectl, subctl)
+shared by the clusters of a run and by concurrent runs: every version lives
+in its own directory <store>/<tool>/<version>, downloaded once under a file
+lock, with its metadata (reported version, checksums, last use) so that no
+binary has to be run to find out what is installed
+"""
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from src.framework import config
+
+logger = logging.getLogger(__name__)
+
+METADATA_FILENAME = "metadata.json"
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    """
+    Returns:
+        str: SHA-256 of the file
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BinaryStore(object):
+    """
+    Binaries by tool and resolved version
+    """
+
+    # Serializes the threads of this process, flock serializes the processes
+    _thread_locks = {}
+    _thread_locks_lock = threading.Lock()
+
+    def __init__(self, root):
+        """
+        Initializer function
+        Args:
+            root (str): Directory of the store
+        """
+        self.root = os.path.abspath(os.path.expanduser(root))
+
+    def path(self, tool, version):
+        """
+        Returns:
+            str: Directory of the version of the tool
+        """
+        return os.path.join(self.root, tool, version)
+
+    @contextlib.contextmanager
+    def lock(self, tool, version, blocking=True):
+        """
+        Lock the version of the tool against the other threads and processes
+        Args:
+            blocking (bool): Wait for the lock, if False yield False when the
+                version is locked
+        Yields:
+            bool: True if the lock is held
+        """
+        lock_path = f"{self.path(tool, version)}.lock"
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with self._thread_locks_lock:
+            thread_lock = self._thread_locks.setdefault(lock_path, threading.Lock())
+        if not thread_lock.acquire(blocking):
+            yield False
+            return
+        try:
+            with open(lock_path, "w") as lock_file:
+                try:
+                    fcntl.flock(
+                        lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB)
+                    )
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            thread_lock.release()
+
+    def metadata(self, tool, version):
+        """
+        Returns:
+            dict: Metadata of the version of the tool, None if it's not in the
+                store or incomplete
+        """
+        directory = self.path(tool, version)
+        try:
+            with open(os.path.join(directory, METADATA_FILENAME)) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not all(
+            os.path.isfile(os.path.join(directory, name)) for name in metadata["files"]
+        ):
+            return None
+        return metadata
+
+    def _write_metadata(self, directory, metadata):
+        tmp_path = os.path.join(directory, f"{METADATA_FILENAME}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(tmp_path, os.path.join(directory, METADATA_FILENAME))
+
+    def verify(self, tool, version, metadata):
+        """
+        Returns:
+            bool: True if the files match the checksums of the metadata
+        """
+        directory = self.path(tool, version)
+        return all(
+            file_sha256(os.path.join(directory, name)) == sha256
+            for name, sha256 in metadata["files"].items()
+        )
+
+    def get(self, tool, version, fetch, verify=False, max_age=None):
+        """
+        Get the version of the tool, fetched if it's not in the store
+        Args:
+            tool (str): Name of the tool, e.g. openshift-client
+            version (str): Resolved version, e.g. 4.12.0-0.nightly-2023-01-01-000000
+            fetch (function): Called with a staging directory to download the
+                files of the version to, returns a dict of metadata to keep
+                (e.g. the version reported by the binary)
+            verify (bool): Check the checksums of the stored files and fetch
+                them again if they don't match
+            max_age (int): Seconds after which a stored version is fetched
+                again, for the versions which are not pinned (e.g. latest)
+        Returns:
+            dict: The metadata, with the directory of the version as 'path'
+        """
+        directory = self.path(tool, version)
+        with self.lock(tool, version):
+            metadata = self.metadata(tool, version)
+            if metadata and max_age and time.time() - metadata["fetched"] > max_age:
+                logger.info(f"{tool} {version} in the store is outdated")
+                metadata = None
+            if metadata and verify and not self.verify(tool, version, metadata):
+                logger.warning(f"{tool} {version} in the store is corrupted")
+                metadata = None
+            if metadata is None:
+                logger.info(f"Fetching {tool} {version} to the binary store")
+                os.makedirs(os.path.dirname(directory), exist_ok=True)
+                staging = tempfile.mkdtemp(
+                    dir=os.path.dirname(directory), prefix=f".{version}-"
+                )
+                try:
+                    extra = fetch(staging) or {}
+                    files = {
+                        name: file_sha256(os.path.join(staging, name))
+                        for name in sorted(os.listdir(staging))
+                    }
+                    metadata = dict(
+                        extra,
+                        tool=tool,
+                        version=version,
+                        files=files,
+                        fetched=time.time(),
+                    )
+                    shutil.rmtree(directory, ignore_errors=True)
+                    os.replace(staging, directory)
+                finally:
+                    shutil.rmtree(staging, ignore_errors=True)
+            metadata["last_used"] = time.time()
+            self._write_metadata(directory, metadata)
+        return dict(metadata, path=directory)
+
+    def link(self, metadata, bin_dir, names=None):
+        """
+        Point the names in bin_dir (which is on PATH) to the files of a stored
+        version, the links are replaced atomically
+        Args:
+            metadata (dict): The metadata returned by get
+            bin_dir (str): Directory of the links
+            names (list): Names of the files to link, all of them if not set
+        """
+        os.makedirs(bin_dir, exist_ok=True)
+        for name in names or metadata["files"]:
+            link_path = os.path.join(bin_dir, name)
+            tmp_path = f"{link_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            os.symlink(os.path.join(metadata["path"], name), tmp_path)
+            os.replace(tmp_path, link_path)
+
+    def evict(self, max_unused_days):
+        """
+        Remove the versions not used for max_unused_days, the versions locked
+        by a download are kept
+        Args:
+            max_unused_days (float): Days since the last use
+        Returns:
+            list: (tool, version) of the removed versions
+        """
+        removed = []
+        deadline = time.time() - max_unused_days * 86400
+        if not os.path.isdir(self.root):
+            return removed
+        for tool in sorted(os.listdir(self.root)):
+            tool_dir = os.path.join(self.root, tool)
+            if not os.path.isdir(tool_dir):
+                continue
+            for version in sorted(os.listdir(tool_dir)):
+                directory = os.path.join(tool_dir, version)
+                if version.startswith(".") or not os.path.isdir(directory):
+                    continue
+                with self.lock(tool, version, blocking=False) as locked:
+                    if not locked:
+                        continue
+                    metadata = self.metadata(tool, version) or {}
+                    last_used = metadata.get("last_used") or os.path.getmtime(directory)
+                    if last_used < deadline:
+                        logger.info(f"Evicting {tool} {version} from the binary store")
+                        shutil.rmtree(directory, ignore_errors=True)
+                        removed.append((tool, version))
+        return removed
+
+
+def get_binary_store():
+    """
+    Returns:
+        BinaryStore: The store in RUN['binary_store_dir']
+    """
+    return BinaryStore(config.RUN["binary_store_dir"])
@@ -1,11 +1,59 @@
+import asyncio
 import shlex
 import subprocess
 import logging
+import threading
+import time
+from collections import deque
 
+from src.utility import metrics, tracing
+from src.utility.constants import OC_WRITE_VERBS
 from src.utility.exceptions import CommandFailed
 
 logger = logging.getLogger(__name__)
 
+# Default number of commands exec_cmd_async runs at once per concurrency key
+ASYNC_CONCURRENCY = 8
+# Semaphores by event loop and concurrency key, the event loops may run in
+# different threads (e.g. the deployment tasks)
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+# Number of the last output lines kept by the streaming mode of exec_cmd
+STREAM_TAIL_LINES = 200
+# Functions called after every 'oc' command changing the cluster state
+_write_listeners = []
+
+
+def add_write_listener(listener):
+    """
+    Register a function called with the kubeconfig (None if the command
+    doesn't set one) and the kind (None if not known, e.g. 'oc apply -f') of
+    every 'oc' command changing the cluster state run by exec_cmd or
+    exec_cmd_async, e.g. to invalidate the cached state of the cluster
+    Args:
+        listener (function): The function
+    """
+    _write_listeners.append(listener)
+
+
+def notify_write(cmd, labels=None):
+    """
+    Call the write listeners if the command changed the cluster state
+    Args:
+        cmd (list): The executed command
+        labels (dict): Labels of the command metrics, their kind is used
+            instead of the one derived from the command
+    """
+    parsed = metrics.parse_command(cmd)
+    if parsed["command"] != "oc" or parsed["verb"] not in OC_WRITE_VERBS:
+        return
+    kind = (labels or {}).get("kind") or parsed["kind"] or None
+    for listener in _write_listeners:
+        try:
+            listener(parsed["kubeconfig"], kind)
+        except Exception:
+            logger.exception(f"Write listener {listener} failed")
+
 
 def exec_cmd(
     cmd,
@@ -13,12 +61,18 @@ def exec_cmd(
     ignore_error=False,
     threading_lock=None,
     silent=False,
+    stream=False,
+    line_callback=None,
+    metrics_labels=None,
     **kwargs,
 ):
     """
     Run an arbitrary command locally
     If the command is grep and matching pattern is not found, then this function
     returns "command terminated with exit code 1" in stderr.
+    In the streaming mode the output lines are logged as they arrive and only
+    the last STREAM_TAIL_LINES lines of stdout and stderr are kept, which is
+    suitable for long running commands like 'openshift-install'.
     Args:
         cmd (str): command to run
         timeout (int): Timeout for the command, defaults to 600 seconds.
@@ -27,6 +81,17 @@ def exec_cmd(
         threading_lock (threading.Lock): threading.Lock object that is used
             for handling concurrent oc commands
         silent (bool): If True will silent errors from the server, default false
+        stream (bool): Log the output while the command is running
+        line_callback (function): Called with the stream name ('stdout' or
+            'stderr') and the line for every output line, enables the
+            streaming mode. If it raises, the command is killed and the
+            exception is re-raised.
+        metrics_labels (dict): Labels of the command metrics overriding the
+            ones derived from the command (e.g. the kind of 'oc apply -f')
+        kwargs (dict): additional keyword arguments passed to
+            subprocess.run(...), e.g. input (bytes) to send to the stdin of
+            the command like the manifests of 'oc apply -f -' (not in the
+            streaming mode)
     Raises:
         CommandFailed: In case the command execution fails
     Returns:
@@ -41,29 +106,184 @@ def exec_cmd(
     logger.info(f"Executing command: {cmd}")
     if isinstance(cmd, str):
         cmd = shlex.split(cmd)
-    if threading_lock and cmd[0] == "oc":
-        threading_lock.acquire()
-    completed_process = subprocess.run(
+    with command_span(cmd):
+        start = time.monotonic()
+        if stream or line_callback:
+            output_bytes = {"stdout": 0, "stderr": 0}
+            try:
+                completed_process = _run_streaming(
+                    cmd, timeout, line_callback, output_bytes, **kwargs
+                )
+            except subprocess.TimeoutExpired:
+                metrics.record_command(
+                    cmd, time.monotonic() - start, None, labels=metrics_labels
+                )
+                raise
+            metrics.record_command(
+                cmd,
+                time.monotonic() - start,
+                completed_process.returncode,
+                output_bytes["stdout"],
+                output_bytes["stderr"],
+                metrics_labels,
+            )
+            notify_write(cmd, metrics_labels)
+            return check_completed_process(
+                completed_process, cmd, ignore_error, silent, log_output=False
+            )
+        if threading_lock and cmd[0] == "oc":
+            threading_lock.acquire()
+        if "input" not in kwargs:
+            kwargs.setdefault("stdin", subprocess.PIPE)
+        try:
+            completed_process = subprocess.run(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=timeout,
+                **kwargs,
+            )
+        except subprocess.TimeoutExpired:
+            metrics.record_command(
+                cmd, time.monotonic() - start, None, labels=metrics_labels
+            )
+            raise
+        finally:
+            if threading_lock and cmd[0] == "oc":
+                threading_lock.release()
+            notify_write(cmd, metrics_labels)
+        record_completed_process(
+            completed_process, time.monotonic() - start, metrics_labels
+        )
+        return check_completed_process(completed_process, cmd, ignore_error, silent)
+
+
+def command_span(cmd):
+    """
+    Trace span of the command, named by its binary, verb and kind
+    """
+    labels = metrics.command_labels(cmd)
+    return tracing.span(
+        " ".join(filter(None, (labels["command"], labels["verb"], labels["kind"]))),
+        category="command",
+        cluster=labels["cluster"],
+        command=" ".join(cmd)[:500],
+    )
+
+
+def record_completed_process(completed_process, seconds, labels=None):
+    """
+    Record the duration, return code and output size of the executed command
+    in the metrics registry
+    """
+    metrics.record_command(
+        completed_process.args,
+        seconds,
+        completed_process.returncode,
+        len(completed_process.stdout or b""),
+        len(completed_process.stderr or b""),
+        labels,
+    )
+
+
+def _run_streaming(cmd, timeout, line_callback=None, output_bytes=None, **kwargs):
+    """
+    Run the command, logging its output lines as they arrive
+    Args:
+        output_bytes (dict): Filled with the total output size of 'stdout'
+            and 'stderr'
+    Returns:
+        CompletedProcess: The executed command with the last STREAM_TAIL_LINES
+            lines of stdout and stderr
+    """
+    process = subprocess.Popen(
         cmd,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        stdin=subprocess.PIPE,
-        timeout=timeout,
+        stdin=subprocess.DEVNULL,
         **kwargs,
     )
-    if threading_lock and cmd[0] == "oc":
-        threading_lock.release()
+    tails = {
+        "stdout": deque(maxlen=STREAM_TAIL_LINES),
+        "stderr": deque(maxlen=STREAM_TAIL_LINES),
+    }
+    if output_bytes is None:
+        output_bytes = {}
+    output_bytes.update(stdout=0, stderr=0)
+    callback_errors = []
+
+    def read(stream_name, pipe):
+        for raw_line in iter(pipe.readline, b""):
+            output_bytes[stream_name] += len(raw_line)
+            tails[stream_name].append(raw_line)
+            line = raw_line.decode(errors="replace").rstrip("\n")
+            logger.info(f"[{cmd[0]} {stream_name}] {line}")
+            if line_callback and not callback_errors:
+                try:
+                    line_callback(stream_name, line)
+                except Exception as ex:
+                    callback_errors.append(ex)
+                    process.kill()
+        pipe.close()
+
+    readers = [
+        threading.Thread(target=read, args=(name, getattr(process, name)), daemon=True)
+        for name in tails
+    ]
+    for reader in readers:
+        reader.start()
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        # children of a killed command may still hold the pipes open
+        killed = callback_errors or (process.returncode or 0) < 0
+        deadline = time.time() + 5
+        for reader in readers:
+            if killed or process.returncode is None:
+                reader.join(timeout=max(deadline - time.time(), 0))
+            else:
+                reader.join()
+    if callback_errors:
+        raise callback_errors[0]
+    return subprocess.CompletedProcess(
+        cmd, process.returncode, b"".join(tails["stdout"]), b"".join(tails["stderr"])
+    )
+
+
+def check_completed_process(
+    completed_process, cmd, ignore_error=False, silent=False, log_output=True
+):
+    """
+    Log the output of the executed command and check its return code
+    Args:
+        completed_process (CompletedProcess): The executed command
+        cmd (list): The command
+        ignore_error (bool): True if ignore non zero return code and do not
+            raise the exception.
+        silent (bool): If True will silent errors from the server, default false
+        log_output (bool): Log stdout and stderr, False when they were
+            already logged while the command was running
+    Raises:
+        CommandFailed: In case the command execution fails
+    Returns:
+        CompletedProcess: The executed command
+    """
     stdout = completed_process.stdout.decode()
     stdout_err = completed_process.stderr.decode()
-    if len(completed_process.stdout) > 0:
-        logger.debug(f"Command stdout: {stdout}")
-    else:
-        logger.debug("Command stdout is empty")
-    if len(completed_process.stderr) > 0:
-        if not silent:
-            logger.warning(f"Command stderr: {stdout_err}")
-    else:
-        logger.debug("Command stderr is empty")
+    if log_output:
+        if len(completed_process.stdout) > 0:
+            logger.debug(f"Command stdout: {stdout}")
+        else:
+            logger.debug("Command stdout is empty")
+        if len(completed_process.stderr) > 0:
+            if not silent:
+                logger.warning(f"Command stderr: {stdout_err}")
+        else:
+            logger.debug("Command stderr is empty")
     logger.debug(f"Command return code: {completed_process.returncode}")
     if completed_process.returncode and not ignore_error:
         if (
@@ -76,3 +296,102 @@ def exec_cmd(
                 f"Error during execution of command: {cmd}." f"\nError is {stdout_err}"
             )
     return completed_process
+
+
+def get_semaphore(key, limit=ASYNC_CONCURRENCY):
+    """
+    Get the semaphore limiting the concurrent commands of the key (e.g. the
+    kubeconfig of the cluster) in the running event loop
+    Args:
+        key (str): Concurrency key
+        limit (int): Max number of concurrent commands, used when the
+            semaphore is created
+    Returns:
+        asyncio.Semaphore: The semaphore
+    """
+    loop = asyncio.get_running_loop()
+    with _semaphores_lock:
+        for semaphore_loop, semaphore_key in list(_semaphores):
+            if semaphore_loop is not loop and semaphore_loop.is_closed():
+                del _semaphores[(semaphore_loop, semaphore_key)]
+        semaphore = _semaphores.get((loop, key))
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(limit)
+            _semaphores[(loop, key)] = semaphore
+        return semaphore
+
+
+async def exec_cmd_async(
+    cmd,
+    timeout=600,
+    ignore_error=False,
+    silent=False,
+    concurrency_key=None,
+    concurrency=ASYNC_CONCURRENCY,
+    input=None,
+    **kwargs,
+):
+    """
+    Run an arbitrary command locally without blocking the event loop, the
+    asyncio equivalent of exec_cmd. The command is killed when it times out
+    or the awaiting task is cancelled.
+    Args:
+        cmd (str): command to run
+        timeout (int): Timeout for the command, defaults to 600 seconds.
+        ignore_error (bool): True if ignore non zero return code and do not
+            raise the exception.
+        silent (bool): If True will silent errors from the server, default false
+        concurrency_key (str): Commands of the same key (e.g. the kubeconfig
+            of the cluster) don't run more than `concurrency` at once
+        concurrency (int): Max number of concurrent commands of the key
+        input (bytes): Data sent to the stdin of the command
+    Raises:
+        CommandFailed: In case the command execution fails
+        subprocess.TimeoutExpired: In case the command times out
+    Returns:
+        (CompletedProcess) A CompletedProcess object of the command that was executed
+    """
+    if isinstance(cmd, str):
+        cmd = shlex.split(cmd)
+    if concurrency_key is None:
+        return await _run_async(cmd, timeout, ignore_error, silent, input, **kwargs)
+    async with get_semaphore(concurrency_key, concurrency):
+        return await _run_async(cmd, timeout, ignore_error, silent, input, **kwargs)
+
+
+async def _run_async(cmd, timeout, ignore_error, silent, input=None, **kwargs):
+    logger.info(f"Executing command: {cmd}")
+    with command_span(cmd):
+        start = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            stdin=subprocess.PIPE,
+            **kwargs,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(input), timeout)
+        except asyncio.TimeoutError:
+            await _kill(process)
+            metrics.record_command(cmd, time.monotonic() - start, None)
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        except asyncio.CancelledError:
+            await _kill(process)
+            raise
+        finally:
+            notify_write(cmd)
+        completed_process = subprocess.CompletedProcess(
+            cmd, process.returncode, stdout, stderr
+        )
+        record_completed_process(completed_process, time.monotonic() - start)
+        return check_completed_process(completed_process, cmd, ignore_error, silent)
+
+
+async def _kill(process):
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
@@ -0,0 +1,170 @@
+"""
+Decoding of the data returned by 'oc' and the API server, and of the YAML
+manifests and configuration files, with the C implementations when they are
+installed
+"""
+import json
+import os
+import threading
+
+import yaml
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+# Parsed YAML files by path, with the mtime and size they were parsed at
+_yaml_files = {}
+_yaml_files_lock = threading.Lock()
+
+
+def loads_json(data):
+    """
+    Decode the JSON document, using orjson when it's installed
+    Args:
+        data (str or bytes): JSON document
+    Returns:
+        The decoded data
+    Raises:
+        ValueError: In case the data is not valid JSON
+    """
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_json(data):
+    """
+    Encode the data as a JSON document, using orjson when it's installed
+    Args:
+        data: The data to encode
+    Returns:
+        bytes: JSON document
+    """
+    if orjson:
+        return orjson.dumps(data)
+    return json.dumps(data).encode()
+
+
+def loads_yaml(data):
+    """
+    Decode the YAML document, using the libyaml loader when available
+    Args:
+        data (str or bytes): YAML document
+    Returns:
+        The decoded data
+    """
+    return yaml.load(data, Loader=SafeLoader)
+
+
+def loads_yaml_all(data):
+    """
+    Decode the YAML documents, using the libyaml loader when available
+    Args:
+        data (str or bytes): YAML documents
+    Returns:
+        list: The decoded documents
+    """
+    return list(yaml.load_all(data, Loader=SafeLoader))
+
+
+def dumps_yaml(data, **kwargs):
+    """
+    Encode the data as a YAML document, using the libyaml dumper when
+    available
+    Args:
+        data: The data to encode
+        kwargs (dict): additional keyword arguments passed to yaml.dump(...)
+    Returns:
+        str: YAML document
+    """
+    kwargs.setdefault("default_flow_style", False)
+    return yaml.dump(data, Dumper=SafeDumper, **kwargs)
+
+
+def dumps_yaml_all(documents, **kwargs):
+    """
+    Encode the documents as YAML documents, using the libyaml dumper when
+    available
+    Args:
+        documents (list): The documents to encode
+        kwargs (dict): additional keyword arguments passed to yaml.dump_all(...)
+    Returns:
+        str: YAML documents
+    """
+    kwargs.setdefault("default_flow_style", False)
+    return yaml.dump_all(documents, Dumper=SafeDumper, **kwargs)
+
+
+def copy_data(data):
+    """
+    Deep copy of decoded data, faster than copy.deepcopy for the dicts, lists
+    and scalars JSON and YAML decode to
+    Args:
+        data: The data to copy
+    Returns:
+        The copy
+    """
+    if isinstance(data, dict):
+        return {key: copy_data(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [copy_data(value) for value in data]
+    return data
+
+
+def load_yaml_file(path, multi_document=False):
+    """
+    Load the YAML file. The parsed files are kept until their mtime or size
+    change, so static manifests loaded for every cluster are parsed once,
+    every call returns its own copy which the caller is free to modify.
+    Args:
+        path (str): Path to the file
+        multi_document (bool): True if the file contains more documents
+    Returns:
+        The decoded document, list of the decoded documents if
+            multi_document is True
+    Raises:
+        OSError: In case the file can't be read
+        yaml.YAMLError: In case the file is not valid YAML
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, multi_document)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _yaml_files_lock:
+        cached = _yaml_files.get(key)
+    if cached and cached[0] == signature:
+        return copy_data(cached[1])
+    with open(path) as f:
+        content = f.read()
+    data = loads_yaml_all(content) if multi_document else loads_yaml(content)
+    with _yaml_files_lock:
+        _yaml_files[key] = (signature, data)
+    return copy_data(data)
+
+
+def loads(data):
+    """
+    Decode the output of 'oc'. The output is decoded as JSON when it looks
+    like JSON (e.g. '-o json'), as YAML otherwise (e.g. '-o yaml' or the
+    plain text messages of 'oc create'), so it returns the same as
+    yaml.safe_load would.
+    Args:
+        data (str or bytes): The output
+    Returns:
+        The decoded data, None for empty output
+    """
+    if not data or not data.strip():
+        return None
+    if data.lstrip()[:1] in ("{", "[", b"{", b"["):
+        try:
+            return loads_json(data)
+        except ValueError:
+            pass
+    return loads_yaml(data)
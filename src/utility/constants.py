@@ -10,7 +10,7 @@ LOG_FORMAT = "%(asctime)s - %(threadName)s - %(name)s - %(levelname)s %(clusterc
 BASIC_FORMAT = "%(asctime)s - %(threadName)s - %(name)s - %(levelname)s - %(message)s"
 OPERATOR_CATALOG_SOURCE_NAME = "redhat-operators"
 PATCH_SPECIFIC_SOURCES_CMD = (
-    "oc patch operatorhub.config.openshift.io/cluster -p="
+    "patch operatorhub.config.openshift.io/cluster -p="
     '\'{{"spec":{{"sources":[{{"disabled":{disable},"name":"{source_name}"'
     "}}]}}}}' --type=merge"
 )
@@ -116,3 +116,16 @@ MACHINECONFIGPOOL = "MachineConfigPool"
 
 # Provisioners
 SUBSCRIPTION_WITH_ACM = "Subscription.operators.coreos.com"
+
+# oc commands changing the cluster state
+OC_WRITE_VERBS = (
+    "apply",
+    "create",
+    "replace",
+    "patch",
+    "label",
+    "annotate",
+    "delete",
+    "scale",
+    "set",
+)
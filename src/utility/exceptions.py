@@ -72,3 +72,15 @@ class NotSupportedFunctionError(Exception):
 
 class UnexpectedDeploymentConfiguration(Exception):
     pass
+
+
+class TransportUnavailableError(Exception):
+    pass
+
+
+class SamplingAbortedError(TimeoutExpiredError):
+    pass
+
+
+class ChecksumMismatchError(Exception):
+    pass
@@ -0,0 +1,168 @@
+"""
+TTL memoization of repeated read-only cluster queries
+"""
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from src.framework import config
+
+logger = logging.getLogger(__name__)
+
+
+class MemoCache(object):
+    """
+    Size bounded LRU cache whose entries expire after their TTL. Keys are
+    tuples starting with the cluster (kubeconfig path), the verb and the kind,
+    e.g. (cluster, "get", "node", name, selector, ...), so all the entries of
+    a kind of a cluster can be invalidated after a write.
+    """
+
+    def __init__(self, maxsize=256):
+        """
+        Initializer function
+        Args:
+            maxsize (int): Max number of entries, the least recently used
+                entry is evicted when it's reached
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get the value of the key
+        Args:
+            key (tuple): The key
+        Returns:
+            tuple: (True, copy of the value) if the key is cached and not
+                expired, (False, None) otherwise
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, copy.deepcopy(entry[1])
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value, ttl):
+        """
+        Cache the value of the key
+        Args:
+            key (tuple): The key
+            value: The value, a copy is stored
+            ttl (float): Time to live of the entry in seconds
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, cluster=None, kind=None):
+        """
+        Drop the entries of the kind of the cluster
+        Args:
+            cluster (str): The cluster, all clusters if not set
+            kind (str): The kind, all kinds if not set
+        """
+        kind = kind_key(kind) if kind else None
+        with self._lock:
+            for key in list(self._entries):
+                if cluster and key[0] != cluster:
+                    continue
+                if kind and not kinds_match(key[2], kind):
+                    continue
+                del self._entries[key]
+                self.invalidations += 1
+
+    def clear(self):
+        """
+        Drop all the entries
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: hit, miss, eviction and invalidation counts and the size
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+            }
+
+
+def kind_key(kind):
+    """
+    Normalize the kind for the cache keys, e.g. 'Subscription.operators.coreos.com'
+    and 'subscription' are the same kind
+    """
+    return str(kind).split(".")[0].lower()
+
+
+def kinds_match(kind, other):
+    """
+    Check if the normalized kinds are the same, ignoring the plural form
+    used by 'oc' commands (e.g. 'oc label nodes')
+    """
+    return kind == other or kind in (other + "s", other + "es") or other in (
+        kind + "s",
+        kind + "es",
+    )
+
+
+memo_cache = MemoCache()
+
+
+def memoize(key_func=None, kind=None):
+    """
+    Memoize the results of the decorated function in the shared cache for
+    RUN['memo_ttl'] seconds, the function is called every time when the TTL
+    is 0.
+    Args:
+        key_func (function): Called with the arguments of the decorated
+            function, returns the cluster the result belongs to and other
+            values the result depends on (as a tuple)
+        kind (str): Kind whose writes invalidate the result
+    """
+
+    def deco_memoize(f):
+        @wraps(f)
+        def f_memoize(*args, **kwargs):
+            ttl = config.RUN.get("memo_ttl", 0)
+            if not ttl:
+                return f(*args, **kwargs)
+            if key_func:
+                cluster, *values = key_func(*args, **kwargs)
+            else:
+                cluster, values = None, [args, tuple(sorted(kwargs.items()))]
+            key = (cluster, f.__qualname__, kind_key(kind or ""), *values)
+            hit, value = memo_cache.get(key)
+            if hit:
+                logger.debug(f"Using memoized result of {f.__qualname__}")
+                return value
+            value = f(*args, **kwargs)
+            memo_cache.set(key, value, ttl)
+            return value
+
+        return f_memoize
+
+    return deco_memoize
@@ -0,0 +1,569 @@
+"""
+Latency, failure, retry and output size metrics of the commands and API
+requests of a run, exported as a Prometheus textfile and a JSON summary
+"""
+import bisect
+import glob
+import heapq
+import itertools
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from src.framework import config
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "ocp4mcoci"
+# Upper bounds of the latency histogram buckets in seconds, from quick 'oc get'
+# calls to 'openshift-install create cluster'
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+# Number of the slowest commands listed in the JSON summary
+SLOWEST_COMMANDS = 20
+# Commands whose first two arguments are the verb and the kind, the label
+# values of the other commands (scripts, paths, URLs) would be unbounded
+CLUSTER_COMMANDS = ("oc", "kubectl", "subctl", "openshift-install")
+# Options of oc, kubectl and subctl taking a value, skipped when looking for
+# the verb and the kind of a command
+VALUE_OPTIONS = (
+    "--kubeconfig",
+    "--context",
+    "-n",
+    "--namespace",
+    "-o",
+    "--output",
+    "-l",
+    "--selector",
+    "-f",
+    "--filename",
+    "-p",
+    "--patch",
+    "--type",
+    "--field-manager",
+    "--timeout",
+)
+HELP = {
+    "command_duration_seconds": "Duration of the executed commands",
+    "command_failures_total": "Commands which failed or timed out",
+    "command_output_bytes_total": "Output of the executed commands",
+    "retries_total": "Retries of failed calls",
+    "retry_giveups_total": "Failed calls given up after their last retry",
+    "api_request_duration_seconds": "Duration of the API server requests",
+    "api_request_failures_total": "API server requests which failed",
+    "api_response_bytes_total": "Body of the API server responses",
+    "run_end_timestamp_seconds": "Time the metrics of the run were written",
+}
+
+
+class Histogram(object):
+    """
+    Cumulative latency histogram of one label set
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, counts, count, total, maximum):
+        """
+        Add the observations of another histogram with the same buckets
+        """
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.count += count
+        self.sum += total
+        self.max = max(self.max, maximum)
+
+    def cumulative(self):
+        """
+        Returns:
+            list: tuples of the bucket upper bound and the number of the
+                observed values not above it, ending with '+Inf'
+        """
+        return list(zip(self.buckets, itertools.accumulate(self.counts))) + [
+            ("+Inf", self.count)
+        ]
+
+
+class MetricsRegistry(object):
+    """
+    Thread safe registry of counters, gauges and histograms, each series is
+    identified by the metric name and its labels
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, slowest=SLOWEST_COMMANDS):
+        """
+        Initializer function
+        Args:
+            buckets (tuple): Upper bounds of the histogram buckets
+            slowest (int): Number of the slowest commands kept
+        """
+        self.buckets = buckets
+        self.slowest = slowest
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._slowest = []
+        self._sequence = itertools.count()
+        self.spool_dir = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((labels or {}).items()))
+
+    def inc(self, name, labels=None, value=1):
+        """
+        Increase the counter
+        Args:
+            name (str): Metric name without the prefix
+            labels (dict): Labels of the series
+            value (float): Increment
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, labels=None):
+        """
+        Set the gauge
+        Args:
+            name (str): Metric name without the prefix
+            value (float): Value
+            labels (dict): Labels of the series
+        """
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, labels=None):
+        """
+        Add the value to the histogram
+        Args:
+            name (str): Metric name without the prefix
+            value (float): Observed value
+            labels (dict): Labels of the series
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def record_slow(self, seconds, description):
+        """
+        Keep the description if it's one of the slowest
+        Args:
+            seconds (float): Duration
+            description (str): e.g. the command
+        """
+        entry = (seconds, next(self._sequence), description)
+        with self._lock:
+            if len(self._slowest) < self.slowest:
+                heapq.heappush(self._slowest, entry)
+            elif seconds > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def clear(self):
+        """
+        Drop all the series
+        """
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self._slowest.clear()
+
+    def get_spool_dir(self):
+        """
+        Returns:
+            str: Directory the child processes write their series to
+        """
+        with self._lock:
+            if not self.spool_dir:
+                self.spool_dir = tempfile.mkdtemp(prefix="ocp4mcoci_metrics_")
+            return self.spool_dir
+
+    def adopt(self):
+        """
+        Start over in a child process, a forked child inherits the series of
+        its parent
+        """
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._slowest = []
+        self.spool_dir = None
+        self._lock = threading.Lock()
+
+    def spool(self, spool_dir):
+        """
+        Write the series of this (child) process to the spool directory
+        """
+        with self._lock:
+            data = {
+                "counters": [
+                    [name, labels, value]
+                    for (name, labels), value in self._counters.items()
+                ],
+                "gauges": [
+                    [name, labels, value]
+                    for (name, labels), value in self._gauges.items()
+                ],
+                "histograms": [
+                    [name, labels, h.counts, h.count, h.sum, h.max]
+                    for (name, labels), h in self._histograms.items()
+                ],
+                "slowest": [[seconds, desc] for seconds, _, desc in self._slowest],
+            }
+        path = os.path.join(spool_dir, f"metrics-{os.getpid()}.json")
+        with open(path, "w") as f:
+            json.dump(data, f)
+
+    def merge(self, data):
+        """
+        Add the series spooled by a child process
+        Args:
+            data (dict): The series written by spool
+        """
+        for name, pairs, value in data["counters"]:
+            self.inc(name, dict(pairs), value)
+        for name, pairs, value in data["gauges"]:
+            self.set(name, value, dict(pairs))
+        for name, pairs, counts, count, total, maximum in data["histograms"]:
+            key = self._key(name, dict(pairs))
+            with self._lock:
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(self.buckets)
+                histogram.merge(counts, count, total, maximum)
+        for seconds, description in data["slowest"]:
+            self.record_slow(seconds, description)
+
+    def collect(self):
+        """
+        Merge the series of the child processes and drop the spool directory
+        """
+        with self._lock:
+            spool_dir, self.spool_dir = self.spool_dir, None
+        if not spool_dir:
+            return
+        for path in glob.glob(os.path.join(spool_dir, "metrics-*.json")):
+            try:
+                with open(path) as f:
+                    self.merge(json.load(f))
+            except (OSError, ValueError, KeyError) as ex:
+                logger.warning(f"Unable to read the metrics of {path}: {ex}")
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    def to_prometheus(self):
+        """
+        Returns:
+            str: The series in the Prometheus text exposition format
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(self._histograms.items())
+            lines = []
+            self._families(lines, counters, "counter", self._sample)
+            self._families(lines, gauges, "gauge", self._sample)
+            self._families(lines, histograms, "histogram", self._histogram_samples)
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _families(lines, series, metric_type, samples):
+        for name, group in itertools.groupby(series, key=lambda item: item[0][0]):
+            lines.append(f"# HELP {PREFIX}_{name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {PREFIX}_{name} {metric_type}")
+            for (_, labels), value in group:
+                lines.extend(samples(name, labels, value))
+
+    @staticmethod
+    def _sample(name, labels, value, suffix=""):
+        return [f"{PREFIX}_{name}{suffix}{format_labels(labels)} {value}"]
+
+    def _histogram_samples(self, name, labels, histogram):
+        samples = [
+            f"{PREFIX}_{name}_bucket{format_labels(labels + (('le', str(le)),))} "
+            f"{count}"
+            for le, count in histogram.cumulative()
+        ]
+        samples += self._sample(name, labels, histogram.sum, "_sum")
+        samples += self._sample(name, labels, histogram.count, "_count")
+        return samples
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: The counters, gauges, the histograms by their total time and
+                the slowest commands
+        """
+        with self._lock:
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": round(histogram.sum, 3),
+                    "mean": round(histogram.sum / histogram.count, 3),
+                    "max": round(histogram.max, 3),
+                    "buckets": {str(le): count for le, count in histogram.cumulative()},
+                }
+                for (name, labels), histogram in self._histograms.items()
+            ]
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "gauges": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._gauges.items())
+                ],
+                "histograms": sorted(histograms, key=lambda h: h["sum"], reverse=True),
+                "slowest": [
+                    {"seconds": round(seconds, 3), "command": description}
+                    for seconds, _, description in sorted(self._slowest, reverse=True)
+                ],
+            }
+
+    def write(self, directory, run_id=None):
+        """
+        Write the Prometheus textfile and the JSON summary, the textfile is
+        replaced atomically so a node exporter never reads a partial file
+        Args:
+            directory (str): Output directory, created if missing
+            run_id (int): Run ID in the name of the JSON summary
+        Returns:
+            tuple: Paths of the textfile and the JSON summary
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.set("run_end_timestamp_seconds", round(time.time(), 3))
+        prom_path = os.path.join(directory, f"{PREFIX}.prom")
+        json_path = os.path.join(directory, f"metrics-{run_id}.json")
+        summary = dict(run_id=run_id, **self.to_dict())
+        for path, data in (
+            (prom_path, self.to_prometheus()),
+            (json_path, json.dumps(summary, indent=2)),
+        ):
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".metrics")
+            with os.fdopen(fd, "w") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return prom_path, json_path
+
+
+def format_labels(labels):
+    """
+    Format the labels of a series, e.g. {verb="get",kind="pod"}
+    """
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+registry = MetricsRegistry()
+
+
+def cluster_label(kubeconfig=None):
+    """
+    Name of the cluster of the kubeconfig, the scoped or the current cluster
+    if not set or not the kubeconfig of a configured cluster
+    """
+    try:
+        if kubeconfig:
+            path = os.path.abspath(kubeconfig)
+            for ctx in config.get_cluster_contexts():
+                if os.path.abspath(ctx.kubeconfig) == path:
+                    return ctx.name
+        return config.get_cluster_context().name or ""
+    except Exception:
+        # the metrics must never break the command
+        return ""
+
+
+def command_labels(cmd):
+    """
+    Labels of the command: the binary, the verb and the kind (e.g. 'oc',
+    'get', 'pods') of the CLUSTER_COMMANDS and the cluster it runs against
+    Args:
+        cmd (list): The command
+    Returns:
+        dict: The labels
+    """
+    labels = parse_command(cmd)
+    labels["cluster"] = cluster_label(labels.pop("kubeconfig"))
+    return labels
+
+
+def parse_command(cmd):
+    """
+    Parse the binary, the verb, the kind and the kubeconfig of the command
+    (e.g. 'oc', 'get', 'pods', None) of the CLUSTER_COMMANDS
+    Args:
+        cmd (list): The command
+    Returns:
+        dict: The parsed values
+    """
+    command = os.path.basename(cmd[0]) if cmd else ""
+    positional, kubeconfig = [], None
+    args = iter(cmd[1:] if command in CLUSTER_COMMANDS else [])
+    for arg in args:
+        if arg.startswith("-"):
+            option, has_value, value = arg.partition("=")
+            if option in VALUE_OPTIONS and not has_value:
+                value = next(args, None)
+            if option == "--kubeconfig":
+                kubeconfig = value
+            continue
+        positional.append(arg)
+        if len(positional) == 2:
+            break
+    positional += ["", ""]
+    return {
+        "command": command,
+        "verb": positional[0],
+        "kind": positional[1].split("/")[0].lower(),
+        "kubeconfig": kubeconfig,
+    }
+
+
+def record_command(
+    cmd, seconds, returncode, stdout_bytes=0, stderr_bytes=0, labels=None
+):
+    """
+    Record the execution of a command
+    Args:
+        cmd (list): The command
+        seconds (float): Duration
+        returncode (int): Return code, None if the command timed out
+        stdout_bytes (int): Size of the output
+        stderr_bytes (int): Size of the error output
+        labels (dict): Labels overriding the ones derived from the command
+    """
+    command = dict(command_labels(cmd), **(labels or {}))
+    registry.observe("command_duration_seconds", seconds, command)
+    if returncode != 0:
+        registry.inc("command_failures_total", command)
+    for stream, size in (("stdout", stdout_bytes), ("stderr", stderr_bytes)):
+        if size:
+            registry.inc(
+                "command_output_bytes_total", dict(command, stream=stream), size
+            )
+    registry.record_slow(seconds, " ".join(cmd))
+
+
+def record_retry(function, exception):
+    """
+    Record the retry of a call
+    Args:
+        function (str): Name of the retried function
+        exception (Exception): The exception which caused the retry
+    """
+    registry.inc(
+        "retries_total",
+        {"function": function, "exception": type(exception).__name__},
+    )
+
+
+def record_retry_exhausted(function, exception):
+    """
+    Record a call given up by the retries, on the tries, deadline or budget
+    Args:
+        function (str): Name of the retried function
+        exception (Exception): The exception raised to the caller
+    """
+    registry.inc(
+        "retry_giveups_total",
+        {"function": function, "exception": type(exception).__name__},
+    )
+
+
+def record_api_request(method, resource, seconds, status, size, kubeconfig=None):
+    """
+    Record a request of the API transport
+    Args:
+        method (str): HTTP method
+        resource (str): The requested resource
+        seconds (float): Duration
+        status (int): HTTP status, None if the API server can't be reached
+        size (int): Size of the response body
+        kubeconfig (str): Kubeconfig of the cluster
+    """
+    labels = {
+        "method": method,
+        "resource": resource,
+        "cluster": cluster_label(kubeconfig),
+    }
+    registry.observe("api_request_duration_seconds", seconds, labels)
+    if status is None or status >= 400:
+        registry.inc(
+            "api_request_failures_total", dict(labels, code=str(status or "error"))
+        )
+    if size:
+        registry.inc("api_response_bytes_total", labels, size)
+
+
+def write_metrics(directory=None):
+    """
+    Write the metrics of the run to RUN['metrics_dir']
+    Args:
+        directory (str): Output directory overriding RUN['metrics_dir']
+    Returns:
+        tuple: Paths of the Prometheus textfile and the JSON summary, None if
+            the export is disabled
+    """
+    registry.collect()
+    directory = directory or config.RUN.get("metrics_dir")
+    if not directory:
+        return None
+    directory = os.path.abspath(os.path.expanduser(directory))
+    paths = registry.write(directory, getattr(config, "run_id", None))
+    logger.info(f"Run metrics written to {', '.join(paths)}")
+    max_age_days = config.RUN.get("metrics_max_age_days")
+    if max_age_days:
+        remove_old_files(directory, "metrics-*.json", max_age_days)
+    return paths
+
+
+def remove_old_files(directory, pattern, max_age_days):
+    """
+    Remove the files of previous runs not modified for max_age_days
+    Args:
+        directory (str): Directory of the files
+        pattern (str): Glob pattern of the files, e.g. metrics-*.json
+        max_age_days (float): Days since the last modification
+    Returns:
+        list: Paths of the removed files
+    """
+    removed = []
+    deadline = time.time() - max_age_days * 86400
+    for path in sorted(glob.glob(os.path.join(directory, pattern))):
+        try:
+            if os.path.getmtime(path) < deadline:
+                os.remove(path)
+                removed.append(path)
+        except OSError as ex:
+            logger.warning(f"Unable to remove {path}: {ex}")
+    if removed:
+        logger.info(f"Removed {len(removed)} files older than {max_age_days} days")
+    return removed
@@ -3,6 +3,7 @@ from src.framework import config
 from src.utility.exceptions import CommandFailed
 from src.ocs.ocp import OCP
 from src.ocs.ocs import OCS
+from src.ocs.columns import get_column_value
 from src.utility.constants import WORKER_MACHINE, OPERATOR_NODE_LABEL
 
 logger = logging.getLogger(__name__)
@@ -21,7 +22,7 @@ def get_nodes(node_type=WORKER_MACHINE, num_of_nodes=None):
     typed_nodes = [
         node
         for node in get_node_objs()
-        if node_type in node.ocp.get_resource(resource_name=node.name, column="ROLES")
+        if node_type in get_column_value(node.data, "ROLES")
     ]
     if num_of_nodes:
         typed_nodes = typed_nodes[:num_of_nodes]
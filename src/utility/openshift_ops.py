@@ -25,22 +25,47 @@ class OpenshiftOps(object):
     def set_kubeconfig(kubeconfig_path):
         """
         Export environment variable KUBECONFIG for future calls of OC commands
-        or other API calls
+        or other API calls. The framework passes the kubeconfig of the
+        ClusterContext explicitly instead, this is kept for external scripts.
         Args:
             kubeconfig_path (str): path to kubeconfig file to be exported
         Returns:
             boolean: True if successfully connected to cluster, False otherwise
         """
-        # Test cluster access
+        if os.path.isfile(kubeconfig_path):
+            os.environ["KUBECONFIG"] = kubeconfig_path
+        return OpenshiftOps.check_kubeconfig(kubeconfig_path)
+
+    @staticmethod
+    def check_kubeconfig(kubeconfig_path):
+        """
+        Test the access to the cluster with the kubeconfig, without changing
+        the environment
+        Args:
+            kubeconfig_path (str): path to kubeconfig file of the cluster
+        Returns:
+            boolean: True if successfully connected to cluster, False otherwise
+        """
         log.info("Testing access to cluster with %s", kubeconfig_path)
         if not os.path.isfile(kubeconfig_path):
             log.warning("The kubeconfig file %s doesn't exist!", kubeconfig_path)
             return False
-        os.environ["KUBECONFIG"] = kubeconfig_path
         if not which("oc"):
             get_openshift_client()
+        return OpenshiftOps.check_cluster_access(kubeconfig_path)
+
+    @staticmethod
+    def check_cluster_access(kubeconfig_path):
+        """
+        Test the access to the cluster, never cached: the result decides if
+        the cluster is installed
+        Args:
+            kubeconfig_path (str): path to kubeconfig file of the cluster
+        Returns:
+            boolean: True if successfully connected to cluster, False otherwise
+        """
         try:
-            exec_cmd("oc cluster-info")
+            exec_cmd(f"oc --kubeconfig {kubeconfig_path} cluster-info")
         except CommandFailed as ex:
             log.error("Cluster is not ready to use: %s", ex)
             return False
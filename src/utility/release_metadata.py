@@ -0,0 +1,113 @@
+"""
+Cache of the OCP release metadata (the latest nightly of a release stream,
+the versions of an upgrade channel): the responses are kept on disk for
+RUN['release_cache_ttl'] seconds and revalidated with conditional requests
+(ETag, Last-Modified) over a pooled session shared by the threads of the run
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+
+from src.framework import config
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for the release APIs
+REQUEST_TIMEOUT = 30
+
+_session = None
+_session_lock = threading.Lock()
+_url_locks = {}
+
+
+def get_session():
+    """
+    Returns:
+        requests.Session: The session shared by the release metadata requests
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers["Accept"] = "application/json"
+        return _session
+
+
+def _url_lock(url):
+    with _session_lock:
+        return _url_locks.setdefault(url, threading.Lock())
+
+
+def _cache_path(url):
+    cache_dir = os.path.expanduser(config.RUN["release_cache_dir"])
+    return os.path.join(cache_dir, f"{hashlib.sha256(url.encode()).hexdigest()}.json")
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _store(path, entry):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)
+
+
+def get_json(url, ttl=None):
+    """
+    Get the JSON document of the URL from the cache, revalidated with the
+    server when it's older than the TTL. A stale document is used when the
+    server can't be reached.
+    Args:
+        url (str): URL of the document
+        ttl (int): Seconds the cached document is used without revalidation
+            (default: RUN['release_cache_ttl'])
+    Returns:
+        The decoded document
+    Raises:
+        requests.RequestException: If the document can't be fetched and is not
+            cached
+    """
+    ttl = config.RUN["release_cache_ttl"] if ttl is None else ttl
+    path = _cache_path(url)
+    with _url_lock(url):
+        entry = _load(path)
+        if entry and time.time() - entry["fetched"] < ttl:
+            logger.debug(f"Using the cached {url}")
+            return entry["body"]
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            response = get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 304 and entry:
+                logger.debug(f"The cached {url} is still valid")
+            else:
+                response.raise_for_status()
+                entry = {
+                    "url": url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "body": response.json(),
+                }
+        except (requests.RequestException, ValueError) as ex:
+            if not entry:
+                raise
+            logger.warning(f"Unable to revalidate {url}, using the cached one: {ex}")
+            return entry["body"]
+        entry["fetched"] = time.time()
+        _store(path, entry)
+        return entry["body"]
@@ -1,44 +1,217 @@
+import asyncio
 import logging
+import os
+import random
+import threading
 import time
 from functools import wraps
 
+from src.utility import metrics
+
 logger = logging.getLogger(__name__)
 
+# Retries of all the workers against one cluster API server in a burst, and
+# the retries given back per second
+CLUSTER_RETRY_BUDGET = 30
+CLUSTER_RETRY_REFILL_PER_SECOND = 0.5
+
+
+class RetryBudget(object):
+    """
+    Token bucket shared by the retried calls of several workers: every retry
+    takes a token, and when the bucket is empty the calls fail right away
+    instead of retrying, so a failing dependency is not hammered by all the
+    workers at once.
+    """
+
+    def __init__(self, capacity, refill_per_second=0.0):
+        """
+        Initializer function
+        Args:
+            capacity (int): Max number of tokens (retries in a burst)
+            refill_per_second (float): Tokens added back per second
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token for a retry
+        Returns:
+            bool: False if the budget is exhausted
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity,
+                self._tokens + (now - self._updated) * self.refill_per_second,
+            )
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+_cluster_budgets = {}
+_cluster_budgets_lock = threading.Lock()
+
+
+def cluster_budget(kubeconfig):
+    """
+    Get the retry budget shared by all the retried calls against the API
+    server of the cluster
+    Args:
+        kubeconfig (str): Kubeconfig of the cluster
+    Returns:
+        RetryBudget: The budget of the cluster
+    """
+    key = os.path.abspath(kubeconfig) if kubeconfig else ""
+    with _cluster_budgets_lock:
+        budget = _cluster_budgets.get(key)
+        if budget is None:
+            budget = _cluster_budgets[key] = RetryBudget(
+                CLUSTER_RETRY_BUDGET, CLUSTER_RETRY_REFILL_PER_SECOND
+            )
+        return budget
+
 
-def retry(exception_to_check, tries=4, delay=3, backoff=2, text_in_exception=None):
+def next_delay(previous, delay, backoff, max_delay, jitter=True):
     """
-    Retry calling the decorated function using exponential backoff.
+    Delay before the next try
+    Args:
+        previous (float): The previous delay, None before the first retry
+        delay (float): Initial delay
+        backoff (float): Backoff multiplier
+        max_delay (float): Max delay
+        jitter (bool): Randomize the delay: decorrelated jitter (between the
+            initial delay and 3 times the previous one) for the exponential
+            backoff, +/- 50% of the delay for a constant one (backoff 1)
+    Returns:
+        float: The delay in seconds
+    """
+    if not jitter:
+        sleep = delay if previous is None else previous * backoff
+    elif backoff <= 1:
+        sleep = random.uniform(delay / 2, delay * 1.5)
+    else:
+        sleep = random.uniform(delay, (previous or delay) * 3)
+    return min(sleep, max_delay)
+
+
+def retry(
+    exception_to_check,
+    tries=4,
+    delay=3,
+    backoff=2,
+    text_in_exception=None,
+    max_delay=None,
+    deadline=None,
+    retry_on=None,
+    jitter=True,
+    budget=None,
+):
+    """
+    Retry calling the decorated function (or coroutine function) using
+    exponential backoff with jitter, so concurrent workers don't retry in
+    lockstep. Every retry is counted in the metrics registry.
     Args:
         exception_to_check: the exception to check. may be a tuple of exceptions to check
-        tries: number of times to try (not retry) before giving up
+        tries: number of times to try (not retry) before giving up, None to
+            try until the deadline
         delay: initial delay between retries in seconds
         backoff: backoff multiplier e.g. value of 2 will double the delay each retry
         text_in_exception: Retry only when text_in_exception is in the text of exception
+        max_delay: max delay between retries in seconds, defaults to the
+            last delay of the schedule without jitter, or to the upper bound
+            of the jitter for a constant delay (backoff 1)
+        deadline: wall-clock budget of all the tries in seconds, the last
+            exception is raised when the next delay would exceed it
+        retry_on: Retry only when this predicate of the exception is true
+        jitter: Randomize the delays, see next_delay
+        budget (RetryBudget or function): Budget shared with other calls, no
+            retry when it's exhausted. A function is called with the
+            arguments of the call and returns the budget, e.g. the one of
+            the cluster the call talks to
     """
+    if tries is None and deadline is None:
+        raise ValueError("Either tries or deadline must be set")
+    if max_delay is None:
+        if tries is None:
+            max_delay = deadline
+        elif backoff <= 1:
+            # keep the average delay of a constant schedule
+            max_delay = delay * 1.5 if jitter else delay
+        else:
+            max_delay = delay * backoff ** max(tries - 2, 0)
+
+    def should_retry(e, name, attempt, elapsed, sleep, call_budget):
+        if text_in_exception:
+            if text_in_exception in str(e):
+                logger.debug(f"Text: {text_in_exception} found in exception: {e}")
+            else:
+                logger.debug(f"Text: {text_in_exception} not found in exception: {e}")
+                return False
+        if retry_on and not retry_on(e):
+            return False
+        if tries is not None and attempt >= tries:
+            reason = f"{tries} tries"
+        elif deadline is not None and elapsed + sleep > deadline:
+            reason = f"the deadline of {deadline}s"
+        elif call_budget and not call_budget.acquire():
+            reason = "the retry budget"
+        else:
+            metrics.record_retry(name, e)
+            logger.warning("%s, Retrying in %d seconds..." % (str(e), sleep))
+            return True
+        metrics.record_retry_exhausted(name, e)
+        logger.warning(f"{name} failed after {attempt} tries, giving up on {reason}")
+        return False
+
+    def get_budget(args, kwargs):
+        return budget(*args, **kwargs) if callable(budget) else budget
 
     def deco_retry(f):
+        name = f.__qualname__
+
+        if asyncio.iscoroutinefunction(f):
+
+            @wraps(f)
+            async def f_retry_async(*args, **kwargs):
+                start, attempt, sleep = time.monotonic(), 0, None
+                while True:
+                    attempt += 1
+                    try:
+                        return await f(*args, **kwargs)
+                    except exception_to_check as e:
+                        sleep = next_delay(sleep, delay, backoff, max_delay, jitter)
+                        elapsed = time.monotonic() - start
+                        call_budget = get_budget(args, kwargs)
+                        if not should_retry(
+                            e, name, attempt, elapsed, sleep, call_budget
+                        ):
+                            raise
+                    await asyncio.sleep(sleep)
+
+            return f_retry_async
+
         @wraps(f)
         def f_retry(*args, **kwargs):
-            mtries, mdelay = tries, delay
-            while mtries > 1:
+            start, attempt, sleep = time.monotonic(), 0, None
+            while True:
+                attempt += 1
                 try:
                     return f(*args, **kwargs)
                 except exception_to_check as e:
-                    if text_in_exception:
-                        if text_in_exception in str(e):
-                            logger.debug(
-                                f"Text: {text_in_exception} found in exception: {e}"
-                            )
-                        else:
-                            logger.debug(
-                                f"Text: {text_in_exception} not found in exception: {e}"
-                            )
-                            raise
-                    logger.warning("%s, Retrying in %d seconds..." % (str(e), mdelay))
-                    time.sleep(mdelay)
-                    mtries -= 1
-                    mdelay *= backoff
-            return f(*args, **kwargs)
+                    sleep = next_delay(sleep, delay, backoff, max_delay, jitter)
+                    elapsed = time.monotonic() - start
+                    call_budget = get_budget(args, kwargs)
+                    if not should_retry(e, name, attempt, elapsed, sleep, call_budget):
+                        raise
+                time.sleep(sleep)
 
         return f_retry
 
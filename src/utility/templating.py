@@ -1,14 +1,25 @@
 import yaml
 import logging
+import os
+import threading
 import yaml
 
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 
+from src.framework import config
+from src.utility import codec
 from src.utility.constants import TEMPLATE_DIR
 from src.utility.utils import get_url_content
 
 logger = logging.getLogger(__name__)
 
+# Number of compiled templates kept by every environment
+TEMPLATE_CACHE_SIZE = 100
+
+# Shared jinja2 environments by base path
+_environments = {}
+_environments_lock = threading.Lock()
+
 
 def to_nice_yaml(a, indent=2, *args, **kw):
     """
@@ -34,6 +45,38 @@ def to_nice_yaml(a, indent=2, *args, **kw):
     return
 
 
+def get_environment(base_path):
+    """
+    Get the jinja2 environment shared by the templates of the base path. It
+    keeps the compiled templates (recompiled when the file changes) and
+    stores their bytecode in RUN['template_bytecode_cache_dir'] if it's set,
+    so that the next runs don't compile them again.
+    Args:
+        base_path (str): path from which should read the jinja2 templates
+    Returns:
+        jinja2.Environment: The environment
+    """
+    with _environments_lock:
+        j2_env = _environments.get(base_path)
+        if j2_env is None:
+            bytecode_cache = None
+            cache_dir = config.RUN.get("template_bytecode_cache_dir")
+            if cache_dir:
+                cache_dir = os.path.expanduser(cache_dir)
+                os.makedirs(cache_dir, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(cache_dir)
+            j2_env = Environment(
+                loader=FileSystemLoader(base_path),
+                trim_blocks=True,
+                cache_size=TEMPLATE_CACHE_SIZE,
+                auto_reload=True,
+                bytecode_cache=bytecode_cache,
+            )
+            j2_env.filters["to_nice_yaml"] = to_nice_yaml
+            _environments[base_path] = j2_env
+        return j2_env
+
+
 def load_yaml(file, multi_document=False):
     """
     Load yaml file (local or from URL) and convert it to dictionary
@@ -43,15 +86,15 @@ def load_yaml(file, multi_document=False):
     Returns:
         dict: If multi_document == False, returns loaded data from yaml file
             with one document.
-        generator: If multi_document == True, returns generator which each
-            iteration returns dict from one loaded document from a file.
+        list: If multi_document == True, returns list of dicts of the loaded
+            documents from a file.
     """
-    loader = yaml.safe_load_all if multi_document else yaml.safe_load
     if file.startswith("http"):
-        return loader(get_url_content(file))
-    else:
-        with open(file, "r") as fs:
-            return loader(fs.read())
+        content = get_url_content(file)
+        if multi_document:
+            return codec.loads_yaml_all(content)
+        return codec.loads_yaml(content)
+    return codec.load_yaml_file(file, multi_document)
 
 
 def dump_data_to_temp_yaml(data, temp_yaml):
@@ -64,7 +107,7 @@ def dump_data_to_temp_yaml(data, temp_yaml):
     Returns:
         str: dumped yaml data
     """
-    dumper = yaml.dump if isinstance(data, dict) else yaml.dump_all
+    dumper = codec.dumps_yaml if isinstance(data, dict) else codec.dumps_yaml_all
     yaml_data = dumper(data)
     with open(temp_yaml, "w") as yaml_file:
         yaml_file.write(yaml_data)
@@ -95,9 +138,7 @@ class Templating:
             data (dict): the data to be formatted into the template
         Returns: rendered template
         """
-        j2_env = Environment(loader=FileSystemLoader(self._base_path), trim_blocks=True)
-        j2_env.filters["to_nice_yaml"] = to_nice_yaml
-        j2_template = j2_env.get_template(template_path)
+        j2_template = get_environment(self._base_path).get_template(template_path)
         return j2_template.render(**data)
 
     @property
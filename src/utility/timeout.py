@@ -1,28 +1,63 @@
 import logging
+import random
 import time
 
-from src.utility.exceptions import TimeoutExpiredError
+from src.utility.exceptions import SamplingAbortedError, TimeoutExpiredError
 
 log = logging.getLogger(__name__)
 
+# Marks a sample which raised, nothing is yielded for it
+_FAILED = object()
+
 
 class TimeoutSampler(object):
     """
     Samples the function output.
     This is a generator object that at first yields the output of function
     `func`. After the yield, it either raises instance of `timeout_exc_cls` or
-    sleeps `sleep` seconds.
+    sleeps before the next sample.
+    The sampling is adaptive: the first interval is `min_sleep`, every
+    sample without a change multiplies it by `backoff` up to `max_sleep`, and
+    a sample which differs from the previous one (compared by `change_key`)
+    resets it to `min_sleep`. Every interval is randomized by +/- `jitter`
+    so the waits of several clusters don't sample in lockstep. When the
+    `fatal` predicate is true for a sample, SamplingAbortedError (a
+    TimeoutExpiredError) is raised right away instead of waiting for the
+    timeout.
     Yielding the output allows you to handle every value as you wish.
     Feel free to set the instance variables.
     Args:
         timeout (int): Timeout in seconds
-        sleep (int): Sleep interval in seconds
+        sleep (int): Sleep interval in seconds, the base of the max interval,
+            0 samples without sleeping
         func (function): The function to sample
         func_args: Arguments for the function
+        fatal (function): Predicate of the sample which aborts the sampling
+            with SamplingAbortedError
+        change_key (function): Part of the sample compared to detect the
+            changes, the whole sample if not set
         func_kwargs: Keyword arguments for the function
     """
 
-    def __init__(self, timeout, sleep, func, *func_args, **func_kwargs):
+    # Multiplier of the interval after a sample without a change
+    backoff = 1.5
+    # Max relative randomization of the intervals
+    jitter = 0.1
+    # Longest interval in seconds for long timeouts, 'sleep' if it's longer
+    max_sleep_cap = 30
+    # Seconds between the progress log lines, the sleeps are logged at debug
+    log_interval = 60
+
+    def __init__(
+        self,
+        timeout,
+        sleep,
+        func,
+        *func_args,
+        fatal=None,
+        change_key=None,
+        **func_kwargs,
+    ):
         self.timeout = timeout
         self.sleep = sleep
         # check that given timeout and sleep values makes sense
@@ -33,9 +68,27 @@ class TimeoutSampler(object):
         self.func_args = func_args
         self.func_kwargs = func_kwargs
 
+        # First interval, and the interval after a change
+        self.min_sleep = min(sleep, 1)
+        # The interval grows up to 1/20 of the timeout, between sleep and
+        # max_sleep_cap, e.g. 30s for the 720s and 900s waits
+        self.max_sleep = max(sleep, min(timeout / 20, self.max_sleep_cap))
+        # Function of the sample compared to detect changes
+        self.change_key = change_key
+        # Predicate of the sample which aborts the sampling
+        self.fatal = fatal
+        self.fatal_exc_cls = SamplingAbortedError
+
         # Timestamps of the first and most recent samples
         self.start_time = None
         self.last_sample_time = None
+        # Sampling statistics
+        self.samples = 0
+        self.changes = 0
+        self.errors = 0
+        self.slept = 0.0
+        self._last_log_time = None
+        self._last_error = None
         # The exception to raise
         self.timeout_exc_cls = TimeoutExpiredError
         # Arguments that will be passed to the exception
@@ -60,22 +113,99 @@ class TimeoutSampler(object):
         all_args_string = ", ".join(args + kwargs)
         return f"{self.func.__name__}({all_args_string})"
 
+    @property
+    def elapsed(self):
+        """
+        Seconds since the first sample
+        """
+        if self.start_time is None:
+            return 0.0
+        return time.time() - self.start_time
+
+    def stats(self):
+        """
+        Returns:
+            dict: Number of samples, changes and failed samples, seconds
+                elapsed and slept
+        """
+        return {
+            "samples": self.samples,
+            "changes": self.changes,
+            "errors": self.errors,
+            "elapsed": round(self.elapsed, 3),
+            "slept": round(self.slept, 3),
+        }
+
+    def _sample(self):
+        try:
+            return self.func(*self.func_args, **self.func_kwargs)
+        except Exception as ex:
+            self.errors += 1
+            msg = f"Exception raised during iteration: {ex}"
+            # the traceback of a repeated error doesn't tell anything new
+            if msg != self._last_error:
+                log.exception(msg)
+            else:
+                log.debug(msg)
+            self._last_error = msg
+            return _FAILED
+
+    def _next_sleep(self, interval, remaining):
+        if self.jitter:
+            interval *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(min(interval, remaining), 0)
+
+    def _log_progress(self, delay):
+        now = time.time()
+        if (
+            self._last_log_time is None
+            or now - self._last_log_time >= self.log_interval
+        ):
+            self._last_log_time = now
+            log.info(
+                "Sampled %s %d times (%d changes) in %ds, next sample in %.1fs",
+                getattr(self.func, "__name__", self.func),
+                self.samples,
+                self.changes,
+                self.elapsed,
+                delay,
+            )
+        else:
+            log.debug("Going to sleep for %.1f seconds before next iteration", delay)
+
     def __iter__(self):
         if self.start_time is None:
             self.start_time = time.time()
+        if self.timeout <= self.elapsed:
+            raise self.timeout_exc_cls(*self.timeout_exc_args)
+        interval = self.min_sleep
+        previous = _FAILED
         while True:
             self.last_sample_time = time.time()
-            if self.timeout <= (self.last_sample_time - self.start_time):
+            sample = self._sample()
+            self.samples += 1
+            if sample is not _FAILED:
+                if self.fatal and self.fatal(sample):
+                    raise self.fatal_exc_cls(
+                        self.timeout,
+                        f"Aborted after {self.elapsed:.0f}s running "
+                        f"{self._build_call_string()}, fatal condition reached",
+                    )
+                key = self.change_key(sample) if self.change_key else sample
+                if previous is not _FAILED and key != previous:
+                    self.changes += 1
+                    interval = self.min_sleep
+                previous = key
+                yield sample
+            remaining = self.timeout - self.elapsed
+            if remaining <= 0:
                 raise self.timeout_exc_cls(*self.timeout_exc_args)
-            try:
-                yield self.func(*self.func_args, **self.func_kwargs)
-            except Exception as ex:
-                msg = f"Exception raised during iteration: {ex}"
-                log.exception(msg)
-            if self.timeout <= (time.time() - self.start_time):
-                raise self.timeout_exc_cls(*self.timeout_exc_args)
-            log.info("Going to sleep for %d seconds before next iteration", self.sleep)
-            time.sleep(self.sleep)
+            if self.sleep > 0:
+                delay = self._next_sleep(interval, remaining)
+                self._log_progress(delay)
+                time.sleep(delay)
+                self.slept += delay
+                interval = min(interval * self.backoff, self.max_sleep)
 
     def wait_for_func_value(self, value):
         """
@@ -129,9 +259,35 @@ class TimeoutIterator(TimeoutSampler):
         t2 = TimeoutIterator(3600, sleep=10, func=foo, func_args=[bar])
     """
 
-    def __init__(self, timeout, sleep, func, func_args=None, func_kwargs=None):
+    def __init__(
+        self,
+        timeout,
+        sleep,
+        func,
+        func_args=None,
+        func_kwargs=None,
+        fatal=None,
+        change_key=None,
+        max_sleep=None,
+    ):
+        """
+        Args:
+            fatal (function): See TimeoutSampler
+            change_key (function): See TimeoutSampler
+            max_sleep (float): Longest interval in seconds
+        """
         if func_args is None:
             func_args = []
         if func_kwargs is None:
             func_kwargs = {}
-        super().__init__(timeout, sleep, func, *func_args, **func_kwargs)
+        super().__init__(
+            timeout,
+            sleep,
+            func,
+            *func_args,
+            fatal=fatal,
+            change_key=change_key,
+            **func_kwargs,
+        )
+        if max_sleep is not None:
+            self.max_sleep = max(max_sleep, self.min_sleep)
@@ -0,0 +1,384 @@
+"""
+Timeline tracing of the run: nested spans of the deployment phases, the per
+cluster steps and the commands, exported as a Chrome trace (chrome://tracing,
+ui.perfetto.dev) and optionally to an OpenTelemetry collector over OTLP/HTTP
+"""
+import contextvars
+import glob
+import json
+import logging
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import wraps
+
+import requests
+
+from src.framework import config
+from src.utility import metrics
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "ocp4-mco-ci"
+# Reference to the parent of the spans of a child process
+SpanContext = namedtuple("SpanContext", ["trace_id", "span_id"])
+# The processes are started from the worker threads of the scheduler, a
+# forked child could inherit a lock held by another thread (logging, metrics,
+# tracer) and hang on it, so they are spawned
+_mp_context = mp.get_context("spawn")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span(object):
+    """
+    A timed operation of the run, the operations it starts are its children
+    """
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.pid = os.getpid()
+        self.tid = threading.get_native_id()
+        self.thread_name = threading.current_thread().name
+        self.start_ns = time.time_ns()
+        self.duration_ns = 0
+        self.error = None
+        self._start = time.perf_counter_ns()
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self):
+        self.duration_ns = time.perf_counter_ns() - self._start
+
+    def to_dict(self):
+        return {k: v for k, v in vars(self).items() if not k.startswith("_")}
+
+    @classmethod
+    def from_dict(cls, data):
+        span = cls.__new__(cls)
+        span.__dict__.update(data)
+        return span
+
+
+class Tracer(object):
+    """
+    Collects the ended spans of this process and of the child processes
+    started with traced_process
+    """
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans = []
+        self.spool_dir = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Time the block as a child span of the current span
+        Args:
+            name (str): Name of the span
+            attributes: Attributes of the span, e.g. the cluster
+        Yields:
+            Span: The span, attributes can be added while it's open
+        """
+        parent = _current_span.get()
+        span = Span(
+            name,
+            parent.trace_id if parent else self.trace_id,
+            parent.span_id if parent else None,
+            attributes,
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as ex:
+            span.error = f"{type(ex).__name__}: {ex}"[:500]
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+            with self._lock:
+                self.spans.append(span)
+
+    def get_spool_dir(self):
+        """
+        Returns:
+            str: Directory the child processes write their spans to
+        """
+        with self._lock:
+            if not self.spool_dir:
+                self.spool_dir = tempfile.mkdtemp(prefix="ocp4mcoci_spans_")
+            return self.spool_dir
+
+    def adopt(self, trace_id):
+        """
+        Start over in a child process, a forked child inherits the spans of
+        its parent
+        """
+        self.trace_id = trace_id
+        self.spans = []
+        self.spool_dir = None
+        self._lock = threading.Lock()
+
+    def spool(self, spool_dir):
+        """
+        Write the spans of this (child) process to the spool directory
+        """
+        path = os.path.join(spool_dir, f"spans-{os.getpid()}.json")
+        with open(path, "w") as f:
+            json.dump([span.to_dict() for span in self.spans], f)
+
+    def collect(self):
+        """
+        Returns:
+            list: The spans of this process and of the child processes
+        """
+        with self._lock:
+            spans = list(self.spans)
+        for path in glob.glob(os.path.join(self.spool_dir or "", "spans-*.json")):
+            try:
+                with open(path) as f:
+                    spans.extend(Span.from_dict(data) for data in json.load(f))
+            except (OSError, ValueError) as ex:
+                logger.warning(f"Unable to read the spans of {path}: {ex}")
+        return sorted(spans, key=lambda span: span.start_ns)
+
+    def clear(self):
+        """
+        Drop the spans and the spool directory
+        """
+        with self._lock:
+            self.spans = []
+            if self.spool_dir:
+                shutil.rmtree(self.spool_dir, ignore_errors=True)
+                self.spool_dir = None
+
+
+tracer = Tracer()
+
+
+def span(name, **attributes):
+    """
+    Time the block as a child span of the current span, see Tracer.span
+    """
+    return tracer.span(name, **attributes)
+
+
+def traced(name=None, **attributes):
+    """
+    Time the calls of the decorated function as spans
+    Args:
+        name (str or function): Name of the spans, or a function called with
+            the arguments of the call returning it, the qualified name of the
+            function if not set
+        attributes: Attributes of the spans
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            span_name = name(*args, **kwargs) if callable(name) else name
+            with tracer.span(span_name or func.__qualname__, **attributes):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def traced_process(target, args=(), kwargs=None, name=None, **attributes):
+    """
+    Create a spawned multiprocessing.Process which runs the target in a span
+    that is a child of the current span, with the configuration and the
+    cluster scope of this process. Its spans and metrics are collected by
+    the tracer and the metrics registry of this process
+    Args:
+        target (function): Function run by the process, it must be picklable
+        args (tuple): Arguments of the target
+        kwargs (dict): Keyword arguments of the target
+        name (str): Name of the span, the qualified name of the target if not
+            set
+        attributes: Attributes of the span
+    Returns:
+        multiprocessing.Process: The process, not started
+    """
+    parent = _current_span.get()
+    parent = SpanContext(
+        parent.trace_id if parent else tracer.trace_id,
+        parent.span_id if parent else None,
+    )
+    return _mp_context.Process(
+        target=_run_traced,
+        args=(
+            target,
+            args,
+            kwargs or {},
+            name or target.__qualname__,
+            attributes,
+            parent,
+            tracer.get_spool_dir(),
+            metrics.registry.get_spool_dir(),
+            config,
+            config.get_cluster_context().index,
+            logging.getLogRecordFactory(),
+        ),
+    )
+
+
+def _run_traced(
+    target,
+    args,
+    kwargs,
+    name,
+    attributes,
+    parent,
+    spool_dir,
+    metrics_spool_dir,
+    parent_config,
+    cluster_index,
+    record_factory,
+):
+    config.restore(parent_config)
+    logging.setLogRecordFactory(record_factory)
+    tracer.adopt(parent.trace_id)
+    metrics.registry.adopt()
+    _current_span.set(parent)
+    ctx = config.get_cluster_context(cluster_index)
+    try:
+        with config.cluster_scope(ctx), tracer.span(name, **attributes):
+            target(*args, **kwargs)
+    finally:
+        tracer.spool(spool_dir)
+        metrics.registry.spool(metrics_spool_dir)
+
+
+def chrome_trace(spans):
+    """
+    Convert the spans to the Chrome trace event format
+    Args:
+        spans (list): The spans
+    Returns:
+        dict: The trace, complete ('X') events with the process and thread
+            names as metadata events
+    """
+    events, names = [], {}
+    for item in spans:
+        args = dict(item.attributes)
+        if item.error:
+            args["error"] = item.error
+        events.append(
+            {
+                "name": item.name,
+                "cat": item.attributes.get("category", "span"),
+                "ph": "X",
+                "ts": item.start_ns / 1000,
+                "dur": item.duration_ns / 1000,
+                "pid": item.pid,
+                "tid": item.tid,
+                "args": args,
+            }
+        )
+        names.setdefault(("process_name", item.pid, 0), item.name)
+        names.setdefault(("thread_name", item.pid, item.tid), item.thread_name)
+    names[("process_name", os.getpid(), 0)] = SERVICE_NAME
+    events.extend(
+        {"name": kind, "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+        for (kind, pid, tid), name in names.items()
+    )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def otlp_trace(spans):
+    """
+    Convert the spans to the OTLP/HTTP JSON format
+    Args:
+        spans (list): The spans
+    Returns:
+        dict: The ExportTraceServiceRequest
+    """
+
+    def attributes(data):
+        return [
+            {"key": key, "value": {"stringValue": str(value)}}
+            for key, value in data.items()
+        ]
+
+    otlp_spans = []
+    for item in spans:
+        otlp_span = {
+            "traceId": item.trace_id,
+            "spanId": item.span_id,
+            "name": item.name,
+            "kind": 1,
+            "startTimeUnixNano": str(item.start_ns),
+            "endTimeUnixNano": str(item.start_ns + item.duration_ns),
+            "attributes": attributes(dict(item.attributes, pid=item.pid)),
+            "status": (
+                {"code": 2, "message": item.error} if item.error else {"code": 1}
+            ),
+        }
+        if item.parent_id:
+            otlp_span["parentSpanId"] = item.parent_id
+        otlp_spans.append(otlp_span)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": attributes(
+                        {
+                            "service.name": SERVICE_NAME,
+                            "run_id": getattr(config, "run_id", None),
+                        }
+                    )
+                },
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": otlp_spans}],
+            }
+        ]
+    }
+
+
+def write_trace(directory=None, otlp_endpoint=None):
+    """
+    Write the Chrome trace of the run to RUN['trace_dir'] and send the spans
+    to RUN['otlp_endpoint'] when it's set
+    Args:
+        directory (str): Output directory overriding RUN['trace_dir']
+        otlp_endpoint (str): OTLP/HTTP traces endpoint overriding
+            RUN['otlp_endpoint'], e.g. http://localhost:4318/v1/traces
+    Returns:
+        str: Path of the Chrome trace, None if the export is disabled
+    """
+    directory = directory or config.RUN.get("trace_dir")
+    otlp_endpoint = otlp_endpoint or config.RUN.get("otlp_endpoint")
+    spans = tracer.collect()
+    path = None
+    if directory:
+        directory = os.path.abspath(os.path.expanduser(directory))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"trace-{getattr(config, 'run_id', None)}.json")
+        with open(path, "w") as f:
+            json.dump(chrome_trace(spans), f)
+        logger.info(f"Run trace of {len(spans)} spans written to {path}")
+        max_age_days = config.RUN.get("trace_max_age_days")
+        if max_age_days:
+            metrics.remove_old_files(directory, "trace-*.json", max_age_days)
+    if otlp_endpoint:
+        try:
+            response = requests.post(otlp_endpoint, json=otlp_trace(spans), timeout=30)
+            response.raise_for_status()
+            logger.info(f"Sent {len(spans)} spans to {otlp_endpoint}")
+        except requests.RequestException as ex:
+            logger.warning(f"Unable to send the spans to {otlp_endpoint}: {ex}")
+    tracer.clear()
+    return path
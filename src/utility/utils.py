@@ -1,11 +1,16 @@
 import requests
+import atexit
+import hashlib
 import json
 import logging
 import os
 import platform
 import copy
 import smtplib
-import yaml
+import tarfile
+import tempfile
+import threading
+import urllib3
 import shutil
 import time
 
@@ -33,13 +38,31 @@ from src.utility.exceptions import (
     EmailPasswordNotFoundException,
     CommandFailed,
     ResourceWrongStatusException,
+    ResourceNotFoundError,
     UnknownCloneTypeException,
+    ChecksumMismatchError,
 )
+from src.utility import codec, release_metadata
+from src.utility.binary_store import get_binary_store
 from src.utility.cmd import exec_cmd
 from src.utility.retry import retry
+from src.utility.memo import memoize
 
 logger = logging.getLogger(__name__)
 
+# Size of the chunks the downloads are streamed in
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Seconds to wait for the connection and for every chunk of a download
+DOWNLOAD_TIMEOUT = 60
+
+# OCP versions exposed by expose_ocp_version, pinned for the run
+_exposed_versions = {}
+_exposed_versions_lock = threading.Lock()
+
+# Scratch directory of the run, see get_scratch_dir
+_scratch_dir = None
+_scratch_dir_lock = threading.Lock()
+
 
 def download_installer(
     version=None,
@@ -47,127 +70,96 @@ def download_installer(
     force_download=False,
     verify_ssl_certificate=True,
 ):
+    """
+    Get the OpenShift installer of the version from the binary store,
+    downloaded if it's not there yet, and link it in bin_dir
+    Args:
+        version (str): Version of the installer
+            (default: config.DEPLOYMENT['installer_version'])
+        bin_dir (str): Path to bin directory (default: config.RUN['bin_dir'])
+        force_download (bool): Verify the checksums of the stored installer
+            and download it again if they don't match
+        verify_ssl_certificate (bool): Verify the certificate of the mirror
+    Returns:
+        str: Path to the installer of the version in the store
+    """
     version = version or config.DEPLOYMENT["installer_version"]
     bin_dir = os.path.expanduser(bin_dir or config.RUN["bin_dir"])
     installer_filename = "openshift-install"
-    installer_binary_path = os.path.join(bin_dir, installer_filename)
-    if (
-        os.path.isfile(installer_binary_path)
-        and force_download
-        and config.cur_index == 0
-    ):
-        delete_file(installer_binary_path)
-    if os.path.isfile(installer_binary_path):
-        logger.debug(f"Installer exists ({installer_binary_path}), skipping download.")
-        # TODO: check installer version
-    else:
-        version = expose_ocp_version(version)
+    version = expose_ocp_version(version)
+
+    def fetch(directory):
         logger.info(f"Downloading openshift installer ({version}).")
-        prepare_bin_dir()
-        # record current working directory and switch to BIN_DIR
-        previous_dir = os.getcwd()
-        os.chdir(bin_dir)
-        tarball = f"{installer_filename}.tar.gz"
         url = get_openshift_mirror_url(installer_filename, version)
-        download_file(url, tarball, verify=verify_ssl_certificate)
-        exec_cmd(f"tar xzvf {tarball} {installer_filename}")
-        delete_file(tarball)
-        # return to the previous working directory
-        os.chdir(previous_dir)
+        download_and_extract(
+            url,
+            [installer_filename],
+            directory,
+            sha256=get_mirror_checksum(url, verify=verify_ssl_certificate),
+            verify=verify_ssl_certificate,
+        )
+        # run once, the output is kept in the metadata of the store
+        installer_version = exec_cmd(
+            f"{os.path.join(directory, installer_filename)} version"
+        )
+        return {"version_output": installer_version.stdout.decode()}
 
-    installer_version = exec_cmd(f"{installer_binary_path} version")
-    logger.info(f"OpenShift Installer version: {installer_version}")
-    return installer_binary_path
+    store = get_binary_store()
+    installer = store.get(installer_filename, version, fetch, verify=force_download)
+    # bin/openshift-install, e.g. for cleanup-ocp, is the last installer used
+    store.link(installer, bin_dir)
+    logger.info(f"OpenShift Installer version: {installer['version_output']}")
+    return os.path.join(installer["path"], installer_filename)
 
 
 def get_openshift_client(
     version=None, bin_dir=None, force_download=False, skip_comparison=False
 ):
     """
-    Download the OpenShift client binary, if not already present.
+    Get the OpenShift client of the version from the binary store, downloaded
+    if it's not there yet, and link oc and kubectl in bin_dir.
     Update env. PATH and get path of the oc binary.
     Args:
         version (str): Version of the client to download
             (default: config.RUN['client_version'])
         bin_dir (str): Path to bin directory (default: config.RUN['bin_dir'])
-        force_download (bool): Force client download even if already present
-        skip_comparison (bool): Skip the comparison between the existing OCP client
-            version and the configured one.
+        force_download (bool): Verify the checksums of the stored client and
+            download it again if they don't match
+        skip_comparison (bool): Keep the client in bin_dir if there is one,
+            whatever its version
     Returns:
         str: Path to the client binary
     """
     version = version or config.RUN["client_version"]
     bin_dir = os.path.expanduser(bin_dir or config.RUN["bin_dir"])
     client_binary_path = os.path.join(bin_dir, "oc")
-    download_client = True
-    client_version = None
+    if skip_comparison and os.path.isfile(client_binary_path):
+        logger.debug(f"Client exists ({client_binary_path}), skipping download.")
+        return client_binary_path
     try:
         version = expose_ocp_version(version)
     except Exception:
+        if not os.path.isfile(client_binary_path):
+            raise
         logger.exception("Unable to expose OCP version, skipping client download.")
-        skip_comparison = True
-        download_client = False
-        force_download = False
-    if force_download:
-        logger.info("Forcing client download.")
-    elif os.path.isfile(client_binary_path) and not skip_comparison:
-        current_client_version = get_client_version(client_binary_path)
-        if current_client_version != version:
-            logger.info(
-                f"Existing client version ({current_client_version}) does not match "
-                f"configured version ({version})."
-            )
-        else:
-            logger.debug(
-                f"Client exists ({client_binary_path}) and matches configured version, "
-                f"skipping download."
-            )
-            download_client = False
-    if download_client:
-        # Move existing client binaries to backup location
-        client_binary_backup = f"{client_binary_path}.bak"
-
-        try:
-            os.rename(client_binary_path, client_binary_backup)
-        except FileNotFoundError:
-            pass
+        return client_binary_path
 
-        # Download the client
+    def fetch(directory):
         logger.info(f"Downloading openshift client ({version}).")
-        prepare_bin_dir()
-        # record current working directory and switch to BIN_DIR
-        previous_dir = os.getcwd()
-        os.chdir(bin_dir)
         url = get_openshift_mirror_url("openshift-client", version)
-        tarball = "openshift-client.tar.gz"
-        download_file(url, tarball)
-        exec_cmd(f"tar xzvf {tarball} oc kubectl")
-        delete_file(tarball)
-
+        download_and_extract(
+            url, ["oc", "kubectl"], directory, sha256=get_mirror_checksum(url)
+        )
         try:
-            client_version = exec_cmd(f"{client_binary_path} version --client")
+            # run once, the version is kept in the metadata of the store
+            return {"client_version": get_client_version(os.path.join(directory, "oc"))}
         except CommandFailed:
-            logger.error("Unable to get version from downloaded client.")
+            raise ClientDownloadError("Unable to get version from downloaded client.")
 
-        if client_version:
-            try:
-                delete_file(client_binary_backup)
-                logger.info("Deleted backup binaries.")
-            except FileNotFoundError:
-                pass
-        else:
-            try:
-                os.rename(client_binary_backup, client_binary_path)
-                logger.info("Restored backup binaries to their original location.")
-            except FileNotFoundError:
-                raise ClientDownloadError(
-                    "No backups exist and new binary was unable to be verified."
-                )
-
-        # return to the previous working directory
-        os.chdir(previous_dir)
-
-    logger.info(f"OpenShift Client version: {client_version}")
+    store = get_binary_store()
+    client = store.get("openshift-client", version, fetch, verify=force_download)
+    store.link(client, bin_dir)
+    logger.info(f"OpenShift Client version: {client['client_version']}")
     return client_binary_path
 
 
@@ -179,26 +171,40 @@ def expose_ocp_version(version):
     (e.g. 4.2.0-0.nightly-2019-08-08-103722)
     If the version ends with -ga than it will find the latest GA OCP version
     and will expose 4.2-ga to for example 4.2.22.
+    The exposed version is pinned for the rest of the run, so the client, the
+    installers and every cluster get the same build even if a newer one is
+    accepted meanwhile.
     Args:
         version (str): Verison of OCP
     Returns:
         str: Version of OCP exposed to full version if latest nighly passed
     """
+    if version.endswith(".nightly"):
+        key = (version,)
+    elif version.endswith("-ga"):
+        key = (
+            version,
+            config.DEPLOYMENT.get("ocp_channel", "stable"),
+            config.DEPLOYMENT.get("ocp_version_index", -1),
+        )
+    else:
+        return version
+    with _exposed_versions_lock:
+        if key not in _exposed_versions:
+            _exposed_versions[key] = _expose_ocp_version(*key)
+            logger.info(f"OCP version {version} exposed to {_exposed_versions[key]}")
+        return _exposed_versions[key]
+
+
+def _expose_ocp_version(version, channel=None, index=-1):
     if version.endswith(".nightly"):
         latest_nightly_url = (
             f"https://amd64.ocp.releases.ci.openshift.org/api/v1/"
             f"releasestream/{version}/latest"
         )
-        version_url_content = get_url_content(latest_nightly_url)
-        version_json = json.loads(version_url_content)
-        return version_json["name"]
-    if version.endswith("-ga"):
-        channel = config.DEPLOYMENT.get("ocp_channel", "stable")
-        ocp_version = version.rstrip("-ga")
-        index = config.DEPLOYMENT.get("ocp_version_index", -1)
-        return get_latest_ocp_version(f"{channel}-{ocp_version}", index)
-    else:
-        return version
+        return release_metadata.get_json(latest_nightly_url)["name"]
+    ocp_version = version.rstrip("-ga")
+    return get_latest_ocp_version(f"{channel}-{ocp_version}", index)
 
 
 def get_available_ocp_versions(channel):
@@ -209,14 +215,11 @@ def get_available_ocp_versions(channel):
     Returns
         list: Sorted list with OCP versions for specified channel.
     """
-    headers = {"Accept": "application/json"}
-    req = requests.get(
+    data = release_metadata.get_json(
         "https://api.openshift.com/api/upgrades_info/v1/graph?channel={channel}".format(
             channel=channel
-        ),
-        headers=headers,
+        )
     )
-    data = req.json()
     versions = [Version(node["version"]) for node in data["nodes"]]
     versions.sort()
     return versions
@@ -254,6 +257,28 @@ def get_url_content(url, **kwargs):
     return r.content
 
 
+def get_scratch_dir():
+    """
+    Directory for the scratch files of the run (e.g. the certificates
+    extracted from the kubeconfigs), created on first use and removed when
+    the run exits
+    Returns:
+        str: Path of the directory
+    """
+    global _scratch_dir
+    with _scratch_dir_lock:
+        if _scratch_dir is None:
+            _scratch_dir = tempfile.mkdtemp(prefix="ocp4mcoci_run_")
+            atexit.register(_remove_scratch_dir, _scratch_dir, os.getpid())
+        return _scratch_dir
+
+
+def _remove_scratch_dir(path, pid):
+    # a forked child exiting normally must not remove the dir of its parent
+    if os.getpid() == pid:
+        shutil.rmtree(path, ignore_errors=True)
+
+
 def delete_file(file_name):
     """
     Delete file_name
@@ -331,28 +356,284 @@ def get_openshift_mirror_url(file_name, version):
     return url
 
 
-@retry(ResourceWrongStatusException, tries=4, delay=5, backoff=1)
-def download_file(url, filename, **kwargs):
+class ResumableDownload(object):
+    """
+    File object streaming the body of a GET request: when the connection
+    breaks, the request is resumed with a Range header from the current
+    offset, and the SHA-256 of the body is computed on the way. The resumed
+    requests carry If-Range with the validator (ETag or Last-Modified) of
+    the file, so the bytes of two versions of a changed file are never mixed
+    """
+
+    def __init__(
+        self, url, offset=0, sha256=None, validator=None, max_resumes=5, **kwargs
+    ):
+        """
+        Initializer function
+        Args:
+            url (str): URL of the file
+            offset (int): Offset to start the download at, e.g. the size of
+                the part downloaded by an earlier attempt
+            sha256 (hashlib.sha256): Hash of the bytes before the offset
+            validator (str): ETag or Last-Modified of the file the bytes
+                before the offset were downloaded from, the download
+                restarts from 0 without it or if the file changed
+            max_resumes (int): Max number of broken connections resumed
+            kwargs (dict): additional keyword arguments passed to requests.get(...)
+        """
+        self.url = url
+        self.offset = offset if validator else 0
+        self.sha256 = (sha256 if self.offset else None) or hashlib.sha256()
+        self.validator = validator
+        self.max_resumes = max_resumes
+        self.resumes = 0
+        self.size = None
+        self.complete = False
+        self.restarted = bool(offset) and not self.offset
+        self.kwargs = kwargs
+        self.kwargs.setdefault("timeout", DOWNLOAD_TIMEOUT)
+        self.response = None
+        self._open()
+
+    @staticmethod
+    def _validator(response):
+        return response.headers.get("ETag") or response.headers.get("Last-Modified")
+
+    def _open(self):
+        # identity encoding: the offsets of the Range requests are file offsets
+        headers = {"Accept-Encoding": "identity"}
+        if self.offset:
+            headers["Range"] = f"bytes={self.offset}-"
+            headers["If-Range"] = self.validator
+        self.response = requests.get(
+            self.url, stream=True, headers=headers, **self.kwargs
+        )
+        if self.offset and self.response.status_code == 416:
+            # the part is the whole file when the range starts at its end
+            content_range = self.response.headers.get("Content-Range", "")
+            if content_range == f"bytes */{self.offset}":
+                self.size = self.offset
+                self.complete = True
+                return
+        if not self.response.ok:
+            raise ResourceWrongStatusException(
+                f"The URL {self.url} is not available! "
+                f"Status: {self.response.status_code}."
+            )
+        length = self.response.headers.get("Content-Length")
+        if self.offset and self.response.status_code != 206:
+            validator = self._validator(self.response)
+            if self.resumes and validator == self.validator:
+                # same file, but no support of ranges: skip the part read
+                self._skip(self.offset)
+                self.size = int(length) if length else None
+                return
+            if self.resumes:
+                raise ResourceWrongStatusException(
+                    f"{self.url} changed during the download"
+                )
+            # the file changed since the part was downloaded
+            logger.info(f"{self.url} changed, restarting the download")
+            self.offset = 0
+            self.sha256 = hashlib.sha256()
+            self.restarted = True
+        if not self.offset:
+            self.validator = self._validator(self.response)
+        self.size = self.offset + int(length) if length else None
+
+    def _skip(self, size):
+        logger.debug(f"{self.url} doesn't support ranges, skipping {size}")
+        skipped = 0
+        while skipped < size:
+            chunk = self._read_raw(min(DOWNLOAD_CHUNK_SIZE, size - skipped))
+            if not chunk:
+                raise ResourceWrongStatusException(
+                    f"The URL {self.url} is shorter than {size} bytes"
+                )
+            skipped += len(chunk)
+
+    def _read_raw(self, size):
+        return self.response.raw.read(size, decode_content=False)
+
+    def read(self, size=-1):
+        """
+        Returns:
+            bytes: Up to size bytes of the body, empty at the end
+        """
+        if self.complete:
+            return b""
+        size = size if size and size > 0 else DOWNLOAD_CHUNK_SIZE
+        while True:
+            try:
+                chunk = self._read_raw(size)
+                if chunk or self.size is None or self.offset >= self.size:
+                    break
+                error = f"connection closed at {self.offset} of {self.size} bytes"
+            except (urllib3.exceptions.HTTPError, requests.RequestException) as ex:
+                error = ex
+            self.response.close()
+            if self.resumes >= self.max_resumes:
+                raise ResourceWrongStatusException(
+                    f"Download of {self.url} failed after {self.resumes} resumes: "
+                    f"{error}"
+                )
+            self.resumes += 1
+            logger.warning(
+                f"Download of {self.url} broken ({error}), resuming at {self.offset}"
+            )
+            self._open()
+        self.offset += len(chunk)
+        self.sha256.update(chunk)
+        return chunk
+
+    def drain(self):
+        """
+        Read the rest of the body, e.g. the padding a tar stream stops before,
+        so the hash covers the whole file
+        """
+        while self.read(DOWNLOAD_CHUNK_SIZE):
+            pass
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+    def close(self):
+        if self.response is not None:
+            self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def verify_checksum(url, download, sha256):
+    """
+    Raises:
+        ChecksumMismatchError: If the SHA-256 of the download is not sha256
+    """
+    if sha256 and download.hexdigest() != sha256:
+        raise ChecksumMismatchError(
+            f"SHA-256 of {url} is {download.hexdigest()}, expected {sha256}"
+        )
+
+
+@retry((ResourceWrongStatusException, requests.RequestException), tries=4, delay=5)
+def download_file(url, filename, sha256=None, **kwargs):
     """
-    Download a file from a specified url
+    Download a file from a specified url, streamed in chunks to a .part
+    file which is renamed once complete: a broken download is resumed from
+    the .part file with a Range request, if the file didn't change since
+    (its ETag or Last-Modified is kept next to the .part file)
     Args:
         url (str): URL of the file to download
         filename (str): Name of the file to write the download to
+        sha256 (str): Expected SHA-256 of the file, not verified if not set
         kwargs (dict): additional keyword arguments passed to requests.get(...)
+    Raises:
+        ChecksumMismatchError: If the checksum of the file is wrong, the part
+            file is removed
     """
     logger.debug(f"Download '{url}' to '{filename}'.")
-    with open(filename, "wb") as f:
-        r = requests.get(url, **kwargs)
-        if not r.ok:
-            print(
-                f"The URL {url} is not available! Status: {r.status_code}. retrying..."
-            )
-            raise ResourceWrongStatusException(
-                f"The URL {url} is not available! Status: {r.status_code}."
-            )
+    part_filename = f"{filename}.part"
+    validator_filename = f"{part_filename}.validator"
+    digest = hashlib.sha256()
+    offset = 0
+    validator = None
+    if os.path.exists(part_filename) and os.path.exists(validator_filename):
+        with open(validator_filename) as f:
+            validator = f.read()
+        with open(part_filename, "rb") as f:
+            for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                offset += len(chunk)
+        logger.info(f"Resuming the download of {url} at {offset} bytes")
+    with ResumableDownload(url, offset, digest, validator, **kwargs) as download:
+        with open(validator_filename, "w") as f:
+            f.write(download.validator or "")
+        with open(part_filename, "ab" if download.offset else "wb") as f:
+            shutil.copyfileobj(download, f, DOWNLOAD_CHUNK_SIZE)
+    try:
+        verify_checksum(url, download, sha256)
+    except ChecksumMismatchError:
+        delete_file(part_filename)
+        delete_file(validator_filename)
+        raise
+    os.replace(part_filename, filename)
+    delete_file(validator_filename)
 
-        assert r.ok, f"The URL {url} is not available! Status: {r.status_code}."
-        f.write(r.content)
+
+@retry((ResourceWrongStatusException, requests.RequestException), tries=4, delay=5)
+def download_and_extract(url, members, dest_dir, sha256=None, **kwargs):
+    """
+    Extract members of a .tar.gz file while it's downloaded, without writing
+    the tarball: the response is streamed to the tar reader, the members are
+    moved to the destination once the checksum of the whole file is verified
+    Args:
+        url (str): URL of the tarball
+        members (list): Names of the members to extract, e.g. ["oc", "kubectl"]
+        dest_dir (str): Directory the members are extracted to
+        sha256 (str): Expected SHA-256 of the tarball, not verified if not set
+        kwargs (dict): additional keyword arguments passed to requests.get(...)
+    Returns:
+        list: Paths of the extracted members
+    Raises:
+        ChecksumMismatchError: If the checksum of the tarball is wrong
+        ResourceNotFoundError: If a member is not in the tarball
+    """
+    logger.debug(f"Download and extract {members} of '{url}' to '{dest_dir}'.")
+    os.makedirs(dest_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=dest_dir, prefix=".extract-")
+    try:
+        with ResumableDownload(url, **kwargs) as download:
+            with tarfile.open(fileobj=download, mode="r|gz") as tar:
+                for member in tar:
+                    if member.name not in members or not member.isfile():
+                        continue
+                    path = os.path.join(tmp_dir, member.name)
+                    with tar.extractfile(member) as src, open(path, "wb") as dst:
+                        shutil.copyfileobj(src, dst, DOWNLOAD_CHUNK_SIZE)
+                    os.chmod(path, member.mode & 0o777)
+            download.drain()
+        verify_checksum(url, download, sha256)
+        missing = [m for m in members if not os.path.exists(os.path.join(tmp_dir, m))]
+        if missing:
+            raise ResourceNotFoundError(f"{missing} not found in {url}")
+        paths = []
+        for member in members:
+            path = os.path.join(dest_dir, member)
+            os.replace(os.path.join(tmp_dir, member), path)
+            paths.append(path)
+        return paths
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def get_mirror_checksum(url, **kwargs):
+    """
+    Get the SHA-256 of a file of the OpenShift mirror from the sha256sum.txt
+    file of its directory
+    Args:
+        url (str): URL of the file
+        kwargs (dict): additional keyword arguments passed to requests.get(...)
+    Returns:
+        str: The SHA-256, None if the mirror doesn't provide it
+    """
+    directory, file_name = url.rsplit("/", 1)
+    checksums_url = f"{directory}/sha256sum.txt"
+    kwargs.setdefault("timeout", DOWNLOAD_TIMEOUT)
+    try:
+        content = get_url_content(checksums_url, **kwargs).decode()
+    except (AssertionError, requests.RequestException) as ex:
+        logger.warning(f"Unable to get {checksums_url}, not verifying {url}: {ex}")
+        return None
+    for line in content.splitlines():
+        fields = line.split()
+        if len(fields) == 2 and fields[1].lstrip("*") == file_name:
+            return fields[0]
+    logger.warning(f"{file_name} is not in {checksums_url}, not verifying it")
+    return None
 
 
 def get_client_version(client_binary_path):
@@ -409,7 +690,7 @@ def create_directory_path(path):
 def is_cluster_running(cluster_path):
     from src.utility.openshift_ops import OpenshiftOps
 
-    return OpenshiftOps.set_kubeconfig(get_kube_config_path(cluster_path))
+    return OpenshiftOps.check_kubeconfig(get_kube_config_path(cluster_path))
 
 
 def get_kube_config_path(cluster_path=""):
@@ -428,6 +709,12 @@ def get_email_pass():
         return f.read()
 
 
+@memoize(
+    key_func=lambda seperator=None: (
+        config.get_cluster_context().kubeconfig,
+        seperator,
+    )
+)
 def get_ocp_version(seperator=None):
     """
     Get current ocp version
@@ -446,7 +733,10 @@ def get_ocp_version(seperator=None):
         char = seperator if seperator else "."
         prefixes = ("latest", "candidate", "fast", "stable")
         if config.ENV_DATA.get("skip_ocp_deployment"):
-            raw_version = json.loads(exec_cmd("oc version -o json").stdout)["openshiftVersion"]
+            kubeconfig = config.get_cluster_context().kubeconfig
+            raw_version = json.loads(
+                exec_cmd(f"oc --kubeconfig {kubeconfig} version -o json").stdout
+            )["openshiftVersion"]
         else:
             raw_version = config.DEPLOYMENT["installer_version"]
         if raw_version.startswith(prefixes):
@@ -566,8 +856,7 @@ def load_auth_config():
     logger.info("Retrieving the authentication config dictionary")
     auth_file = os.path.join(TOP_DIR, "data", AUTHYAML)
     try:
-        with open(auth_file) as f:
-            return yaml.safe_load(f)
+        return codec.load_yaml_file(auth_file)
     except FileNotFoundError:
         logger.warning(
             f"Unable to find the authentication configuration at {auth_file}, "
@@ -659,25 +948,39 @@ def get_non_acm_cluster_config(include_acm=False):
     Returns:
         list: of cluster config objects
     """
-    non_acm_list = []
-    for i in range(len(config.clusters)):
-        conf = config.clusters[i]
-        if i == config.get_acm_index() and (
-            not conf.MULTICLUSTER["primary_cluster"] or not include_acm
-        ):
-            continue
-        else:
-            non_acm_list.append(config.clusters[i])
+    non_acm_list = list(config.clusters)
+    acm_index = config.get_acm_index()
+    if acm_index is not None and (
+        not config.clusters[acm_index].MULTICLUSTER["primary_cluster"]
+        or not include_acm
+    ):
+        del non_acm_list[acm_index]
     return non_acm_list
 
 
+def get_non_acm_cluster_contexts(include_acm=False):
+    """
+    Get a list of non-acm cluster's contexts
+    Returns:
+        list: of ClusterContext objects
+    """
+    selected = get_non_acm_cluster_config(include_acm)
+    return [
+        config.get_cluster_context(i)
+        for i, conf in enumerate(config.clusters)
+        if any(conf is cluster for cluster in selected)
+    ]
+
+
 def get_kube_config(cluster_path):
     kube_config_path = get_kube_config_path(cluster_path)
     with open(kube_config_path, "r") as f:
         return f.read()
 
 
-def wait_for_machineconfigpool_status(node_type, timeout=900, skip_tls_verify=False):
+def wait_for_machineconfigpool_status(
+    node_type, timeout=900, skip_tls_verify=False, ctx=None
+):
     """
     Check for Machineconfigpool status
 
@@ -687,6 +990,8 @@ def wait_for_machineconfigpool_status(node_type, timeout=900, skip_tls_verify=Fa
             e.g: worker, master and all if we want to check for all nodes
         timeout (int): Time in seconds to wait
         skip_tls_verify (bool): True if allow skipping TLS verification
+        ctx (ClusterContext): Context of the cluster, the scoped or the
+            current cluster if not set
 
     """
     logger.info("Sleeping for 60 sec to start update machineconfigpool status")
@@ -704,6 +1009,7 @@ def wait_for_machineconfigpool_status(node_type, timeout=900, skip_tls_verify=Fa
             kind=MACHINECONFIGPOOL,
             resource_name=role,
             skip_tls_verify=skip_tls_verify,
+            ctx=ctx,
         )
         machine_count = ocp_obj.get()["status"]["machineCount"]
 
@@ -0,0 +1,70 @@
+"""
+Tests of the deployment state kept in the cluster path
+"""
+from types import MappingProxyType
+
+from src.framework.checkpoint import (
+    STATE_FILENAME,
+    Checkpoint,
+    DeploymentState,
+    format_status,
+    input_hash,
+)
+from src.framework.scheduler import Task
+
+
+def test_input_hash():
+    frozen = MappingProxyType({"b": 2, "a": [1]})
+    assert input_hash("ocs/c1", {"a": [1], "b": 2}) == input_hash("ocs/c1", frozen)
+    assert input_hash("ocs/c1", {"a": 1}, ["dep"]) != input_hash(
+        "ocs/c1", {"a": 1}, ["other"]
+    )
+
+
+def done_task(name="ocs", inputs=None):
+    task = Task(name, print, "c1", inputs=lambda: inputs)
+    task.state = "done"
+    task.start, task.end = 0.0, 12.5
+    return task
+
+
+def test_lookup_matches_the_recorded_hash(tmp_path):
+    checkpoint = Checkpoint({"c1": str(tmp_path)}, 1)
+    task = done_task(inputs={"channel": "stable-4.14"})
+    task.input_hash = checkpoint.input_hash(task, [])
+    checkpoint.record(task)
+
+    assert checkpoint.lookup(task)["run_id"] == 1
+    changed = done_task(inputs={"channel": "stable-4.15"})
+    changed.input_hash = checkpoint.input_hash(changed, [])
+    assert checkpoint.lookup(changed) is None
+    assert Checkpoint({"c1": str(tmp_path)}, 2, resume=False).lookup(task) is None
+
+
+def test_is_running_gate(tmp_path):
+    task = done_task()
+    task.input_hash = "hash"
+    Checkpoint({"c1": str(tmp_path)}, 1).record(task)
+
+    running = Checkpoint({"c1": str(tmp_path)}, 2, is_running=lambda path: True)
+    destroyed = Checkpoint({"c1": str(tmp_path)}, 2, is_running=lambda path: False)
+
+    assert running.lookup(task)
+    assert destroyed.lookup(task) is None
+
+
+def test_unreadable_state_is_ignored(tmp_path):
+    (tmp_path / STATE_FILENAME).write_text("{not json")
+    assert DeploymentState(str(tmp_path)).load() == {}
+
+
+def test_format_status(tmp_path):
+    assert format_status(str(tmp_path)).endswith("no deployment state")
+    task = done_task()
+    task.input_hash = "hash"
+    Checkpoint({"c1": str(tmp_path)}, 7).record(task)
+
+    status = format_status(str(tmp_path))
+
+    assert "ocs/c1" in status
+    assert "12.5" in status
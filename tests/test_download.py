@@ -0,0 +1,115 @@
+"""
+Tests of the resumed downloads against a fake HTTP server
+"""
+import http.server
+import threading
+
+import pytest
+
+from src.utility.utils import download_file
+
+
+class FakeFileServer(object):
+    """
+    HTTP server of one file with an ETag, it honours Range with If-Range
+    """
+
+    def __init__(self, content, etag):
+        self.content = content
+        self.etag = etag
+        self.requests = []
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(dict(self.headers))
+                content, etag = server.content, server.etag
+                range_header = self.headers.get("Range")
+                if_range = self.headers.get("If-Range")
+                if range_header and (not if_range or if_range == etag):
+                    start = int(range_header.split("=")[1].rstrip("-"))
+                    if start >= len(content):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(content)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    body = content[start:]
+                    self.send_response(206)
+                    self.send_header(
+                        "Content-Range",
+                        f"bytes {start}-{len(content) - 1}/{len(content)}",
+                    )
+                else:
+                    body = content
+                    self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/get-subctl.sh"
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = FakeFileServer(b"0123456789" * 100, '"v1"')
+    yield server
+    server.stop()
+
+
+def write_part(path, data, validator):
+    (path.parent / f"{path.name}.part").write_bytes(data)
+    (path.parent / f"{path.name}.part.validator").write_text(validator)
+
+
+def test_download_resumes_the_part_of_the_same_file(server, tmp_path):
+    target = tmp_path / "get-subctl.sh"
+    write_part(target, server.content[:400], server.etag)
+
+    download_file(server.url, str(target))
+
+    assert target.read_bytes() == server.content
+    assert server.requests[-1]["Range"] == "bytes=400-"
+    assert server.requests[-1]["If-Range"] == server.etag
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["get-subctl.sh"]
+
+
+def test_complete_part_is_not_downloaded_again(server, tmp_path):
+    target = tmp_path / "get-subctl.sh"
+    write_part(target, server.content, server.etag)
+
+    download_file(server.url, str(target))
+
+    assert target.read_bytes() == server.content
+    assert len(server.requests) == 1
+
+
+def test_changed_file_restarts_the_download(server, tmp_path):
+    target = tmp_path / "get-subctl.sh"
+    write_part(target, server.content[:400], server.etag)
+    server.content, server.etag = b"abcdefghij" * 120, '"v2"'
+
+    download_file(server.url, str(target))
+
+    assert target.read_bytes() == server.content
+
+
+def test_part_without_validator_is_not_resumed(server, tmp_path):
+    target = tmp_path / "get-subctl.sh"
+    (tmp_path / "get-subctl.sh.part").write_bytes(b"garbage")
+
+    download_file(server.url, str(target))
+
+    assert target.read_bytes() == server.content
+    assert "Range" not in server.requests[-1]
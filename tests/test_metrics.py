@@ -0,0 +1,26 @@
+"""
+Tests of the retention of the run metrics files
+"""
+import os
+import time
+
+from src.utility.metrics import remove_old_files
+
+
+def test_remove_old_files(tmp_path):
+    old = tmp_path / "metrics-1.json"
+    new = tmp_path / "metrics-2.json"
+    prom = tmp_path / "ocp4mcoci.prom"
+    for path in (old, new, prom):
+        path.write_text("{}")
+    twenty_days_ago = time.time() - 20 * 86400
+    for path in (old, prom):
+        os.utime(path, (twenty_days_ago, twenty_days_ago))
+
+    removed = remove_old_files(str(tmp_path), "metrics-*.json", 14)
+
+    assert removed == [str(old)]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "metrics-2.json",
+        "ocp4mcoci.prom",
+    ]
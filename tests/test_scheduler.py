@@ -0,0 +1,171 @@
+"""
+Tests of the deployment task scheduler with plain functions as tasks
+"""
+import pytest
+
+from src.framework.checkpoint import Checkpoint
+from src.framework.scheduler import DONE, FAILED, SKIPPED, Scheduler
+
+
+def fail():
+    raise RuntimeError("task failed")
+
+
+def test_tasks_run_after_their_dependencies():
+    calls = []
+    scheduler = Scheduler(max_workers=4)
+    scheduler.add("ocs", calls.append, "c1", ["ocp/c1"], args=("ocs/c1",))
+    scheduler.add("ocp", calls.append, "c1", args=("ocp/c1",))
+    scheduler.add("ocp", calls.append, "c2", args=("ocp/c2",))
+    scheduler.add("mco", calls.append, "c1", ["ocs/c1", "ocp/c2"], args=("mco/c1",))
+
+    assert scheduler.run() == []
+    assert all(task.state == DONE for task in scheduler.tasks.values())
+    assert calls.index("ocp/c1") < calls.index("ocs/c1") < calls.index("mco/c1")
+    assert calls.index("ocp/c2") < calls.index("mco/c1")
+
+
+def test_failure_skips_only_the_dependents():
+    calls = []
+    scheduler = Scheduler(max_workers=2)
+    scheduler.add("ocp", fail, "c1")
+    scheduler.add("ocs-prereq", calls.append, "c1", ["ocp/c1"], args=("prereq",))
+    scheduler.add("ocs", calls.append, "c1", ["ocs-prereq/c1"], args=("ocs",))
+    scheduler.add("ocp", calls.append, "c2", args=("ocp/c2",))
+
+    failed = scheduler.run()
+
+    assert [task.name for task in failed] == ["ocp/c1"]
+    assert "RuntimeError: task failed" in failed[0].error
+    assert scheduler.tasks["ocs-prereq/c1"].state == SKIPPED
+    assert scheduler.tasks["ocs/c1"].state == SKIPPED
+    assert scheduler.tasks["ocs/c1"].error == "dependency ocs-prereq/c1 skipped"
+    assert scheduler.tasks["ocp/c2"].state == DONE
+    assert calls == ["ocp/c2"]
+
+
+def test_unknown_dependency_and_cycle():
+    scheduler = Scheduler()
+    scheduler.add("ocs", print, "c1", ["ocp/c1"])
+    with pytest.raises(ValueError, match="unknown"):
+        scheduler.topological_order()
+    scheduler.add("ocp", print, "c1", ["ocs/c1"])
+    with pytest.raises(ValueError, match="cycle"):
+        scheduler.topological_order()
+
+
+def test_critical_path():
+    scheduler = Scheduler()
+    durations = {"ocp/c1": 30, "ocp/c2": 50, "ocs/c1": 10, "acm/c1": 5}
+    scheduler.add("ocp", print, "c1")
+    scheduler.add("ocp", print, "c2")
+    scheduler.add("ocs", print, "c1", ["ocp/c1"])
+    scheduler.add("acm", print, "c1", ["ocs/c1", "ocp/c2"])
+    for name, seconds in durations.items():
+        scheduler.tasks[name].start = 0.0
+        scheduler.tasks[name].end = float(seconds)
+
+    path = [task.name for task in scheduler.critical_path()]
+
+    assert path == ["ocp/c2", "acm/c1"]
+
+
+def schedule(scheduler, calls, cluster_state):
+    """
+    The OCP install of a cluster is always run and hashed with the cluster
+    it installed, OCS and MCO are resumed
+    """
+
+    def install():
+        calls.append("ocp")
+
+    scheduler.add(
+        "ocp",
+        install,
+        "c1",
+        inputs=lambda: {"infra_id": cluster_state["infra_id"]},
+        checkpoint=False,
+    )
+    scheduler.add(
+        "ocs",
+        calls.append,
+        "c1",
+        ["ocp/c1"],
+        args=("ocs",),
+        inputs=lambda: {"channel": cluster_state["channel"]},
+    )
+    scheduler.add("mco", calls.append, "c1", ["ocs/c1"], args=("mco",))
+
+
+def run(tmp_path, cluster_state, resume=True, is_running=None):
+    calls = []
+    checkpoint = Checkpoint({"c1": str(tmp_path)}, 1, resume, is_running)
+    scheduler = Scheduler(2, checkpoint)
+    schedule(scheduler, calls, cluster_state)
+    assert scheduler.run() == []
+    return calls, scheduler
+
+
+def test_rerun_resumes_the_done_tasks(tmp_path):
+    cluster_state = {"infra_id": "abc", "channel": "stable-4.14"}
+    calls, _ = run(tmp_path, cluster_state)
+    assert calls == ["ocp", "ocs", "mco"]
+
+    calls, scheduler = run(tmp_path, cluster_state)
+
+    assert calls == ["ocp"]
+    assert scheduler.tasks["ocs/c1"].resumed
+    assert scheduler.tasks["mco/c1"].resumed
+
+
+def test_changed_inputs_rerun_the_task_and_its_dependents(tmp_path):
+    cluster_state = {"infra_id": "abc", "channel": "stable-4.14"}
+    run(tmp_path, cluster_state)
+
+    cluster_state["channel"] = "stable-4.15"
+    calls, _ = run(tmp_path, cluster_state)
+
+    assert calls == ["ocp", "ocs", "mco"]
+
+
+def test_reinstalled_cluster_reruns_the_dependents(tmp_path):
+    cluster_state = {"infra_id": "abc", "channel": "stable-4.14"}
+    run(tmp_path, cluster_state)
+
+    # the OCP task is hashed after it ran, with the new cluster
+    cluster_state["infra_id"] = "def"
+    calls, _ = run(tmp_path, cluster_state)
+
+    assert calls == ["ocp", "ocs", "mco"]
+
+
+def test_no_resume_without_resume_or_a_running_cluster(tmp_path):
+    cluster_state = {"infra_id": "abc", "channel": "stable-4.14"}
+    run(tmp_path, cluster_state)
+
+    calls, _ = run(tmp_path, cluster_state, resume=False)
+    assert calls == ["ocp", "ocs", "mco"]
+
+    checked = []
+
+    def is_running(cluster_path):
+        checked.append(cluster_path)
+        return False
+
+    calls, _ = run(tmp_path, cluster_state, is_running=is_running)
+    assert calls == ["ocp", "ocs", "mco"]
+    assert set(checked) == {str(tmp_path)}
+
+
+def test_failed_task_is_not_resumed(tmp_path):
+    checkpoint = Checkpoint({"c1": str(tmp_path)}, 1)
+    scheduler = Scheduler(2, checkpoint)
+    scheduler.add("ocs", fail, "c1")
+    assert [task.state for task in scheduler.run()] == [FAILED]
+
+    calls = []
+    scheduler = Scheduler(2, Checkpoint({"c1": str(tmp_path)}, 2))
+    scheduler.add("ocs", calls.append, "c1", args=("ocs",))
+
+    assert scheduler.run() == []
+    assert calls == ["ocs"]
@@ -0,0 +1,62 @@
+"""
+Tests of the fatal condition of the samplers used by the OCP waits
+"""
+import pytest
+
+from src.ocs.resources.csv import CSV, is_csv_failed
+from src.ocs.watch import WatchSampler
+from src.utility.exceptions import SamplingAbortedError
+from src.utility.timeout import TimeoutSampler
+
+FAILED_CSV = {"metadata": {"name": "acm-2.9"}, "status": {"phase": "Failed"}}
+
+
+def test_timeout_sampler_aborts_on_fatal_sample():
+    phases = iter(["Pending", "Installing", "Failed", "Succeeded"])
+    sampler = TimeoutSampler(
+        60, 0, lambda name: next(phases), fatal=lambda p: p == "Failed", name="acm"
+    )
+
+    samples = []
+    with pytest.raises(SamplingAbortedError):
+        for sample in sampler:
+            samples.append(sample)
+
+    assert samples == ["Pending", "Installing"]
+
+
+class FakeTransport(object):
+    def get(self, kind, **kwargs):
+        return {"metadata": {"resourceVersion": "1"}, "items": [FAILED_CSV]}
+
+
+def test_watch_sampler_aborts_on_fatal_state():
+    sampler = WatchSampler(
+        FakeTransport(),
+        "csv",
+        60,
+        5,
+        poll_func=None,
+        resource_name="acm-2.9",
+        fatal=is_csv_failed,
+    )
+
+    with pytest.raises(SamplingAbortedError):
+        next(iter(sampler))
+
+
+def test_wait_for_phase_is_not_retried_when_aborted(monkeypatch):
+    csv = CSV(resource_name="acm-2.9", namespace="open-cluster-management")
+    gets = []
+
+    def get(**kwargs):
+        gets.append(kwargs)
+        return FAILED_CSV
+
+    monkeypatch.setattr(csv, "get", get)
+    monkeypatch.setattr(CSV, "transport", None)
+
+    with pytest.raises(SamplingAbortedError):
+        csv.wait_for_phase("Succeeded", timeout=60, sleep=1, fatal=is_csv_failed)
+
+    assert len(gets) == 1
@@ -0,0 +1,164 @@
+"""
+Tests of the API transport of the OCP class against a fake API server
+"""
+import http.server
+import json
+import threading
+
+import pytest
+
+from src.ocs import transport as transport_module
+from src.ocs.ocp import OCP
+from src.ocs.transport import get_transport
+
+POD_RESOURCES = {
+    "resources": [
+        {
+            "name": "pods",
+            "singularName": "pod",
+            "kind": "Pod",
+            "namespaced": True,
+            "shortNames": ["po"],
+        }
+    ]
+}
+POD_TABLE = {
+    "kind": "Table",
+    "apiVersion": "meta.k8s.io/v1",
+    "columnDefinitions": [
+        {"name": "Name"},
+        {"name": "Ready"},
+        {"name": "Status"},
+        {"name": "Restarts"},
+    ],
+    "rows": [{"cells": ["noobaa-core-0", "1/1", "Running", 0]}],
+}
+
+
+class FakeApiServer(object):
+    """
+    API server serving the pods of a namespace, the pod appears after
+    `missing_gets` requests answered with 404
+    """
+
+    def __init__(self, missing_gets=0):
+        self.missing_gets = missing_gets
+        self.requests = []
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(self.path)
+                path = self.path.split("?")[0]
+                if path == "/apis":
+                    return self.reply(200, {"groups": []})
+                if path == "/api/v1":
+                    return self.reply(200, POD_RESOURCES)
+                if path == "/api/v1/namespaces/openshift-storage/pods/noobaa-core-0":
+                    if server.missing_gets:
+                        server.missing_gets -= 1
+                        return self.reply(
+                            404, {"reason": "NotFound", "message": "not found"}
+                        )
+                    return self.reply(200, POD_TABLE)
+                self.reply(404, {"reason": "NotFound"})
+
+            def reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def write_kubeconfig(path, server):
+    path.write_text(
+        json.dumps(
+            {
+                "apiVersion": "v1",
+                "kind": "Config",
+                "current-context": "admin",
+                "contexts": [
+                    {"name": "admin", "context": {"cluster": "c", "user": "u"}}
+                ],
+                "clusters": [{"name": "c", "cluster": {"server": server}}],
+                "users": [{"name": "u", "user": {"token": "t"}}],
+            }
+        )
+    )
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def transports():
+    transport_module.close_transports()
+    yield
+    transport_module.close_transports()
+
+
+def pod_ocp(kubeconfig):
+    return OCP(
+        kind="pod",
+        namespace="openshift-storage",
+        resource_name="noobaa-core-0",
+        cluster_kubeconfig=kubeconfig,
+    )
+
+
+def test_get_resource_from_table(tmp_path):
+    server = FakeApiServer()
+    try:
+        kubeconfig = write_kubeconfig(tmp_path / "kubeconfig", server.url)
+        ocp = pod_ocp(kubeconfig)
+        assert ocp.get_resource("", "STATUS") == "Running"
+        assert ocp.get_resource("", "READY") == "1/1"
+        assert ocp.get_resource("", "RESTARTS") == "0"
+    finally:
+        server.close()
+
+
+def test_get_resource_retries_until_the_resource_exists(tmp_path):
+    server = FakeApiServer(missing_gets=2)
+    try:
+        kubeconfig = write_kubeconfig(tmp_path / "kubeconfig", server.url)
+        ocp = pod_ocp(kubeconfig)
+        assert ocp.get_resource("", "STATUS", retry=3, wait=0.01) == "Running"
+        assert server.missing_gets == 0
+    finally:
+        server.close()
+
+
+def test_get_resource_falls_back_to_oc(tmp_path, monkeypatch):
+    server = FakeApiServer()
+    server.close()
+    kubeconfig = write_kubeconfig(tmp_path / "kubeconfig", server.url)
+    oc_gets = []
+
+    def oc_get(self, out_yaml_format=True, **kwargs):
+        if out_yaml_format:
+            return {}
+        oc_gets.append(kwargs)
+        return (
+            "NAME            READY   STATUS    RESTARTS\n"
+            "noobaa-core-0   1/1     Running   0"
+        )
+
+    monkeypatch.setattr(OCP, "get", oc_get)
+    assert pod_ocp(kubeconfig).get_resource("", "STATUS") == "Running"
+    assert len(oc_gets) == 1
+    # the unreachable API server is not tried again for the kubeconfig
+    assert get_transport(kubeconfig) is None
+    assert pod_ocp(kubeconfig).get_resource("", "STATUS") == "Running"
+    assert len(oc_gets) == 2